@@ -0,0 +1,287 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+class EdgeSheet(NamedTuple):
+    """One knowledge pack edge sheet and the graph relationship it is ingested as."""
+    rel_type: str
+    source_label: str
+    source_column: str
+    target_label: str
+    target_column: str
+    properties: Tuple[str, ...]
+    numeric: Tuple[str, ...] = ()
+
+
+# Edge sheets of the knowledge pack (same layout as the Excel workbook); the Neo4j
+# export queries below return exactly these columns.
+EDGE_SHEETS: Dict[str, EdgeSheet] = {
+    "edges_supports": EdgeSheet("SUPPORTS", "Nodes_Symptom", "from_id", "Nodes_Condition", "condition_id", ("from_type", "weight", "notes"), numeric=("weight",)),
+    "edges_triggers": EdgeSheet("TRIGGERS", "Nodes_Symptom", "from_id", "Nodes_Redflag", "redflag_id", ("from_type", "notes")),
+    "edges_labs": EdgeSheet("REQUIRES_LAB", "Nodes_Condition", "condition_id", "Nodes_Lab", "lab_id", ("priority", "reason")),
+    "edges_referrals": EdgeSheet("REFERS_TO", "Nodes_Condition", "condition_id", "Nodes_Specialist", "specialist_id", ("urgency", "reason")),
+    "edges_meds": EdgeSheet("TREATED_BY", "Nodes_Condition", "condition_id", "Nodes_Medication_Option", "med_id", ("priority", "reason")),
+    "edges_actions_condition": EdgeSheet("REQUIRES_ACTION", "Nodes_Condition", "condition_id", "Nodes_Action_Recommendation", "action_id", ("priority", "reason")),
+    "edges_actions_redflag": EdgeSheet("REQUIRES_ACTION", "Nodes_Redflag", "redflag_id", "Nodes_Action_Recommendation", "action_id", ("priority", "reason")),
+    "edges_redflag_labs": EdgeSheet("REQUIRES_LAB", "Nodes_Redflag", "redflag_id", "Nodes_Lab", "lab_id", ("priority", "reason")),
+    "edges_redflag_referrals": EdgeSheet("REFERS_TO", "Nodes_Redflag", "redflag_id", "Nodes_Specialist", "specialist_id", ("urgency", "reason")),
+    "edges_asst_cond": EdgeSheet("NEEDS_ASSISTANT_ACTION", "Nodes_Condition", "condition_id", "Nodes_Assistant_Action", "assistant_action_id", ("priority", "reason")),
+    "edges_asst_redflag": EdgeSheet("NEEDS_ASSISTANT_ACTION", "Nodes_Redflag", "redflag_id", "Nodes_Assistant_Action", "assistant_action_id", ("priority", "reason")),
+    "edges_condition_guides": EdgeSheet("HAS_GUIDE", "Nodes_Condition", "condition_id", "Nodes_Patient_Guide", "guide_id", ("priority", "reason")),
+    "edges_action_guides": EdgeSheet("HAS_GUIDE", "Nodes_Action_Recommendation", "action_id", "Nodes_Patient_Guide", "guide_id", ("priority", "reason")),
+    "edges_cond_msg_tmpl": EdgeSheet("USES_TEMPLATE", "Nodes_Condition", "condition_id", "Nodes_Message_Template", "template_id", ("priority", "reason")),
+}
+
+
+def _edge_query(spec: EdgeSheet) -> str:
+    """Bulk export of one edge sheet's relationships, one row per edge."""
+    props = "".join(f", r.{p} AS {p}" for p in spec.properties)
+    return (
+        f"MATCH (s:{spec.source_label})-[r:{spec.rel_type}]->(t:{spec.target_label}) "
+        f"RETURN s.{spec.source_column} AS {spec.source_column}, t.{spec.target_column} AS {spec.target_column}{props}"
+    )
+
+
+# Relationship type -> the edge sheets it is ingested from
+REL_TYPE_SHEETS: Dict[str, Tuple[str, ...]] = {
+    rel_type: tuple(name for name, spec in EDGE_SHEETS.items() if spec.rel_type == rel_type)
+    for rel_type in dict.fromkeys(spec.rel_type for spec in EDGE_SHEETS.values())
+}
+
+# Symptom/vital sources are told apart by label (their ids live in different properties)
+EDGE_SHEET_QUERIES: Dict[str, str] = {
+    "edges_supports": """
+        MATCH (s)-[r:SUPPORTS]->(t:Nodes_Condition)
+        RETURN CASE WHEN s:Nodes_Vital_Rule THEN 'VitalRule' ELSE 'Symptom' END AS from_type,
+               coalesce(s.symptom_id, s.rule_id) AS from_id,
+               t.condition_id AS condition_id,
+               r.weight AS weight,
+               r.notes AS notes
+    """,
+    "edges_triggers": """
+        MATCH (s)-[r:TRIGGERS]->(t:Nodes_Redflag)
+        RETURN CASE WHEN s:Nodes_Vital_Rule THEN 'VitalRule' ELSE 'Symptom' END AS from_type,
+               coalesce(s.symptom_id, s.rule_id) AS from_id,
+               t.redflag_id AS redflag_id,
+               r.notes AS notes
+    """,
+    **{
+        name: _edge_query(spec)
+        for name, spec in EDGE_SHEETS.items()
+        if name not in ("edges_supports", "edges_triggers")
+    },
+}
+
+
+def _id_array(values: Iterable[Any]) -> np.ndarray:
+    """Node ids as stripped strings ('' for empty cells)."""
+    return np.array(
+        ["" if v is None or (isinstance(v, float) and np.isnan(v)) else str(v).strip() for v in values],
+        dtype=object,
+    )
+
+
+def _readonly(array: np.ndarray) -> np.ndarray:
+    array.setflags(write=False)
+    return array
+
+
+class RelationshipCSR:
+    """
+    Compressed sparse row adjacency for one relationship type.
+    Edges are stored grouped by source node (forward CSR); a second index over
+    the same edges groups them by target node. Edge properties are parallel
+    column arrays in forward edge order, so every lookup is an array slice.
+    """
+
+    __slots__ = (
+        "rel_type",
+        "source_ids",
+        "target_ids",
+        "indptr",
+        "edge_sources",
+        "edge_targets",
+        "properties",
+        "rev_indptr",
+        "rev_edges",
+        "_source_index",
+        "_target_index",
+    )
+
+    def __init__(self, rel_type: str, sources: np.ndarray, targets: np.ndarray, properties: Mapping[str, np.ndarray]):
+        self.rel_type = rel_type
+        source_codes, source_ids = pd.factorize(sources)
+        target_codes, target_ids = pd.factorize(targets)
+        self.source_ids = _readonly(np.asarray(source_ids, dtype=object))
+        self.target_ids = _readonly(np.asarray(target_ids, dtype=object))
+        self._source_index = {node_id: i for i, node_id in enumerate(self.source_ids)}
+        self._target_index = {node_id: i for i, node_id in enumerate(self.target_ids)}
+
+        # Forward CSR: edges sorted by source (stable, so sheet order is kept per source)
+        order = np.argsort(source_codes, kind="stable")
+        self.edge_sources = _readonly(source_codes[order].astype(np.int32))
+        self.edge_targets = _readonly(target_codes[order].astype(np.int32))
+        self.indptr = _readonly(np.concatenate((
+            [0], np.cumsum(np.bincount(source_codes, minlength=len(self.source_ids)))
+        )).astype(np.int64))
+        self.properties = {name: _readonly(values[order]) for name, values in properties.items()}
+
+        # Reverse index: forward edge positions grouped by target
+        self.rev_edges = _readonly(np.argsort(self.edge_targets, kind="stable").astype(np.int64))
+        self.rev_indptr = _readonly(np.concatenate((
+            [0], np.cumsum(np.bincount(self.edge_targets, minlength=len(self.target_ids)))
+        )).astype(np.int64))
+
+    def __len__(self) -> int:
+        return len(self.edge_targets)
+
+    def out_edges(self, source_id: str, order_by: Optional[str] = None, descending: bool = True) -> Dict[str, np.ndarray]:
+        """Edges leaving source_id: {"target_id": ..., <property>: ...} (empty if unknown)."""
+        i = self._source_index.get(source_id)
+        edges = slice(0, 0) if i is None else slice(self.indptr[i], self.indptr[i + 1])
+        result = {"target_id": self.target_ids[self.edge_targets[edges]]}
+        result.update((name, values[edges]) for name, values in self.properties.items())
+        return self._ordered(result, order_by, descending)
+
+    def in_edges(self, target_id: str, order_by: Optional[str] = None, descending: bool = True) -> Dict[str, np.ndarray]:
+        """Edges entering target_id: {"source_id": ..., <property>: ...} (empty if unknown)."""
+        i = self._target_index.get(target_id)
+        edges = self.rev_edges[0:0] if i is None else self.rev_edges[self.rev_indptr[i]:self.rev_indptr[i + 1]]
+        result = {"source_id": self.source_ids[self.edge_sources[edges]]}
+        result.update((name, values[edges]) for name, values in self.properties.items())
+        return self._ordered(result, order_by, descending)
+
+    def targets(self, source_id: str) -> np.ndarray:
+        """Ids of the nodes source_id points to."""
+        return self.out_edges(source_id)["target_id"]
+
+    def sources(self, target_id: str) -> np.ndarray:
+        """Ids of the nodes pointing to target_id."""
+        return self.in_edges(target_id)["source_id"]
+
+    @staticmethod
+    def _ordered(edges: Dict[str, np.ndarray], order_by: Optional[str], descending: bool) -> Dict[str, np.ndarray]:
+        if order_by is None:
+            return edges
+        keys = edges[order_by]
+        if keys.dtype == object:
+            order = np.argsort(keys.astype(str), kind="stable")
+            if descending:
+                order = order[::-1]
+        else:
+            # Missing (NaN) values sort last in either direction
+            order = np.argsort(-keys if descending else keys, kind="stable")
+        return {name: values[order] for name, values in edges.items()}
+
+
+class GraphAdjacency:
+    """
+    Every relationship type of the knowledge pack graph as in-memory CSR arrays,
+    built per knowledge pack version from the edge sheets (Excel) or a bulk export
+    of the relationships (Neo4j). Each relationship type is compiled on first
+    access, loading only its own edge sheets.
+    Example: adjacency["SUPPORTS"].in_edges(condition_id, order_by="weight").
+    """
+
+    __slots__ = ("_frame", "_relations", "_lock")
+
+    def __init__(self, frame: Callable[[str], pd.DataFrame]):
+        # Edge sheet name -> DataFrame (empty if the pack has no such sheet)
+        self._frame = frame
+        self._relations: Dict[str, RelationshipCSR] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, rel_type: str) -> RelationshipCSR:
+        relation = self._relations.get(rel_type)
+        if relation is None:
+            if rel_type not in REL_TYPE_SHEETS:
+                raise KeyError(rel_type)
+            with self._lock:
+                relation = self._relations.get(rel_type)
+                if relation is None:
+                    relation = self._relations[rel_type] = self._build(rel_type)
+        return relation
+
+    def __contains__(self, rel_type: str) -> bool:
+        return rel_type in REL_TYPE_SHEETS
+
+    def get(self, rel_type: str) -> Optional[RelationshipCSR]:
+        return self[rel_type] if rel_type in REL_TYPE_SHEETS else None
+
+    @property
+    def rel_types(self) -> Tuple[str, ...]:
+        return tuple(REL_TYPE_SHEETS)
+
+    @property
+    def relations(self) -> Dict[str, RelationshipCSR]:
+        """All relationship types (compiles any not built yet)."""
+        return {rel_type: self[rel_type] for rel_type in REL_TYPE_SHEETS}
+
+    @classmethod
+    def from_knowledge_base(cls, kb: Any) -> "GraphAdjacency":
+        """Compile from a knowledge pack snapshot (or adapter); missing edge sheets count as empty."""
+        def frame(name: str) -> pd.DataFrame:
+            try:
+                return kb.get_sheet(name)
+            except KeyError:
+                return pd.DataFrame()
+        return cls(frame)
+
+    @classmethod
+    def from_sheets(cls, frames: Mapping[str, pd.DataFrame]) -> "GraphAdjacency":
+        return cls(lambda name: frames.get(name, pd.DataFrame()))
+
+    def _build(self, rel_type: str) -> RelationshipCSR:
+        parts = [(EDGE_SHEETS[name], self._frame(name)) for name in REL_TYPE_SHEETS[rel_type]]
+        sources, targets = [], []
+        columns: Dict[str, List[np.ndarray]] = {"source_label": [], "target_label": []}
+        numeric = set()
+        for spec, df in parts:
+            columns.update((p, columns.get(p, [])) for p in spec.properties)
+            numeric.update(spec.numeric)
+        for spec, df in parts:
+            if df.empty or spec.source_column not in df or spec.target_column not in df:
+                continue
+            src = _id_array(df[spec.source_column])
+            tgt = _id_array(df[spec.target_column])
+            keep = (src != "") & (tgt != "")
+            sources.append(src[keep])
+            targets.append(tgt[keep])
+            n = int(keep.sum())
+            columns["source_label"].append(np.full(n, spec.source_label, dtype=object))
+            columns["target_label"].append(np.full(n, spec.target_label, dtype=object))
+            for prop in columns:
+                if prop in ("source_label", "target_label"):
+                    continue
+                if prop in df:
+                    values = df[prop].to_numpy()[keep]
+                else:
+                    values = np.full(n, None, dtype=object)
+                if prop in numeric:
+                    values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+                else:
+                    values = pd.Series(values, dtype=object).where(pd.notna(values), None).to_numpy(dtype=object)
+                columns[prop].append(values)
+
+        def _concat(chunks: List[np.ndarray], dtype) -> np.ndarray:
+            return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+        return RelationshipCSR(
+            rel_type,
+            _concat(sources, object),
+            _concat(targets, object),
+            {prop: _concat(chunks, float if prop in numeric else object) for prop, chunks in columns.items()},
+        )
+
+
+def get_graph_adjacency(kb: Any) -> GraphAdjacency:
+    """Get the compiled adjacency arrays for a pinned snapshot (or the adapter's current one)."""
+    return kb.get_compiled("graph_adjacency", GraphAdjacency.from_knowledge_base)
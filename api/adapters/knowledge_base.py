@@ -3,13 +3,24 @@
 Proprietary and confidential.
 """
 
+import copy
+import hashlib
+import io
+import pickle
+import shutil
 import threading
-from typing import Dict, Any, List, Optional
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import os
 from dotenv import load_dotenv
 
+from api.adapters.graph_adjacency import EDGE_SHEETS, EDGE_SHEET_QUERIES, GraphAdjacency, get_graph_adjacency
+
 # Optional Neo4j import - only needed if using Neo4j mode
 try:
     from neo4j import GraphDatabase
@@ -20,6 +31,361 @@ except ImportError:
 
 load_dotenv()
 
+# Map sheet names from actual Excel to expected names
+EXCEL_SHEET_MAPPING = {
+    "intake_questionnaire": "intake_questionnaire",
+    "intake_branch_rules": "intake_branch_rules",
+    "telehealth_questionnaire": "telehealth_questionnaire",
+    "intake_q_symptom_map": "intake_q_symptom_map",
+    "conditions": "nodes_condition",
+    "symptoms": "nodes_symptom",
+    "red_flags": "nodes_redflag",
+    "actions": "nodes_action_recommendation",
+    "guides": "nodes_patient_guide",
+    "templates": "nodes_message_template",
+    "assistant_action_ui_map": "assistant_action_ui_map",
+    "clinician_validation_checklist": "clinician_validation_checklist",
+    "labs": "nodes_lab",
+    "specialists": "nodes_specialist",
+    "medications": "nodes_medication_option",
+    "assistant_actions": "nodes_assistant_action",
+    "vital_rules": "nodes_vital_rule",
+    # Relationship sheets, compiled into adjacency arrays (see graph_adjacency)
+    **{name: name for name in EDGE_SHEETS},
+}
+
+# Neo4j mode: one query per sheet. Sheets the triage engine reads are projected to
+# the properties it uses; the rest return the node's property map as column "n".
+NEO4J_SHEET_QUERIES = {
+    "conditions": """
+        MATCH (n:Nodes_Condition)
+        RETURN n.condition_id AS condition_id, n.condition_name AS condition_name,
+               n.name AS name, n.severity AS severity, n.description AS description,
+               n.key_symptoms AS key_symptoms, n.supports AS supports, n.red_flags AS red_flags,
+               n.med_class AS med_class, n.exclude_allergen AS exclude_allergen,
+               n.labs AS labs, n.referrals AS referrals, n.med_categories AS med_categories,
+               n.actions AS actions, n.guides AS guides
+    """,
+    "red_flags": """
+        MATCH (n:Nodes_Redflag)
+        RETURN n.red_flag_id AS red_flag_id, n.redflag_id AS redflag_id,
+               n.name AS name, n.urgency AS urgency
+    """,
+    "symptoms": "MATCH (n:Nodes_Symptom) RETURN properties(n) AS n",
+    "actions": "MATCH (n:Nodes_Action_Recommendation) RETURN properties(n) AS n",
+    "guides": "MATCH (n:Nodes_Patient_Guide) RETURN properties(n) AS n",
+    "templates": "MATCH (n:Nodes_Message_Template) RETURN properties(n) AS n",
+    "labs": "MATCH (n:Nodes_Lab) RETURN properties(n) AS n",
+    "specialists": "MATCH (n:Nodes_Specialist) RETURN properties(n) AS n",
+    "medications": "MATCH (n:Nodes_Medication_Option) RETURN properties(n) AS n",
+    "assistant_actions": "MATCH (n:Nodes_Assistant_Action) RETURN properties(n) AS n",
+    "vital_rules": "MATCH (n:Nodes_Vital_Rule) RETURN properties(n) AS n",
+    "intake_questionnaire": "MATCH (n:Intake_Questionnaire) RETURN properties(n) AS n ORDER BY n.question_id",
+    "telehealth_questionnaire": "MATCH (n:Telehealth_Questionnaire) RETURN properties(n) AS n ORDER BY n.question_id",
+    "intake_branch_rules": """
+        MATCH (q1:Intake_Questionnaire)-[r:BRANCHES_TO]->(q2:Intake_Questionnaire)
+        RETURN q1.question_id as trigger_question_id,
+               r.trigger_value as trigger_value,
+               q2.question_id as show_question_id,
+               r.rule_type as rule_type,
+               r.notes as notes
+    """,
+    "intake_q_symptom_map": """
+        MATCH (q:Intake_Questionnaire)-[r:MAPS_TO_SYMPTOM]->(s:Nodes_Symptom)
+        RETURN q.question_id as question_id,
+               s.symptom_id as symptom_id,
+               r.weight_modifier as weight_modifier
+    """,
+    "assistant_action_ui_map": """
+        MATCH (a:Nodes_Assistant_Action)-[r:HAS_UI_COMPONENT]->(u:UI_Component)
+        RETURN a.assistant_action_id as assistant_action_id,
+               u.ui_control as ui_control,
+               u.field_keys as field_keys,
+               u.min_value as min_value,
+               u.max_value as max_value,
+               u.unit_label as unit_label,
+               u.dropdown_options as dropdown_options,
+               u.placeholder_text as placeholder_text
+    """,
+    "clinician_validation_checklist": "MATCH (n:Clinician_Validation_Checklist) RETURN properties(n) AS n",
+    # Bulk relationship export, one sheet per edge sheet of the workbook
+    **EDGE_SHEET_QUERIES,
+}
+
+# Sentinel for cache misses (cached query results may be empty)
+_MISSING = object()
+
+# Bump when the snapshot layout or pickled content changes
+_SNAPSHOT_FORMAT = 1
+
+# Snapshot directories of other workbook versions are only deleted once they are
+# neither among the most recently used nor used within the grace period: workers
+# still serving an older version read its sheets from there
+_SNAPSHOT_KEEP_VERSIONS = 3
+_SNAPSHOT_GRACE_SECONDS = 24 * 3600
+
+
+def _content_hash(path: Path) -> str:
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_pickle(path: Path) -> Any:
+    """
+    Unpickle one snapshot file. Unpickling copies every object into this
+    process's heap, so each worker holds its own copy of the sheets.
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _freeze_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Write-protect a DataFrame's underlying NumPy buffers so it can be shared
+    between requests without defensive copies. In-place writes raise ValueError.
+    """
+    for block in df._mgr.blocks:
+        values = block.values
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+    return df
+
+
+class _LRUCache:
+    """Small thread-safe LRU map with a fixed capacity"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key: Any, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class KnowledgePackSnapshot:
+    """
+    One immutable, versioned load of the knowledge pack: read-only sheets plus the
+    structures compiled from them. Readers pin a snapshot for the duration of a
+    request, so a reload publishing a newer one never changes data under them.
+    Sheets are loaded on first access through the snapshot's loader and cached.
+    Builders passed to get_compiled are recorded in `builders`, which an adapter
+    shares between its snapshots so a reload can compile the same structures.
+    Builders may publish array structures to `shared_dir` (see api.utils.shared_arrays)
+    so that every worker serving this content maps one copy instead of compiling its own.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        sheets: Optional[Dict[str, pd.DataFrame]] = None,
+        source_hash: Optional[str] = None,
+        loader: Optional[Callable[[str], pd.DataFrame]] = None,
+        sheet_names: Iterable[str] = (),
+        builders: Optional[Dict[str, Callable[["KnowledgePackSnapshot"], Any]]] = None,
+        shared_dir: Optional[Path] = None,
+    ):
+        self.version = version
+        self.source_hash = source_hash
+        # Directory of this content shared across processes (None: compile per process)
+        self.shared_dir = shared_dir
+        self._sheets: Dict[str, pd.DataFrame] = {
+            name: _freeze_frame(df) for name, df in (sheets or {}).items()
+        }
+        self.sheet_names = tuple(dict.fromkeys([*self._sheets, *sheet_names]))
+        self._loader = loader
+        self._sheet_locks: Dict[str, threading.Lock] = {}
+        self._sheet_locks_lock = threading.Lock()
+        self._compiled: Dict[str, Any] = {}
+        self._builders = builders if builders is not None else {}
+        # Reentrant: builders may depend on other compiled structures
+        self._compiled_lock = threading.RLock()
+
+    @property
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        """All sheets of this snapshot (loads any not yet loaded)"""
+        self.preload()
+        return dict(self._sheets)
+
+    @property
+    def loaded_sheets(self) -> Tuple[str, ...]:
+        """Names of the sheets loaded so far"""
+        return tuple(self._sheets)
+
+    def _load_sheet(self, name: str) -> pd.DataFrame:
+        """Return a sheet, loading it once under a per-sheet lock"""
+        df = self._sheets.get(name)
+        if df is not None:
+            return df
+        loader = self._loader
+        if loader is None or name not in self.sheet_names:
+            raise KeyError(f"Sheet {name} not loaded")
+        with self._sheet_locks_lock:
+            lock = self._sheet_locks.setdefault(name, threading.Lock())
+        with lock:
+            df = self._sheets.get(name)
+            if df is None:
+                df = self._sheets[name] = _freeze_frame(loader(name))
+                if len(self._sheets) == len(self.sheet_names):
+                    # Everything is loaded: release the loader (and the source it holds)
+                    self._loader = None
+        return df
+
+    def preload(self, names: Optional[Iterable[str]] = None, workers: int = 1):
+        """Load the given sheets (default: all) now instead of on first access"""
+        pending = [n for n in (self.sheet_names if names is None else names) if n not in self._sheets]
+        if workers > 1 and len(pending) > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self._load_sheet, pending))
+        else:
+            for name in pending:
+                self._load_sheet(name)
+
+    @property
+    def pack_version(self) -> str:
+        """Version identifier of this snapshot"""
+        return self.version
+
+    def get_compiled(self, key: str, builder: Callable[["KnowledgePackSnapshot"], Any]) -> Any:
+        """
+        Get a derived structure compiled from this snapshot's sheets.
+        The builder runs once per snapshot; the result is shared by all callers
+        and must be treated as read-only.
+        """
+        self._builders.setdefault(key, builder)
+        with self._compiled_lock:
+            if key not in self._compiled:
+                self._compiled[key] = builder(self)
+            return self._compiled[key]
+
+    def get_sheet(self, name: str, mutable: bool = False) -> pd.DataFrame:
+        """
+        Get a knowledge pack sheet as DataFrame.
+        By default returns a zero-copy, read-only view of the shared sheet (in-place
+        writes raise ValueError; adding columns only affects the returned frame).
+        Pass mutable=True to get a private deep copy that may be modified.
+        """
+        df = self._load_sheet(name)
+        if mutable:
+            return df.copy()
+        return df.copy(deep=False)
+
+
+class _ExcelSheetSource:
+    """
+    Sheet loader for one workbook version (Excel mode).
+    A sheet is read from the binary snapshot directory when present. The first
+    sheet that is not there makes one pass over the workbook that parses every
+    sheet not handed out yet and writes them all to the snapshot (sheets that
+    cannot be written are kept in memory until requested), then releases the
+    workbook bytes.
+    """
+
+    def __init__(self, excel_path: Path, workbook: bytes, pack_hash: str, snapshot_dir: Optional[Path]):
+        self.excel_path = excel_path
+        self.pack_hash = pack_hash
+        self.snapshot_dir = snapshot_dir
+        # Workbook bytes are only needed while no pass over the workbook has run and
+        # some sheet is missing from the snapshot
+        self._workbook: Optional[bytes] = workbook
+        if snapshot_dir is not None and all(
+            (snapshot_dir / f"{name}.pkl").exists() for name in EXCEL_SHEET_MAPPING
+        ):
+            self._workbook = None
+        self._parsed: Dict[str, pd.DataFrame] = {}
+        self._delivered: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def load(self, name: str) -> pd.DataFrame:
+        """Load one mapped sheet (each sheet is requested once by its snapshot)"""
+        with self._lock:
+            df = self._parsed.pop(name, None)
+            if df is not None:
+                self._delivered.add(name)
+                return df
+        if self.snapshot_dir is not None:
+            path = self.snapshot_dir / f"{name}.pkl"
+            if path.exists():
+                try:
+                    df = _read_pickle(path)
+                except Exception as e:
+                    print(f"Warning: Ignoring unreadable knowledge pack snapshot {path}: {e}")
+                else:
+                    with self._lock:
+                        self._delivered.add(name)
+                    return df
+        with self._lock:
+            df = self._parsed.pop(name, None)
+            if df is None:
+                pending = [n for n in EXCEL_SHEET_MAPPING if n == name or n not in self._delivered]
+                self._parsed.update(self._parse_workbook(pending, name))
+                df = self._parsed.pop(name)
+            self._delivered.add(name)
+            return df
+
+    def _parse_workbook(self, names: List[str], requested: str) -> Dict[str, pd.DataFrame]:
+        """
+        Parse the given sheets from one open workbook and drop the bytes. Returns the
+        requested sheet plus any that could not be written to the snapshot directory.
+        """
+        workbook = self._workbook
+        if workbook is None:
+            # The snapshot was complete when this version loaded but has lost a file since:
+            # parse the workbook again if it still has this version's content
+            workbook = self.excel_path.read_bytes()
+            if hashlib.sha256(workbook).hexdigest() != self.pack_hash:
+                raise RuntimeError(
+                    f"Knowledge pack {self.excel_path} changed since version {self.pack_hash[:12]} "
+                    "was loaded; reload to serve the new content"
+                )
+        frames: Dict[str, pd.DataFrame] = {}
+        with pd.ExcelFile(io.BytesIO(workbook), engine="openpyxl") as xls:
+            for name in names:
+                actual_name = EXCEL_SHEET_MAPPING[name]
+                # Create empty DataFrame if sheet doesn't exist
+                frames[name] = xls.parse(actual_name) if actual_name in xls.sheet_names else pd.DataFrame()
+        self._workbook = None
+        if self.snapshot_dir is None:
+            return frames
+        # Sheets written to the snapshot are read back from it when requested
+        return {
+            name: df for name, df in frames.items()
+            if not self._write_snapshot_sheet(name, df) or name == requested
+        }
+
+    def _write_snapshot_sheet(self, name: str, df: pd.DataFrame) -> bool:
+        """Atomically add one sheet to the snapshot directory (skipped once superseded)"""
+        if not self.snapshot_dir.is_dir():
+            return False
+        target = self.snapshot_dir / f"{name}.pkl"
+        tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, target)
+        except Exception as e:
+            print(f"Warning: Failed to write knowledge pack snapshot {target}: {e}")
+            return False
+        return True
+
 
 class KnowledgeBaseAdapter:
     """
@@ -48,13 +414,33 @@ class KnowledgeBaseAdapter:
         neo4j_uri: Optional[str] = None,
         neo4j_user: Optional[str] = None,
         neo4j_password: Optional[str] = None,
-        neo4j_database: str = "neo4j"
+        neo4j_database: str = "neo4j",
+        use_snapshot: bool = True,
+        neo4j_load_workers: int = 4,
+        lazy_sheets: bool = True,
+        relationship_cache_size: int = 1024,
+        prewarm_relationships: bool = False
     ):
         if hasattr(self, "_initialized") and self._initialized:
             return
         
         self.use_neo4j = use_neo4j
-        self.sheets: Dict[str, pd.DataFrame] = {}
+        self.use_snapshot = use_snapshot
+        # Load each sheet on first access instead of all sheets up front
+        self.lazy_sheets = lazy_sheets
+        # Relationship query results kept per pack version (Neo4j mode)
+        self.relationship_cache_size = relationship_cache_size
+        self.prewarm_relationships = prewarm_relationships
+        # Current published snapshot; replaced by a single reference assignment on reload
+        self._snapshot: Optional[KnowledgePackSnapshot] = None
+        self._reload_lock = threading.Lock()
+        # Every structure compiled from a snapshot (through the adapter or a pinned
+        # snapshot), rebuilt on reloaded snapshots before they are published
+        self._builders: Dict[str, Callable[[KnowledgePackSnapshot], Any]] = {}
+        # Called with the new version after reload() publishes a snapshot
+        self._reload_listeners: List[Callable[[str], None]] = []
+        self._neo4j_loads = 0
+        self._watch_stop: Optional[threading.Event] = None
         self._initialized = False
         
         if use_neo4j:
@@ -66,6 +452,7 @@ class KnowledgeBaseAdapter:
             self.neo4j_user = neo4j_user or os.getenv("NEO4J_USERNAME")
             self.neo4j_password = neo4j_password or os.getenv("NEO4J_PASSWORD")
             self.neo4j_database = neo4j_database
+            self.neo4j_load_workers = max(1, neo4j_load_workers)
             
             if not all([self.neo4j_uri, self.neo4j_user, self.neo4j_password]):
                 raise ValueError("Neo4j credentials not provided")
@@ -74,156 +461,170 @@ class KnowledgeBaseAdapter:
                 self.neo4j_uri,
                 auth=(self.neo4j_user, self.neo4j_password)
             )
-            self._load_from_neo4j()
         else:
             # Fallback to Excel
             if excel_path is None:
                 raise ValueError("Must provide excel_path when not using Neo4j")
             self.excel_path = Path(excel_path)
-            self._load_excel()
+        self._snapshot = self._load()
+        self._start_prewarm()
         
         self._initialized = True
 
-    def _load_excel(self):
-        """Load data from Excel file (mock mode)"""
+    def _load(self) -> KnowledgePackSnapshot:
+        """Build a snapshot of the configured source (sheets load on first access unless eager)"""
+        if self.use_neo4j:
+            return self._load_from_neo4j()
+        return self._load_excel()
+
+    def _load_excel(self) -> KnowledgePackSnapshot:
+        """
+        Load data from Excel file (mock mode).
+        Sheets come from the binary snapshot of this workbook content when present;
+        the workbook bytes the snapshot was hashed from are only kept while some sheet
+        may still need parsing, so sheets always match the snapshot's version.
+        """
         if not self.excel_path.exists():
             raise FileNotFoundError(f"Knowledge pack Excel not found: {self.excel_path}")
         
-        xls = pd.ExcelFile(self.excel_path)
-        
-        # Map sheet names from actual Excel to expected names
-        sheet_mapping = {
-            "intake_questionnaire": "intake_questionnaire",
-            "intake_branch_rules": "intake_branch_rules",
-            "telehealth_questionnaire": "telehealth_questionnaire",
-            "intake_q_symptom_map": "intake_q_symptom_map",
-            "conditions": "nodes_condition",
-            "symptoms": "nodes_symptom",
-            "red_flags": "nodes_redflag",
-            "actions": "nodes_action_recommendation",
-            "guides": "nodes_patient_guide",
-            "templates": "nodes_message_template",
-            "assistant_action_ui_map": "assistant_action_ui_map",
-            "clinician_validation_checklist": "clinician_validation_checklist",
-            "labs": "nodes_lab",
-            "specialists": "nodes_specialist",
-            "medications": "nodes_medication_option",
-            "assistant_actions": "nodes_assistant_action",
-            "vital_rules": "nodes_vital_rule"
-        }
-        
-        for expected_name, actual_name in sheet_mapping.items():
-            if actual_name in xls.sheet_names:
-                self.sheets[expected_name] = xls.parse(actual_name)
-            else:
-                # Create empty DataFrame if sheet doesn't exist
-                self.sheets[expected_name] = pd.DataFrame()
-        
-        xls.close()
+        workbook = self.excel_path.read_bytes()
+        pack_hash = hashlib.sha256(workbook).hexdigest()
+        snapshot_dir = self._snapshot_dir(pack_hash)
+        if self.use_snapshot:
+            self._prepare_snapshot_dir(snapshot_dir)
+        source = _ExcelSheetSource(
+            self.excel_path, workbook, pack_hash, snapshot_dir if self.use_snapshot else None
+        )
+        snapshot = KnowledgePackSnapshot(
+            pack_hash[:12],
+            source_hash=pack_hash,
+            loader=source.load,
+            sheet_names=EXCEL_SHEET_MAPPING,
+            builders=self._builders,
+            shared_dir=snapshot_dir if self.use_snapshot else None,
+        )
+        if not self.lazy_sheets:
+            snapshot.preload()
+        return snapshot
+
+    def _snapshot_dir(self, pack_hash: str) -> Path:
+        """Snapshot directory for one workbook content hash (next to the workbook)"""
+        return (
+            self.excel_path.parent
+            / f".{self.excel_path.name}.snapshot"
+            / f"{pack_hash[:16]}-v{_SNAPSHOT_FORMAT}"
+        )
 
-    def _load_from_neo4j(self):
-        """Load data from Neo4j and cache as DataFrames"""
+    @staticmethod
+    def _prepare_snapshot_dir(snapshot_dir: Path):
+        """
+        Create (or mark as used) the snapshot directory and drop snapshots of older
+        workbook content past their retention (see _SNAPSHOT_KEEP_VERSIONS)
+        """
+        try:
+            snapshot_dir.mkdir(parents=True, exist_ok=True)
+            os.utime(snapshot_dir)
+            others = sorted(
+                (d for d in snapshot_dir.parent.iterdir() if d != snapshot_dir and d.is_dir()),
+                key=lambda d: d.stat().st_mtime,
+                reverse=True
+            )
+            cutoff = time.time() - _SNAPSHOT_GRACE_SECONDS
+            for stale in others[_SNAPSHOT_KEEP_VERSIONS - 1:]:
+                if stale.stat().st_mtime < cutoff:
+                    shutil.rmtree(stale, ignore_errors=True)
+        except Exception as e:
+            print(f"Warning: Failed to prepare knowledge pack snapshot {snapshot_dir}: {e}")
+
+    def _load_from_neo4j(self) -> KnowledgePackSnapshot:
+        """
+        Load data from Neo4j and cache as DataFrames.
+        Each sheet is one label query, run on first access; in eager mode all
+        queries run concurrently on a small pool of sessions. Records stream
+        straight into column buffers.
+        """
+        # Graph content has no cheap fingerprint: number the loads instead
+        self._neo4j_loads += 1
+        snapshot = KnowledgePackSnapshot(
+            f"neo4j-{self._neo4j_loads}",
+            loader=lambda name: self._fetch_neo4j_sheet(NEO4J_SHEET_QUERIES[name]),
+            sheet_names=NEO4J_SHEET_QUERIES,
+            builders=self._builders,
+        )
+        if not self.lazy_sheets:
+            snapshot.preload(workers=self.neo4j_load_workers)
+        return snapshot
+
+    def _fetch_neo4j_sheet(self, query: str) -> pd.DataFrame:
+        """Run one sheet query in its own session and build the DataFrame column-wise"""
         with self.driver.session(database=self.neo4j_database) as session:
-            
-            # Load conditions
-            result = session.run("MATCH (n:Nodes_Condition) RETURN n")
-            self.sheets["conditions"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load symptoms
-            result = session.run("MATCH (n:Nodes_Symptom) RETURN n")
-            self.sheets["symptoms"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load red flags
-            result = session.run("MATCH (n:Nodes_Redflag) RETURN n")
-            self.sheets["red_flags"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load actions
-            result = session.run("MATCH (n:Nodes_Action_Recommendation) RETURN n")
-            self.sheets["actions"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load guides
-            result = session.run("MATCH (n:Nodes_Patient_Guide) RETURN n")
-            self.sheets["guides"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load templates
-            result = session.run("MATCH (n:Nodes_Message_Template) RETURN n")
-            self.sheets["templates"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load labs
-            result = session.run("MATCH (n:Nodes_Lab) RETURN n")
-            self.sheets["labs"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load specialists
-            result = session.run("MATCH (n:Nodes_Specialist) RETURN n")
-            self.sheets["specialists"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load medications
-            result = session.run("MATCH (n:Nodes_Medication_Option) RETURN n")
-            self.sheets["medications"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load assistant actions
-            result = session.run("MATCH (n:Nodes_Assistant_Action) RETURN n")
-            self.sheets["assistant_actions"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load vital rules
-            result = session.run("MATCH (n:Nodes_Vital_Rule) RETURN n")
-            self.sheets["vital_rules"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load intake questionnaire
-            result = session.run("MATCH (n:Intake_Questionnaire) RETURN n ORDER BY n.question_id")
-            self.sheets["intake_questionnaire"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load telehealth questionnaire
-            result = session.run("MATCH (n:Telehealth_Questionnaire) RETURN n ORDER BY n.question_id")
-            self.sheets["telehealth_questionnaire"] = pd.DataFrame([dict(record["n"]) for record in result])
-            
-            # Load branch rules
-            result = session.run("""
-                MATCH (q1:Intake_Questionnaire)-[r:BRANCHES_TO]->(q2:Intake_Questionnaire)
-                RETURN q1.question_id as trigger_question_id, 
-                       r.trigger_value as trigger_value,
-                       q2.question_id as show_question_id,
-                       r.rule_type as rule_type,
-                       r.notes as notes
-            """)
-            self.sheets["intake_branch_rules"] = pd.DataFrame([dict(record) for record in result])
-            
-            # Load symptom mapping
-            result = session.run("""
-                MATCH (q:Intake_Questionnaire)-[r:MAPS_TO_SYMPTOM]->(s:Nodes_Symptom)
-                RETURN q.question_id as question_id,
-                       s.symptom_id as symptom_id,
-                       r.weight_modifier as weight_modifier
-            """)
-            self.sheets["intake_q_symptom_map"] = pd.DataFrame([dict(record) for record in result])
-            
-            # Load assistant action UI map
-            result = session.run("""
-                MATCH (a:Nodes_Assistant_Action)-[r:HAS_UI_COMPONENT]->(u:UI_Component)
-                RETURN a.assistant_action_id as assistant_action_id,
-                       u.ui_control as ui_control,
-                       u.field_keys as field_keys,
-                       u.min_value as min_value,
-                       u.max_value as max_value,
-                       u.unit_label as unit_label,
-                       u.dropdown_options as dropdown_options,
-                       u.placeholder_text as placeholder_text
-            """)
-            self.sheets["assistant_action_ui_map"] = pd.DataFrame([dict(record) for record in result])
-            
-            # Load clinician validation checklist (if exists in graph)
-            result = session.run("MATCH (n:Clinician_Validation_Checklist) RETURN n")
-            records = [dict(record["n"]) for record in result]
-            if records:
-                self.sheets["clinician_validation_checklist"] = pd.DataFrame(records)
+            result = session.run(query)
+            keys = list(result.keys())
+            if keys == ["n"]:
+                # Whole-node property maps: columns appear in first-seen order
+                columns: Dict[str, List[Any]] = {}
+                count = 0
+                for record in result:
+                    for key, value in record[0].items():
+                        column = columns.get(key)
+                        if column is None:
+                            column = columns[key] = [None] * count
+                        column.append(value)
+                    count += 1
+                    for column in columns.values():
+                        if len(column) < count:
+                            column.append(None)
             else:
-                self.sheets["clinician_validation_checklist"] = pd.DataFrame()
+                # Projected queries: one buffer per returned column
+                columns = {key: [] for key in keys}
+                buffers = list(columns.values())
+                for record in result:
+                    for buffer, value in zip(buffers, record.values()):
+                        buffer.append(value)
+                if not buffers or not buffers[0]:
+                    return pd.DataFrame()
+        return pd.DataFrame(columns)
+
+    @property
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        """All read-only sheets of the current snapshot (forces any pending loads)"""
+        return self._snapshot.sheets
+
+    @property
+    def pack_hash(self) -> Optional[str]:
+        """Content hash of the workbook behind the current snapshot (Excel mode)"""
+        return self._snapshot.source_hash
+
+    @property
+    def pack_version(self) -> str:
+        """Version of the current snapshot (workbook hash prefix, or load counter in Neo4j mode)"""
+        return self._snapshot.version
+
+    def snapshot(self) -> KnowledgePackSnapshot:
+        """
+        Pin the current knowledge pack snapshot.
+        Everything read through the returned object stays consistent even if a
+        reload publishes a new version meanwhile.
+        """
+        return self._snapshot
 
-    def get_sheet(self, name: str) -> pd.DataFrame:
-        """Get a knowledge pack sheet as DataFrame (do not modify in place)."""
-        if name not in self.sheets:
-            raise KeyError(f"Sheet {name} not loaded")
-        return self.sheets[name].copy()
+    def get_compiled(self, key: str, builder: Callable[[KnowledgePackSnapshot], Any]) -> Any:
+        """
+        Get a derived structure compiled from the current knowledge pack.
+        The builder runs once per snapshot; the result is shared by all callers
+        and must be treated as read-only. Builders are also run on reloaded
+        snapshots before they are published.
+        """
+        return self._snapshot.get_compiled(key, builder)
+
+    def get_sheet(self, name: str, mutable: bool = False) -> pd.DataFrame:
+        """
+        Get a knowledge pack sheet as DataFrame.
+        By default returns a zero-copy, read-only view of the shared sheet (in-place
+        writes raise ValueError; adding columns only affects the returned frame).
+        Pass mutable=True to get a private deep copy that may be modified.
+        """
+        return self._snapshot.get_sheet(name, mutable=mutable)
 
     def get_intake_questionnaire(self, mode: str = "full") -> pd.DataFrame:
         """Get intake questionnaire based on mode"""
@@ -293,14 +694,63 @@ class KnowledgeBaseAdapter:
         """Get clinician validation checklist"""
         return self.get_sheet("clinician_validation_checklist")
 
+    def get_graph_adjacency(self) -> GraphAdjacency:
+        """
+        Get the relationships as in-memory CSR adjacency arrays (each relationship type is
+        compiled once per pack version, on first access, from its own edge sheets).
+        Works in both modes, e.g. get_graph_adjacency()["TRIGGERS"].targets(symptom_id).
+        """
+        return get_graph_adjacency(self)
+
+    def _cached_query(self, kind: str, key: str, fetch: Callable[[str], Any]) -> Any:
+        """
+        Read-through cache for relationship queries. The LRU lives in the current
+        snapshot, so entries are scoped to one pack version and dropped on reload.
+        Callers get their own copy of the cached result.
+        """
+        cache = self._snapshot.get_compiled(
+            "relationship_queries", lambda _: _LRUCache(self.relationship_cache_size)
+        )
+        result = cache.get((kind, key), _MISSING)
+        if result is _MISSING:
+            result = fetch(key)
+            cache.put((kind, key), result)
+        return copy.deepcopy(result)
+
+    def prewarm_relationship_cache(self):
+        """Run every relationship query for all conditions and symptoms (Neo4j only)"""
+        if not self.use_neo4j:
+            raise NotImplementedError("Relationship queries require Neo4j mode")
+        calls = []
+        for condition_id in self.get_sheet("conditions").get("condition_id", pd.Series(dtype=object)).dropna():
+            calls.append((self.query_condition_with_relationships, str(condition_id)))
+            calls.append((self.query_symptoms_for_condition, str(condition_id)))
+        for symptom_id in self.get_sheet("symptoms").get("symptom_id", pd.Series(dtype=object)).dropna():
+            calls.append((self.query_red_flags_for_symptom, str(symptom_id)))
+        with ThreadPoolExecutor(max_workers=self.neo4j_load_workers) as pool:
+            list(pool.map(lambda call: call[0](call[1]), calls[:self.relationship_cache_size]))
+
+    def _prewarm_quietly(self):
+        try:
+            self.prewarm_relationship_cache()
+        except Exception as e:
+            print(f"Warning: Failed to pre-warm relationship cache: {e}")
+
+    def _start_prewarm(self):
+        if self.use_neo4j and self.prewarm_relationships:
+            threading.Thread(target=self._prewarm_quietly, name="knowledge-pack-prewarm", daemon=True).start()
+
     def query_condition_with_relationships(self, condition_id: str) -> Dict[str, Any]:
         """
         Query a condition with all its relationships (Neo4j only)
         Returns comprehensive condition data including labs, meds, actions, guides, etc.
+        Results are cached per knowledge pack version.
         """
         if not self.use_neo4j:
             raise NotImplementedError("Relationship queries require Neo4j mode")
-        
+        return self._cached_query("condition_with_relationships", condition_id, self._fetch_condition_with_relationships)
+
+    def _fetch_condition_with_relationships(self, condition_id: str) -> Dict[str, Any]:
         with self.driver.session(database=self.neo4j_database) as session:
             result = session.run("""
                 MATCH (c:Nodes_Condition {condition_id: $condition_id})
@@ -341,10 +791,12 @@ class KnowledgeBaseAdapter:
             }
 
     def query_symptoms_for_condition(self, condition_id: str) -> List[Dict[str, Any]]:
-        """Get all symptoms that support a condition with their weights"""
+        """Get all symptoms that support a condition with their weights (cached per pack version)"""
         if not self.use_neo4j:
             raise NotImplementedError("Relationship queries require Neo4j mode")
-        
+        return self._cached_query("symptoms_for_condition", condition_id, self._fetch_symptoms_for_condition)
+
+    def _fetch_symptoms_for_condition(self, condition_id: str) -> List[Dict[str, Any]]:
         with self.driver.session(database=self.neo4j_database) as session:
             result = session.run("""
                 MATCH (s:Nodes_Symptom)-[r:SUPPORTS]->(c:Nodes_Condition {condition_id: $condition_id})
@@ -362,10 +814,12 @@ class KnowledgeBaseAdapter:
             ]
 
     def query_red_flags_for_symptom(self, symptom_id: str) -> List[Dict[str, Any]]:
-        """Get all red flags triggered by a symptom"""
+        """Get all red flags triggered by a symptom (cached per pack version)"""
         if not self.use_neo4j:
             raise NotImplementedError("Relationship queries require Neo4j mode")
-        
+        return self._cached_query("red_flags_for_symptom", symptom_id, self._fetch_red_flags_for_symptom)
+
+    def _fetch_red_flags_for_symptom(self, symptom_id: str) -> List[Dict[str, Any]]:
         with self.driver.session(database=self.neo4j_database) as session:
             result = session.run("""
                 MATCH (s:Nodes_Symptom {symptom_id: $symptom_id})-[r:TRIGGERS]->(rf:Nodes_Redflag)
@@ -380,16 +834,91 @@ class KnowledgeBaseAdapter:
                 for record in result
             ]
 
-    def reload(self):
-        """Force reload data from source"""
-        with self._lock:
-            if self.use_neo4j:
-                self._load_from_neo4j()
-            else:
-                self._load_excel()
+    def reload(self) -> str:
+        """
+        Rebuild the knowledge pack from source and publish it with one atomic swap.
+        The new snapshot is fully loaded and its compiled structures built before it
+        becomes visible; requests in flight keep the snapshot they pinned. On failure
+        the current snapshot stays in service and the error is raised.
+        Reload listeners run after the swap.
+        Returns the version now being served.
+        """
+        with self._reload_lock:
+            current = self._snapshot
+            if not self.use_neo4j and _content_hash(self.excel_path) == current.source_hash:
+                return current.version
+            snapshot = self._load()
+            # Warm the sheets already in use so the swap does not move load onto requests
+            snapshot.preload(current.loaded_sheets, workers=getattr(self, "neo4j_load_workers", 1))
+            for key, builder in list(self._builders.items()):
+                snapshot.get_compiled(key, builder)
+            self._snapshot = snapshot
+        self._start_prewarm()
+        for listener in list(self._reload_listeners):
+            try:
+                listener(snapshot.version)
+            except Exception as e:
+                print(f"Warning: Knowledge pack reload listener failed for version {snapshot.version}: {e}")
+        return snapshot.version
+
+    def add_reload_listener(self, listener: Callable[[str], None]):
+        """Call listener(version) each time reload() publishes a new snapshot"""
+        self._reload_listeners.append(listener)
+
+    def remove_reload_listener(self, listener: Callable[[str], None]):
+        """Stop calling a listener added with add_reload_listener()"""
+        if listener in self._reload_listeners:
+            self._reload_listeners.remove(listener)
+
+    def reload_in_background(self) -> threading.Thread:
+        """Run reload() on a daemon thread; failures are reported and the current pack kept"""
+        thread = threading.Thread(target=self._reload_quietly, name="knowledge-pack-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _reload_quietly(self):
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"Warning: Knowledge pack reload failed, keeping version {self.pack_version}: {e}")
+
+    def watch(self, interval: float = 5.0):
+        """
+        Poll the workbook every `interval` seconds and reload when it changes (Excel mode).
+        Edits are picked up mid-session without a restart; stop with stop_watching().
+        """
+        if self.use_neo4j:
+            raise NotImplementedError("File watching requires Excel mode")
+        if self._watch_stop is not None:
+            return
+        stop = self._watch_stop = threading.Event()
+
+        def _stat():
+            try:
+                st = self.excel_path.stat()
+                return st.st_mtime_ns, st.st_size
+            except OSError:
+                return None
+
+        def _poll():
+            last = _stat()
+            while not stop.wait(interval):
+                current = _stat()
+                if current is not None and current != last:
+                    last = current
+                    self._reload_quietly()
+
+        threading.Thread(target=_poll, name="knowledge-pack-watcher", daemon=True).start()
+
+    def stop_watching(self):
+        """Stop the workbook watcher, if running"""
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
 
     def close(self):
-        """Close Neo4j connection if active"""
+        """Stop the workbook watcher and close Neo4j connection if active"""
+        self.stop_watching()
         if self.use_neo4j and hasattr(self, 'driver'):
             self.driver.close()
 
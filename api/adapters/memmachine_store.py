@@ -6,7 +6,8 @@ MemVerge MemMachine Adapter for Patient Logs and Session Management
 """
 
 import threading
-from typing import Any, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Dict, Iterable, List, Tuple
 import json
 import time
 
@@ -19,6 +20,12 @@ except ImportError:
     MemMachineClient = None
     MemMachineConfig = None
 
+# Requests kept in flight by bulk operations when the client has no batch call
+_BULK_CONCURRENCY = 8
+
+# Default for find(equals=...): match any field value (None is a value)
+_MISSING = object()
+
 
 class MemMachineStore:
     """
@@ -71,6 +78,10 @@ class MemMachineStore:
         
         self.client = MemMachineClient(config)
         self.namespace = namespace
+        # Secondary index definitions (name -> (key prefix, field)); served by scanning, see find()
+        self._index_defs: Dict[str, Tuple[str, str]] = {}
+        # Pipelines bulk operations as concurrent requests when batch calls are unavailable
+        self._bulk_pool = ThreadPoolExecutor(max_workers=_BULK_CONCURRENCY, thread_name_prefix="memmachine-bulk")
         self._initialized = True
 
     def set(
@@ -90,10 +101,9 @@ class MemMachineStore:
             namespace: Namespace for key isolation
         """
         full_key = self._make_key(namespace, key)
-        
-        # Serialize value to JSON
-        serialized_value = json.dumps(value) if not isinstance(value, str) else value
-        
+        self._set_full_key(full_key, self._serialize(value), ttl)
+
+    def _set_full_key(self, full_key: str, serialized_value: str, ttl: Optional[int]):
         # Set with TTL if provided
         if ttl:
             self.client.set(full_key, serialized_value, ttl=ttl)
@@ -123,12 +133,7 @@ class MemMachineStore:
             value = self.client.get(full_key)
             if value is None:
                 return default
-            
-            # Try to deserialize JSON
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return self._deserialize(value)
         except Exception:
             return default
 
@@ -167,7 +172,7 @@ class MemMachineStore:
         Returns:
             List of matching keys (without namespace prefix)
         """
-        prefix = f"{namespace}:"
+        prefix = self._make_key(namespace, "")
         
         try:
             all_keys = self.client.keys(f"{prefix}{pattern}")
@@ -176,6 +181,45 @@ class MemMachineStore:
         except Exception:
             return []
 
+    def keys_with_prefix(self, prefix: str, namespace: str = "default") -> list:
+        """Get keys starting with prefix (a server-side pattern match)."""
+        return self.keys(pattern=f"{prefix}*", namespace=namespace)
+
+    def register_index(self, name: str, prefix: str, field: str):
+        """
+        Register a secondary index for find(). MemMachine has no secondary indexes,
+        so find() falls back to a prefix scan plus one bulk read.
+        """
+        self._index_defs[name] = (prefix, field)
+
+    def find(
+        self,
+        index: str,
+        equals: Any = _MISSING,
+        exclude: Iterable[Any] = (),
+        namespace: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        Get entries by indexed field value (equals), or all entries not in exclude;
+        same contract as MockMemoryStore.find (a missing field counts as None, and
+        entries with an unhashable field value are never matched).
+        """
+        prefix, field = self._index_defs[index]
+        exclude = set(exclude)
+        values = self.get_multi(self.keys_with_prefix(prefix, namespace), namespace)
+        result = {}
+        for key, value in values.items():
+            if not isinstance(value, dict):
+                continue
+            field_value = value.get(field)
+            try:
+                hash(field_value)
+            except TypeError:
+                continue
+            if field_value == equals if equals is not _MISSING else field_value not in exclude:
+                result[key] = value
+        return result
+
     def clear(self, namespace: Optional[str] = None):
         """Remove all keys in namespace or entire store."""
         if namespace is None:
@@ -210,23 +254,89 @@ class MemMachineStore:
             return new_value
 
     def get_multi(self, keys: list, namespace: str = "default") -> Dict[str, Any]:
-        """Get multiple keys at once."""
+        """
+        Get multiple keys at once: one batch request, or concurrent requests
+        if the client has no batch call.
+        """
+        full_keys = {key: self._make_key(namespace, key) for key in keys}
+        if hasattr(self.client, "get_multi"):
+            # Batch call: {full_key: value} for the keys that exist
+            values = self.client.get_multi(list(full_keys.values()))
+        else:
+            values = dict(zip(full_keys.values(), self._bulk_pool.map(self._get_quietly, full_keys.values())))
+        
         result = {}
-        for key in keys:
-            value = self.get(key, namespace)
+        for key, full_key in full_keys.items():
+            value = values.get(full_key)
             if value is not None:
-                result[key] = value
+                result[key] = self._deserialize(value)
         return result
 
     def set_multi(
         self, 
         items: Dict[str, Any], 
         ttl: Optional[int] = None, 
-        namespace: str = "default"
+        namespace: str = "default",
+        ttls: Optional[Dict[str, int]] = None
     ):
-        """Set multiple key-value pairs at once."""
+        """
+        Set multiple key-value pairs at once (ttls: optional per-key TTLs overriding ttl).
+        Sent as batch requests (one per distinct TTL), or concurrent requests if the
+        client has no batch call.
+        """
+        by_ttl: Dict[Optional[int], Dict[str, str]] = {}
         for key, value in items.items():
-            self.set(key, value, ttl, namespace)
+            key_ttl = ttls.get(key, ttl) if ttls else ttl
+            by_ttl.setdefault(key_ttl or None, {})[self._make_key(namespace, key)] = self._serialize(value)
+        
+        for key_ttl, batch in by_ttl.items():
+            if not hasattr(self.client, "set_multi"):
+                self._run_bulk([
+                    (self._set_full_key, full_key, serialized_value, key_ttl)
+                    for full_key, serialized_value in batch.items()
+                ])
+            elif key_ttl:
+                self.client.set_multi(batch, ttl=key_ttl)
+            else:
+                self.client.set_multi(batch)
+
+    def delete_multi(self, keys: list, namespace: str = "default"):
+        """Delete multiple keys at once (batch request, or concurrent requests)."""
+        full_keys = [self._make_key(namespace, key) for key in keys]
+        if hasattr(self.client, "delete_multi"):
+            self.client.delete_multi(full_keys)
+        else:
+            self._run_bulk([(self._delete_quietly, full_key) for full_key in full_keys])
+
+    def _get_quietly(self, full_key: str) -> Any:
+        try:
+            return self.client.get(full_key)
+        except Exception:
+            return None
+
+    def _delete_quietly(self, full_key: str):
+        try:
+            self.client.delete(full_key)
+        except Exception:
+            pass
+
+    def _run_bulk(self, calls: List[tuple]):
+        """Run (fn, *args) calls concurrently; re-raises the first error."""
+        futures = [self._bulk_pool.submit(fn, *args) for fn, *args in calls]
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    def _serialize(value: Any) -> str:
+        return json.dumps(value) if not isinstance(value, str) else value
+
+    @staticmethod
+    def _deserialize(value: Any) -> Any:
+        # Try to deserialize JSON
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return value
 
     def _make_key(self, namespace: str, key: str) -> str:
         """Create full key with namespace prefix."""
@@ -285,7 +395,8 @@ def get_memmachine_store(
 
 
 def reset_memmachine_store():
-    """Reset singleton (for testing)"""
+    """Reset singleton (for testing); the next store gets a new client"""
     global _memmachine_store_instance
     _memmachine_store_instance = None
+    MemMachineStore._instance = None
 
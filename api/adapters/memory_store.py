@@ -3,13 +3,379 @@
 Proprietary and confidential.
 """
 
+import heapq
+import os
+import struct
 import threading
 import time
 import json
 import pickle
-from typing import Any, Optional, Dict
+import zlib
+from contextlib import ExitStack, contextmanager
+from typing import Any, Optional, Dict, Iterable, Iterator, List, Set, Tuple
 from pathlib import Path
 
+# WAL record framing: payload length and CRC32, followed by the pickled record
+_WAL_HEADER = struct.Struct("<II")
+
+# Compact (snapshot + drop log segments) early once the live segment grows past this
+_WAL_COMPACT_BYTES = 64 * 1024 * 1024
+
+# TTL reaper: longest sleep between checks (s), and most keys evicted per lock hold
+_REAP_INTERVAL = 30.0
+_REAP_BATCH = 256
+
+
+class _WriteAheadLog:
+    """
+    Append-only log of memory store mutations, kept in numbered segment files
+    (`<persist_path>.wal.<generation>`). Records are queued in memory under the
+    store lock and written by group commit: whichever writer commits first writes
+    and fsyncs everything pending on behalf of all writers waiting on it.
+    A failed write breaks the segment: commit() raises for every record of that
+    batch and of later ones, until rotate() starts a new segment.
+    """
+
+    def __init__(self, persist_path: Path, generation: int, sync: bool = True):
+        self._persist_path = persist_path
+        self._sync = sync
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._appended = 0
+        # Records up to this sequence have been written, or have failed
+        self._flushed = 0
+        self._flushing = False
+        # Error breaking the current segment, and the sequence ranges (start, end]
+        # lost to failed writes with their error
+        self.error: Optional[Exception] = None
+        self._failed: List[Tuple[int, int, Exception]] = []
+        self.size = 0
+        self.generation = generation
+        self._file = open(_segment_path(persist_path, generation), "ab")
+
+    @staticmethod
+    def encode(record: tuple) -> bytes:
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        return _WAL_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def append(self, data: bytes) -> int:
+        """
+        Queue an encoded record and return its sequence number for commit().
+        Called under the store lock, so log order matches the order mutations were applied.
+        """
+        with self._cond:
+            self._pending.append(data)
+            self._appended += 1
+            self.size += len(data)
+            return self._appended
+
+    def commit(self, seq: int):
+        """
+        Block until record `seq` has been written (and fsynced, if sync is on).
+        Raises OSError if its write failed.
+        """
+        with self._cond:
+            while self._flushed < seq:
+                if self._flushing:
+                    self._cond.wait()
+                else:
+                    self._flush()
+            for start, end, error in self._failed:
+                if start < seq <= end:
+                    raise OSError(f"Memory store log write failed: {error}") from error
+
+    def _flush(self):
+        """Write all pending records. Called with the condition held; releases it during I/O."""
+        batch, self._pending = self._pending, []
+        start, upto = self._flushed, self._appended
+        error = self.error
+        self._flushing = True
+        self._cond.release()
+        try:
+            if batch and error is None:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                if self._sync:
+                    os.fsync(self._file.fileno())
+        except Exception as e:
+            print(f"Warning: Failed to write memory store log: {e}")
+            error = e
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            if batch and error is not None:
+                # A partial write leaves a torn record that ends replay of this
+                # segment: later records fail too until the next segment
+                self.error = error
+                if self._failed and self._failed[-1][1] == start and self._failed[-1][2] is error:
+                    start = self._failed.pop()[0]
+                self._failed.append((start, upto, error))
+            self._flushed = upto
+            self._cond.notify_all()
+
+    def rotate(self) -> int:
+        """
+        Flush pending records and continue in a new segment; returns its generation.
+        Called under the store lock, so the rotation is a consistent cut of the store.
+        A new segment clears a write error: the snapshot taken at this cut holds the
+        changes whose records were lost.
+        """
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._flush()
+            self._file.close()
+            self.generation += 1
+            self.size = 0
+            self._file = open(_segment_path(self._persist_path, self.generation), "ab")
+            self.error = None
+            return self.generation
+
+    def close(self):
+        with self._cond:
+            while self._flushing:
+                self._cond.wait()
+            self._flush()
+            self._file.close()
+
+
+def _segment_path(persist_path: Path, generation: int) -> Path:
+    """Path of WAL segment `generation` for a store persisted at `persist_path`."""
+    return persist_path.with_name(f"{persist_path.name}.wal.{generation}")
+
+
+def _wal_segments(persist_path: Path) -> List[Tuple[int, Path]]:
+    """Existing WAL segments as (generation, path), oldest first."""
+    segments = []
+    for path in persist_path.parent.glob(f"{persist_path.name}.wal.*"):
+        suffix = path.name.rsplit(".", 1)[-1]
+        if suffix.isdigit():
+            segments.append((int(suffix), path))
+    return sorted(segments)
+
+
+def _read_wal_segment(path: Path) -> Iterator[tuple]:
+    """Records of one WAL segment; stops at a torn or corrupt tail (crash mid-write)."""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_WAL_HEADER.size)
+            if len(header) < _WAL_HEADER.size:
+                return
+            length, crc = _WAL_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                print(f"Warning: Ignoring truncated memory store log tail in {path}")
+                return
+            yield pickle.loads(payload)
+
+
+_MISSING = object()
+
+
+def _dumps(value: Any) -> bytes:
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _loads(data: bytes) -> Any:
+    return pickle.loads(data)
+
+
+# Lock stripes in MockMemoryStore: keys are spread across shards by hash
+_SHARD_COUNT = 16
+
+
+class _Shard:
+    """
+    One lock stripe of MockMemoryStore: the entries whose key hashes to it, their
+    TTL deadlines and their prefix/secondary index entries.
+    Values are stored pickled when `pickled` (persisted stores), else by reference.
+    Methods other than the constructor are called with `lock` held.
+    """
+
+    def __init__(self, index_defs: Dict[str, Tuple[str, str]], reaper_wakeup: threading.Event, pickled: bool = False):
+        self.lock = threading.Lock()
+        self.pickled = pickled
+        # full key -> stored value (pickled bytes if `pickled`)
+        self.store: Dict[str, Any] = {}
+        self.expiry: Dict[str, float] = {}
+        # Min-heap of (deadline, full key); entries whose deadline no longer matches
+        # expiry (key deleted or re-set) are stale and skipped
+        self.expiry_heap: List[Tuple[float, str]] = []
+        self._reaper_wakeup = reaper_wakeup
+        # "namespace:prefix:" -> full keys, for keys of the form "prefix:..."
+        self.prefix_keys: Dict[str, Set[str]] = {}
+        # Secondary indexes: definitions (name -> (key prefix, field)) are shared by all
+        # shards and owned by the store; per shard, (namespace, field value) -> full keys
+        # and full key -> its (namespace, field value) entry for removal
+        self.index_defs = index_defs
+        self.index_entries: Dict[str, Dict[Tuple[str, Any], Set[str]]] = {name: {} for name in index_defs}
+        self.index_values: Dict[str, Dict[str, Tuple[str, Any]]] = {name: {} for name in index_defs}
+
+    # --- Mutations (shared by live operations and log replay) ---
+
+    def apply_set(self, full_key: str, data: Any, expires_at: Optional[float], value: Any = _MISSING):
+        """Store a value in stored form; `value` is its unpickled form, if at hand, for indexing."""
+        if full_key in self.store:
+            self._unindex(full_key)
+        self.store[full_key] = data
+        self._index(full_key, data, value)
+        if expires_at is not None:
+            self.expiry[full_key] = expires_at
+            self._push_deadline(full_key, expires_at)
+        elif full_key in self.expiry:
+            del self.expiry[full_key]
+
+    def apply_delete(self, full_key: str) -> bool:
+        """Remove a key; True if it was present."""
+        self.expiry.pop(full_key, None)
+        if self.store.pop(full_key, _MISSING) is _MISSING:
+            return False
+        self._unindex(full_key)
+        return True
+
+    def apply_clear(self, namespace: Optional[str]):
+        if namespace is None:
+            self.store.clear()
+            self.expiry.clear()
+            self.expiry_heap.clear()
+            self.prefix_keys.clear()
+            for name in self.index_defs:
+                self.index_entries[name] = {}
+                self.index_values[name] = {}
+        else:
+            prefix = f"{namespace}:"
+            keys_to_delete = [k for k in self.store.keys() if k.startswith(prefix)]
+            for k in keys_to_delete:
+                self.apply_delete(k)
+
+    def live(self, full_key: str) -> bool:
+        """True if the key is present and unexpired; an expired key is removed."""
+        if full_key in self.expiry and time.time() >= self.expiry[full_key]:
+            self.apply_delete(full_key)
+            return False
+        return full_key in self.store
+
+    def reindex(self):
+        """Rebuild indexes and the expiry heap from store/expiry (after recovery)."""
+        self.prefix_keys.clear()
+        for name in self.index_defs:
+            self.index_entries[name] = {}
+            self.index_values[name] = {}
+        for full_key, data in self.store.items():
+            self._index(full_key, data)
+        self.expiry_heap = [(deadline, key) for key, deadline in self.expiry.items()]
+        heapq.heapify(self.expiry_heap)
+
+    # --- TTL expiry ---
+
+    def _push_deadline(self, full_key: str, expires_at: float):
+        heapq.heappush(self.expiry_heap, (expires_at, full_key))
+        if self.expiry_heap[0] == (expires_at, full_key):
+            # New earliest deadline: the reaper may be sleeping past it
+            self._reaper_wakeup.set()
+        # Rebuild once stale entries (re-set or deleted keys) dominate the heap
+        if len(self.expiry_heap) > 2 * len(self.expiry) + 1024:
+            self.expiry_heap = [(deadline, key) for key, deadline in self.expiry.items()]
+            heapq.heapify(self.expiry_heap)
+
+    def reap(self, now: float, limit: int) -> int:
+        """Evict up to `limit` keys due by `now`; returns the number of heap entries processed."""
+        processed = 0
+        heap = self.expiry_heap
+        while heap and heap[0][0] <= now and processed < limit:
+            deadline, full_key = heapq.heappop(heap)
+            if self.expiry.get(full_key) == deadline:
+                self.apply_delete(full_key)
+            processed += 1
+        return processed
+
+    def next_deadline(self) -> Optional[float]:
+        return self.expiry_heap[0][0] if self.expiry_heap else None
+
+    # --- Indexes ---
+
+    @staticmethod
+    def _key_prefix(full_key: str) -> Optional[str]:
+        """Prefix index bucket of a key: "namespace:name:" for keys of the form "name:..."."""
+        namespace, _, key = full_key.partition(":")
+        name, sep, _ = key.partition(":")
+        return f"{namespace}:{name}:" if sep else None
+
+    def add_index(self, name: str):
+        """Start maintaining a newly registered secondary index over existing entries."""
+        self.index_entries[name] = {}
+        self.index_values[name] = {}
+        key_prefix = self.index_defs[name][0]
+        for full_key, data in self.store.items():
+            if full_key.partition(":")[2].startswith(key_prefix):
+                self._index_entry(name, full_key, self.load(data))
+
+    def load(self, data: Any) -> Any:
+        """A value from its stored form"""
+        return _loads(data) if self.pickled else data
+
+    def find(self, name: str, namespace: str, equals: Any, exclude: Set[Any]) -> List[Tuple[str, Any]]:
+        """(full key, stored value) of live entries matching a secondary index query (see MockMemoryStore.find)."""
+        field = self.index_defs[name][1]
+        entries = self.index_entries[name]
+        if equals is not _MISSING:
+            buckets = [(equals, entries.get((namespace, equals), ()))]
+        else:
+            buckets = [
+                (field_value, keys) for (ns, field_value), keys in entries.items()
+                if ns == namespace and field_value not in exclude
+            ]
+        found = []
+        for field_value, keys in buckets:
+            for full_key in list(keys):
+                if not self.live(full_key):
+                    continue
+                data = self.store[full_key]
+                # Values stored by reference: skip entries changed in place since set()
+                if self.pickled or data.get(field) == field_value:
+                    found.append((full_key, data))
+        return found
+
+    def _index(self, full_key: str, data: Any, value: Any = _MISSING):
+        prefix = self._key_prefix(full_key)
+        if prefix is not None:
+            self.prefix_keys.setdefault(prefix, set()).add(full_key)
+        key = full_key.partition(":")[2]
+        for name, (key_prefix, _) in self.index_defs.items():
+            if key.startswith(key_prefix):
+                if value is _MISSING:
+                    value = self.load(data)
+                self._index_entry(name, full_key, value)
+
+    def _index_entry(self, name: str, full_key: str, value: Any):
+        """Add an entry (whose key has the index's prefix) to a secondary index."""
+        field = self.index_defs[name][1]
+        namespace = full_key.partition(":")[0]
+        if not isinstance(value, dict):
+            return
+        entry = (namespace, value.get(field))
+        try:
+            self.index_entries[name].setdefault(entry, set()).add(full_key)
+        except TypeError:
+            return  # Unhashable field value: not indexed
+        self.index_values[name][full_key] = entry
+
+    def _unindex(self, full_key: str):
+        prefix = self._key_prefix(full_key)
+        if prefix is not None:
+            keys = self.prefix_keys.get(prefix)
+            if keys is not None:
+                keys.discard(full_key)
+                if not keys:
+                    del self.prefix_keys[prefix]
+        for name in self.index_defs:
+            entry = self.index_values[name].pop(full_key, None)
+            if entry is not None:
+                keys = self.index_entries[name][entry]
+                keys.discard(full_key)
+                if not keys:
+                    del self.index_entries[name][entry]
+
 
 class MockMemoryStore:
     """
@@ -19,13 +385,22 @@ class MockMemoryStore:
     Singleton behavior enforced.
     
     Features:
-    - Thread-safe operations
-    - TTL (time-to-live) support
-    - Optional persistence to disk
+    - Thread-safe operations, lock-striped: keys are spread over shards, each with its
+      own lock, so operations on different keys rarely contend
+    - TTL (time-to-live) support; expired keys are evicted by a background reaper
+    - Optional persistence to disk (snapshot + write-ahead log, see persist_path)
     - Namespace support for multi-tenancy
+    - Key prefix index and registered secondary indexes (see find())
+    - With persistence, values are stored pickled (the form the log writes): reads
+      return private copies, so changing a returned value in place never changes the
+      store or a snapshot; set() it to save. In memory only, values are stored by
+      reference, without a serialization round-trip
+    - A persisted write whose log record fails to reach disk raises OSError; the
+      change stays applied in memory and is persisted by the next snapshot
     """
     
     _instance = None
+    # Guards singleton construction only; data is guarded by the shard locks
     _lock = threading.Lock()
 
     def __new__(cls, *args, **kwargs):
@@ -34,18 +409,45 @@ class MockMemoryStore:
                 cls._instance = super(MockMemoryStore, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self, persist_path: Optional[str] = None):
+    def __init__(
+        self,
+        persist_path: Optional[str] = None,
+        sync_writes: bool = True,
+        snapshot_interval: float = 300.0,
+        shards: int = _SHARD_COUNT
+    ):
+        """
+        Args:
+            persist_path: Snapshot file; mutations are appended to a write-ahead log
+                beside it and the log is compacted into the snapshot periodically
+            sync_writes: fsync the log before a write returns (group-committed)
+            snapshot_interval: Seconds between background snapshots (compaction)
+            shards: Number of lock stripes
+        """
         if hasattr(self, "_initialized") and self._initialized:
             return
         
-        self._store: Dict[str, Any] = {}
-        self._expiry: Dict[str, float] = {}
+        self._index_defs: Dict[str, Tuple[str, str]] = {}
+        self._reaper_stop = threading.Event()
+        self._reaper_wakeup = threading.Event()
         self._persist_path = Path(persist_path) if persist_path else None
+        pickled = self._persist_path is not None
+        self._shards = [_Shard(self._index_defs, self._reaper_wakeup, pickled) for _ in range(max(1, shards))]
+        self._wal: Optional[_WriteAheadLog] = None
+        self._snapshot_lock = threading.Lock()
+        self._compact_wakeup = threading.Event()
+        self._closed = False
         self._initialized = True
         
-        # Load persisted data if available
-        if self._persist_path and self._persist_path.exists():
-            self._load_from_disk()
+        # Recover persisted data (snapshot + log replay), then start a fresh log segment
+        if self._persist_path:
+            generation = self._load_from_disk()
+            self._persist_path.parent.mkdir(parents=True, exist_ok=True)
+            self._wal = _WriteAheadLog(self._persist_path, generation, sync=sync_writes)
+            self.snapshot()
+            self._snapshot_interval = snapshot_interval
+            threading.Thread(target=self._compaction_loop, name="memory-store-compaction", daemon=True).start()
+        threading.Thread(target=self._reaper_loop, name="memory-store-ttl-reaper", daemon=True).start()
 
     def set(self, key: str, value: Any, ttl: Optional[int] = None, namespace: str = "default"):
         """
@@ -58,17 +460,15 @@ class MockMemoryStore:
             namespace: Namespace for key isolation (default: "default")
         """
         full_key = self._make_key(namespace, key)
+        expires_at = time.time() + ttl if ttl is not None else None
+        data = self._stored(value)
+        record = self._encode_record("put", full_key, data, expires_at)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            self._store[full_key] = value
-            
-            if ttl is not None:
-                self._expiry[full_key] = time.time() + ttl
-            elif full_key in self._expiry:
-                del self._expiry[full_key]
-            
-            if self._persist_path:
-                self._save_to_disk()
+        with shard.lock:
+            shard.apply_set(full_key, data, expires_at, value)
+            seq = self._log(record)
+        self._commit(seq)
 
     def get(self, key: str, namespace: str = "default", default: Any = None) -> Any:
         """
@@ -83,19 +483,14 @@ class MockMemoryStore:
             Stored value or default
         """
         full_key = self._make_key(namespace, key)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            # Check expiry
-            if full_key in self._expiry:
-                if time.time() >= self._expiry[full_key]:
-                    # Key expired
-                    del self._store[full_key]
-                    del self._expiry[full_key]
-                    if self._persist_path:
-                        self._save_to_disk()
-                    return default
-            
-            return self._store.get(full_key, default)
+        with shard.lock:
+            # Expired keys are removed unlogged: recovery drops keys whose logged deadline has passed
+            if not shard.live(full_key):
+                return default
+            data = shard.store[full_key]
+        return self._value(data)
 
     def delete(self, key: str, namespace: str = "default"):
         """
@@ -106,15 +501,12 @@ class MockMemoryStore:
             namespace: Namespace to search in
         """
         full_key = self._make_key(namespace, key)
+        record = self._encode_record("delete", full_key)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            if full_key in self._store:
-                del self._store[full_key]
-            if full_key in self._expiry:
-                del self._expiry[full_key]
-            
-            if self._persist_path:
-                self._save_to_disk()
+        with shard.lock:
+            seq = self._log(record) if shard.apply_delete(full_key) else None
+        self._commit(seq)
 
     def exists(self, key: str, namespace: str = "default") -> bool:
         """
@@ -128,18 +520,10 @@ class MockMemoryStore:
             True if key exists and is not expired
         """
         full_key = self._make_key(namespace, key)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            if full_key in self._expiry:
-                if time.time() >= self._expiry[full_key]:
-                    # Key expired
-                    del self._store[full_key]
-                    del self._expiry[full_key]
-                    if self._persist_path:
-                        self._save_to_disk()
-                    return False
-            
-            return full_key in self._store
+        with shard.lock:
+            return shard.live(full_key)
 
     def get_ttl(self, key: str, namespace: str = "default") -> Optional[int]:
         """
@@ -153,20 +537,22 @@ class MockMemoryStore:
             Remaining seconds or None if no TTL set or key doesn't exist
         """
         full_key = self._make_key(namespace, key)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            if full_key not in self._store:
+        with shard.lock:
+            if full_key not in shard.store:
                 return None
             
-            if full_key not in self._expiry:
+            if full_key not in shard.expiry:
                 return None
             
-            remaining = self._expiry[full_key] - time.time()
+            remaining = shard.expiry[full_key] - time.time()
             return max(0, int(remaining))
 
     def keys(self, pattern: str = "*", namespace: str = "default") -> list:
         """
         Get all keys matching pattern in namespace.
+        Shards are read one at a time, in order.
         
         Args:
             pattern: Pattern to match (supports * wildcard)
@@ -176,35 +562,107 @@ class MockMemoryStore:
             List of matching keys (without namespace prefix)
         """
         prefix = f"{namespace}:"
+        # Expired keys not yet evicted by the reaper are skipped, not swept
+        current_time = time.time()
+        matching = []
         
-        with self._lock:
-            # Clean up expired keys first
-            current_time = time.time()
-            expired = [k for k, exp in self._expiry.items() if current_time >= exp]
-            for k in expired:
-                if k in self._store:
-                    del self._store[k]
-                del self._expiry[k]
-            
-            # Find matching keys
-            matching = []
-            for full_key in self._store.keys():
-                if not full_key.startswith(prefix):
-                    continue
-                
-                key = full_key[len(prefix):]
-                
-                if pattern == "*":
-                    matching.append(key)
-                elif "*" in pattern:
-                    # Simple wildcard matching
-                    pattern_parts = pattern.split("*")
-                    if all(part in key for part in pattern_parts if part):
+        for shard in self._shards:
+            with shard.lock:
+                for full_key in shard.store.keys():
+                    if not full_key.startswith(prefix):
+                        continue
+                    deadline = shard.expiry.get(full_key)
+                    if deadline is not None and current_time >= deadline:
+                        continue
+                    
+                    key = full_key[len(prefix):]
+                    
+                    if pattern == "*":
                         matching.append(key)
-                elif key == pattern:
-                    matching.append(key)
+                    elif "*" in pattern:
+                        # Simple wildcard matching
+                        pattern_parts = pattern.split("*")
+                        if all(part in key for part in pattern_parts if part):
+                            matching.append(key)
+                    elif key == pattern:
+                        matching.append(key)
+        
+        return matching
+
+    def keys_with_prefix(self, prefix: str, namespace: str = "default") -> list:
+        """
+        Get keys starting with prefix, without scanning the store for prefixes
+        of the form "name:" (e.g. "intake_session:"), which are always indexed.
+        
+        Args:
+            prefix: Key prefix
+            namespace: Namespace to search in
             
-            return matching
+        Returns:
+            List of matching, unexpired keys (without namespace prefix)
+        """
+        ns_prefix = f"{namespace}:"
+        indexed = prefix.endswith(":") and prefix.count(":") == 1
+        matching = []
+        
+        for shard in self._shards:
+            with shard.lock:
+                if indexed:
+                    candidates = list(shard.prefix_keys.get(ns_prefix + prefix, ()))
+                else:
+                    candidates = [k for k in shard.store if k.startswith(ns_prefix + prefix)]
+                matching.extend(k[len(ns_prefix):] for k in candidates if shard.live(k))
+        return matching
+
+    def register_index(self, name: str, prefix: str, field: str):
+        """
+        Maintain a secondary index on `field` of the dict values stored under keys
+        starting with `prefix` (in every namespace), for find().
+        Registering the same definition again is a no-op.
+        
+        Args:
+            name: Index name
+            prefix: Key prefix of the indexed entries (e.g. "intake_session:")
+            field: Dict field to index (e.g. "status"); values must be hashable
+        """
+        if self._index_defs.get(name) == (prefix, field):
+            return
+        with self._all_shards():
+            self._index_defs[name] = (prefix, field)
+            for shard in self._shards:
+                shard.add_index(name)
+
+    def find(
+        self,
+        index: str,
+        equals: Any = _MISSING,
+        exclude: Iterable[Any] = (),
+        namespace: str = "default"
+    ) -> Dict[str, Any]:
+        """
+        Get entries through a registered secondary index, in O(matching entries).
+        
+        Args:
+            index: Name given to register_index()
+            equals: Only entries whose field has this value (default: any value)
+            exclude: Field values to leave out (when equals is not given)
+            namespace: Namespace to search in
+            
+        Returns:
+            Dictionary of key-value pairs (without namespace prefix)
+        """
+        if index not in self._index_defs:
+            raise KeyError(index)
+        ns_prefix = f"{namespace}:"
+        exclude = set(exclude)
+        result = {}
+        
+        for shard in self._shards:
+            with shard.lock:
+                found = shard.find(index, namespace, equals, exclude)
+            for full_key, data in found:
+                result[full_key[len(ns_prefix):]] = self._value(data)
+        return result
 
     def clear(self, namespace: Optional[str] = None):
         """
@@ -213,20 +671,13 @@ class MockMemoryStore:
         Args:
             namespace: Namespace to clear (None = clear all)
         """
-        with self._lock:
-            if namespace is None:
-                self._store.clear()
-                self._expiry.clear()
-            else:
-                prefix = f"{namespace}:"
-                keys_to_delete = [k for k in self._store.keys() if k.startswith(prefix)]
-                for k in keys_to_delete:
-                    del self._store[k]
-                    if k in self._expiry:
-                        del self._expiry[k]
-            
-            if self._persist_path:
-                self._save_to_disk()
+        record = self._encode_record("clear", namespace)
+        
+        with self._all_shards():
+            for shard in self._shards:
+                shard.apply_clear(namespace)
+            seq = self._log(record)
+        self._commit(seq)
 
     def increment(self, key: str, amount: int = 1, namespace: str = "default") -> int:
         """
@@ -241,23 +692,26 @@ class MockMemoryStore:
             New value after increment
         """
         full_key = self._make_key(namespace, key)
+        shard = self._shard(full_key)
         
-        with self._lock:
-            current = self._store.get(full_key, 0)
+        with shard.lock:
+            current = self._value(shard.store[full_key]) if full_key in shard.store else 0
             if not isinstance(current, (int, float)):
                 raise ValueError(f"Key {key} contains non-numeric value")
             
             new_value = current + amount
-            self._store[full_key] = new_value
-            
-            if self._persist_path:
-                self._save_to_disk()
-            
-            return new_value
+            data = self._stored(new_value)
+            expires_at = shard.expiry.get(full_key)
+            shard.apply_set(full_key, data, expires_at, new_value)
+            seq = self._log(self._encode_record("put", full_key, data, expires_at))
+        
+        self._commit(seq)
+        return new_value
 
     def get_multi(self, keys: list, namespace: str = "default") -> Dict[str, Any]:
         """
-        Get multiple keys at once.
+        Get multiple keys at once, as one consistent read (the shards holding
+        the keys are locked together, once).
         
         Args:
             keys: List of keys to retrieve
@@ -266,61 +720,271 @@ class MockMemoryStore:
         Returns:
             Dictionary of key-value pairs (excludes missing/expired keys)
         """
+        full_keys = {key: self._make_key(namespace, key) for key in keys}
+        found = {}
+        
+        with self._locked(self._shard_index(full_key) for full_key in full_keys.values()):
+            for key, full_key in full_keys.items():
+                shard = self._shard(full_key)
+                if shard.live(full_key):
+                    found[key] = shard.store[full_key]
         result = {}
-        for key in keys:
-            value = self.get(key, namespace)
+        for key, data in found.items():
+            value = self._value(data)
             if value is not None:
                 result[key] = value
         return result
 
-    def set_multi(self, items: Dict[str, Any], ttl: Optional[int] = None, namespace: str = "default"):
+    def set_multi(
+        self,
+        items: Dict[str, Any],
+        ttl: Optional[int] = None,
+        namespace: str = "default",
+        ttls: Optional[Dict[str, int]] = None
+    ):
         """
-        Set multiple key-value pairs at once.
+        Set multiple key-value pairs at once, atomically: one lock acquisition per
+        shard involved and a single log record (one write/fsync when persisting).
         
         Args:
             items: Dictionary of key-value pairs to set
             ttl: TTL to apply to all keys
             namespace: Namespace to use
+            ttls: Optional per-key TTLs overriding ttl
         """
+        if not items:
+            return
+        now = time.time()
+        entries = []
         for key, value in items.items():
-            self.set(key, value, ttl, namespace)
+            key_ttl = ttls.get(key, ttl) if ttls else ttl
+            entries.append((self._make_key(namespace, key), self._stored(value), now + key_ttl if key_ttl is not None else None))
+        record = self._encode_record("put_multi", entries)
+        
+        with self._locked(self._shard_index(full_key) for full_key, _, _ in entries):
+            for (full_key, data, expires_at), value in zip(entries, items.values()):
+                self._shard(full_key).apply_set(full_key, data, expires_at, value)
+            seq = self._log(record)
+        self._commit(seq)
+
+    def delete_multi(self, keys: list, namespace: str = "default"):
+        """
+        Delete multiple keys at once, atomically (see set_multi).
+        
+        Args:
+            keys: List of keys to delete
+            namespace: Namespace to search in
+        """
+        full_keys = [self._make_key(namespace, key) for key in keys]
+        
+        with self._locked(self._shard_index(full_key) for full_key in full_keys):
+            deleted = [full_key for full_key in full_keys if self._shard(full_key).apply_delete(full_key)]
+            seq = self._log(self._encode_record("delete_multi", deleted)) if deleted else None
+        self._commit(seq)
 
     def _make_key(self, namespace: str, key: str) -> str:
         """Create full key with namespace prefix"""
         return f"{namespace}:{key}"
 
-    def _save_to_disk(self):
-        """Persist store to disk"""
-        if not self._persist_path:
+    def _stored(self, value: Any) -> Any:
+        """Stored form of a value: pickled when persisting (outside the lock), else the value itself"""
+        return _dumps(value) if self._persist_path else value
+
+    def _value(self, data: Any) -> Any:
+        """A value from its stored form (see _stored)"""
+        return _loads(data) if self._persist_path else data
+
+    def _shard_index(self, full_key: str) -> int:
+        return hash(full_key) % len(self._shards)
+
+    def _shard(self, full_key: str) -> _Shard:
+        return self._shards[self._shard_index(full_key)]
+
+    @contextmanager
+    def _locked(self, shard_indexes: Iterable[int]):
+        """Hold the locks of the given shards (always taken in shard order, so never deadlocks)."""
+        with ExitStack() as stack:
+            for index in sorted(set(shard_indexes)):
+                stack.enter_context(self._shards[index].lock)
+            yield
+
+    def _all_shards(self):
+        """Hold every shard lock."""
+        return self._locked(range(len(self._shards)))
+
+    # --- TTL expiry ---
+
+    def _reaper_loop(self):
+        """
+        Evict expired keys shortly after their deadline, in small batches so no
+        single lock hold is long, then sleep until the next deadline (woken early
+        when an earlier one is set).
+        """
+        while not self._reaper_stop.is_set():
+            now = time.time()
+            processed = 0
+            for shard in self._shards:
+                with shard.lock:
+                    processed += shard.reap(now, _REAP_BATCH)
+            if processed:
+                continue
+            # Cleared before reading the deadlines, so a deadline set meanwhile still wakes us
+            self._reaper_wakeup.clear()
+            next_deadline = now + _REAP_INTERVAL
+            for shard in self._shards:
+                with shard.lock:
+                    deadline = shard.next_deadline()
+                if deadline is not None:
+                    next_deadline = min(next_deadline, deadline)
+            self._reaper_wakeup.wait(min(max(next_deadline - now, 0.0), _REAP_INTERVAL))
+
+    # --- Persistence: snapshot + write-ahead log ---
+
+    def _encode_record(self, *record) -> Optional[bytes]:
+        """Serialize a log record (outside the lock where possible); None without persistence."""
+        return _WriteAheadLog.encode(record) if self._wal else None
+
+    def _log(self, record: Optional[bytes]) -> Optional[int]:
+        """
+        Queue an encoded record in the log, under the lock of the shard(s) it changes,
+        so per-key log order matches apply order; returns the sequence to commit.
+        """
+        if record is None or self._wal is None:
+            return None
+        return self._wal.append(record)
+
+    def _commit(self, seq: Optional[int]):
+        """
+        Wait for a logged record to reach disk (outside the lock, so writers group-commit).
+        Raises OSError if it failed; compaction then runs at once to persist the change
+        in a snapshot and continue in a new log segment.
+        """
+        wal = self._wal
+        if seq is None or wal is None:
             return
-        
         try:
-            self._persist_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(self._persist_path, 'wb') as f:
-                pickle.dump({
-                    'store': self._store,
-                    'expiry': self._expiry
-                }, f)
-        except Exception as e:
-            print(f"Warning: Failed to persist memory store: {e}")
+            wal.commit(seq)
+        except OSError:
+            self._compact_wakeup.set()
+            raise
+        if wal.size > _WAL_COMPACT_BYTES:
+            self._compact_wakeup.set()
 
-    def _load_from_disk(self):
-        """Load persisted store from disk"""
-        try:
-            with open(self._persist_path, 'rb') as f:
-                data = pickle.load(f)
-                self._store = data.get('store', {})
-                self._expiry = data.get('expiry', {})
-                
-                # Clean up expired keys
-                current_time = time.time()
-                expired = [k for k, exp in self._expiry.items() if current_time >= exp]
-                for k in expired:
-                    if k in self._store:
-                        del self._store[k]
-                    del self._expiry[k]
-        except Exception as e:
-            print(f"Warning: Failed to load persisted memory store: {e}")
+    def _replay(self, record: tuple):
+        op, args = record[0], record[1:]
+        if op == "put":
+            self._shard(args[0]).apply_set(*args)
+        elif op == "put_multi":
+            for full_key, data, expires_at in args[0]:
+                self._shard(full_key).apply_set(full_key, data, expires_at)
+        elif op == "delete":
+            self._shard(args[0]).apply_delete(*args)
+        elif op == "delete_multi":
+            for full_key in args[0]:
+                self._shard(full_key).apply_delete(full_key)
+        elif op == "clear":
+            for shard in self._shards:
+                shard.apply_clear(*args)
+
+    def snapshot(self):
+        """
+        Write a full snapshot and delete the log segments it covers (compaction).
+        Only a copy of the dicts is taken under the shard locks. The values in it are
+        immutable pickles, so writing and fsync happen outside the locks.
+        """
+        if self._wal is None:
+            return
+        with self._snapshot_lock:
+            values, expiry = {}, {}
+            with self._all_shards():
+                for shard in self._shards:
+                    values.update(shard.store)
+                    expiry.update(shard.expiry)
+                generation = self._wal.rotate()
+            try:
+                tmp = self._persist_path.with_name(self._persist_path.name + ".tmp")
+                with open(tmp, 'wb') as f:
+                    pickle.dump({
+                        'values': values,
+                        'expiry': expiry,
+                        'wal_generation': generation
+                    }, f, protocol=pickle.HIGHEST_PROTOCOL)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self._persist_path)
+            except Exception as e:
+                # Log segments are kept; the next snapshot (or recovery) covers them
+                print(f"Warning: Failed to persist memory store: {e}")
+                return
+            for segment_generation, path in _wal_segments(self._persist_path):
+                if segment_generation < generation:
+                    path.unlink(missing_ok=True)
+
+    def _compaction_loop(self):
+        while True:
+            self._compact_wakeup.wait(self._snapshot_interval)
+            self._compact_wakeup.clear()
+            if self._closed:
+                return
+            self.snapshot()
+
+    def close(self):
+        """Stop background compaction and expiry, write a final snapshot and close the log."""
+        self._reaper_stop.set()
+        self._reaper_wakeup.set()
+        if self._wal is None or self._closed:
+            return
+        self._closed = True
+        self._compact_wakeup.set()
+        self.snapshot()
+        with self._all_shards():
+            wal, self._wal = self._wal, None
+        wal.close()
+
+    def _load_from_disk(self) -> int:
+        """
+        Recover from the snapshot plus replay of the log segments written after it
+        (called from __init__, before any other thread uses the store).
+        Returns the generation to start the new log segment at.
+        """
+        generation = 0
+        if self._persist_path.exists():
+            try:
+                with open(self._persist_path, 'rb') as f:
+                    data = pickle.load(f)
+                    expiry = data.get('expiry', {})
+                    if 'values' in data:
+                        values = data['values']
+                    else:
+                        # Snapshots of the whole store, written before the log, hold values unpickled
+                        values = {k: _dumps(v) for k, v in data.get('store', {}).items()}
+                    for full_key, value in values.items():
+                        shard = self._shard(full_key)
+                        shard.store[full_key] = value
+                        if full_key in expiry:
+                            shard.expiry[full_key] = expiry[full_key]
+                    generation = data.get('wal_generation', 0)
+            except Exception as e:
+                print(f"Warning: Failed to load persisted memory store: {e}")
+        
+        for segment_generation, path in _wal_segments(self._persist_path):
+            # Older segments are already in the snapshot (left behind by a crash mid-compaction)
+            if segment_generation >= generation:
+                try:
+                    for record in _read_wal_segment(path):
+                        self._replay(record)
+                except Exception as e:
+                    print(f"Warning: Failed to replay memory store log {path}: {e}")
+            generation = max(generation, segment_generation + 1)
+        
+        # Rebuild indexes and expiry heaps, and clean up expired keys
+        current_time = time.time()
+        for shard in self._shards:
+            shard.reindex()
+            expired = [k for k, exp in shard.expiry.items() if current_time >= exp]
+            for k in expired:
+                shard.apply_delete(k)
+        return generation
 
     def stats(self) -> Dict[str, Any]:
         """
@@ -329,19 +993,24 @@ class MockMemoryStore:
         Returns:
             Dictionary with store stats
         """
-        with self._lock:
-            namespaces = {}
-            for full_key in self._store.keys():
-                if ':' in full_key:
-                    ns = full_key.split(':', 1)[0]
-                    namespaces[ns] = namespaces.get(ns, 0) + 1
-            
-            return {
-                'total_keys': len(self._store),
-                'keys_with_ttl': len(self._expiry),
-                'namespaces': namespaces,
-                'persist_enabled': self._persist_path is not None
-            }
+        namespaces = {}
+        total_keys = keys_with_ttl = 0
+        for shard in self._shards:
+            with shard.lock:
+                for full_key in shard.store.keys():
+                    if ':' in full_key:
+                        ns = full_key.split(':', 1)[0]
+                        namespaces[ns] = namespaces.get(ns, 0) + 1
+                total_keys += len(shard.store)
+                keys_with_ttl += len(shard.expiry)
+        
+        return {
+            'total_keys': total_keys,
+            'keys_with_ttl': keys_with_ttl,
+            'namespaces': namespaces,
+            'persist_enabled': self._persist_path is not None,
+            'shards': len(self._shards)
+        }
 
 
 # Factory function for singleton instance
@@ -391,6 +1060,13 @@ def get_memory_store(
 
 
 def reset_memory_store():
-    """Reset singleton (for testing)"""
+    """
+    Close and reset the singleton (for testing); the next store is opened afresh,
+    e.g. to recover from disk
+    """
     global _memory_store_instance
-    _memory_store_instance = None
\ No newline at end of file
+    store = MockMemoryStore._instance
+    _memory_store_instance = None
+    MockMemoryStore._instance = None
+    if store is not None:
+        store.close()
\ No newline at end of file
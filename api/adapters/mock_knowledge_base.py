@@ -3,10 +3,12 @@
 Proprietary and confidential.
 """
 
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional
 
 import pandas as pd
 
+from api.adapters.knowledge_base import KnowledgePackSnapshot
+
 class MockKnowledgeBaseAdapter:
     """
     Purely mock/test double for the knowledge base adapter.
@@ -26,6 +28,8 @@ class MockKnowledgeBaseAdapter:
         if hasattr(self, "_initialized") and self._initialized:
             return
         self._sheets: Dict[str, pd.DataFrame] = {}
+        self._pack_version = 0
+        self._snapshot = KnowledgePackSnapshot("mock-0", {})
         self._initialized = True
 
     def inject_sheet(self, name: str, data: Any):
@@ -41,11 +45,27 @@ class MockKnowledgeBaseAdapter:
             self._sheets[name] = pd.DataFrame(data)
         else:
             raise ValueError("Unknown sheet data type for injection")
+        self._invalidate()
+
+    def _invalidate(self):
+        # Publish a new read-only snapshot, like the real adapter's reload
+        self._pack_version += 1
+        self._snapshot = KnowledgePackSnapshot(f"mock-{self._pack_version}", dict(self._sheets))
+
+    @property
+    def pack_version(self) -> str:
+        return self._snapshot.version
+
+    def snapshot(self) -> KnowledgePackSnapshot:
+        return self._snapshot
+
+    def get_compiled(self, key: str, builder: Callable[[KnowledgePackSnapshot], Any]) -> Any:
+        return self._snapshot.get_compiled(key, builder)
 
-    def get_sheet(self, name: str) -> pd.DataFrame:
-        if name not in self._sheets:
+    def get_sheet(self, name: str, mutable: bool = False) -> pd.DataFrame:
+        if name not in self._snapshot.sheet_names:
             raise KeyError(f"Sheet {name} not in test mock (inject first)")
-        return self._sheets[name].copy()
+        return self._snapshot.get_sheet(name, mutable=mutable)
 
     # Sheet-specific shortcut methods, exactly like real adapter
     def get_intake_questionnaire(self, mode: str = "full") -> pd.DataFrame:
@@ -91,6 +111,7 @@ class MockKnowledgeBaseAdapter:
     def clear(self):
         """Clear all injected sheets."""
         self._sheets.clear()
+        self._invalidate()
 
 # Factory function for test harnesses
 _mock_knowledge_base_adapter_instance: Optional[MockKnowledgeBaseAdapter] = None
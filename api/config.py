@@ -27,6 +27,8 @@ class Settings(BaseSettings):
     STAFF_PIN_LENGTH: int = Field(default=6, env="STAFF_PIN_LENGTH")
     SSO_MOCK: bool = Field(default=True, env="SSO_MOCK")
     SESSION_COOKIE_NAME: str = Field(default="clinic_session", env="SESSION_COOKIE_NAME")
+    # Key admin routes (knowledge pack reload) require in X-Admin-Key; unset disables them
+    ADMIN_API_KEY: Optional[str] = Field(default=None, env="ADMIN_API_KEY")
 
     # Database (using SQLite for MVP, upgradeable to Postgres)
     SQLALCHEMY_DATABASE_URI: str = Field(default="sqlite:///./data/clinic.db", env="DATABASE_URL")
@@ -34,6 +36,13 @@ class Settings(BaseSettings):
 
     # Knowledge Pack Excel
     KNOWLEDGE_PACK_PATH: str = Field(default="data/knowledge_pack/clinical_knowledge_pack_prefilled_v02_with_questionnaire.xlsx", env="KNOWLEDGE_PACK_PATH")
+    # Poll the workbook and hot-reload on change every N seconds (0 disables)
+    KNOWLEDGE_PACK_WATCH_SECONDS: float = Field(default=0, env="KNOWLEDGE_PACK_WATCH_SECONDS")
+    # Compile the pack and run a synthetic triage at startup; /api/ready reports ready once done
+    KNOWLEDGE_PACK_WARM_UP: bool = Field(default=True, env="KNOWLEDGE_PACK_WARM_UP")
+
+    # Triage scoring: "heuristic" (fixed key symptom weight) or "weighted" (SUPPORTS edge weights)
+    TRIAGE_SCORING_MODE: str = Field(default="heuristic", env="TRIAGE_SCORING_MODE")
 
     # Mock adapters for Neo4j and MemVerge
     MOCK_NEO4J: bool = Field(default=True, env="MOCK_NEO4J")
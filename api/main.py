@@ -4,6 +4,7 @@ Proprietary and confidential.
 """
 
 import uvicorn
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any
 from fastapi import FastAPI, Request, Response, status, Depends
 from fastapi.middleware.cors import CORSMiddleware
@@ -25,6 +26,11 @@ from api.routes import (
     memory
 )
 from api.services.audit_logger import get_audit_logger
+from api.services.providers import (
+    KnowledgePackProvider,
+    get_knowledge_pack_provider,
+    install_knowledge_pack_provider
+)
 
 # Helper function for audit events
 async def emit_audit_event(event_type: str, actor_type: str, actor_id: Optional[str] = None, 
@@ -53,7 +59,24 @@ APP_METADATA = {
     "openapi_url": "/api/openapi.json",
 }
 
-app = FastAPI(**APP_METADATA)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application-scoped knowledge pack, triage engine and explanation engine,
+    shared by all routes through api.services.providers dependencies.
+    A provider already installed on app.state (e.g. by a test) is kept.
+    The pack is warmed up in the background; see /api/ready.
+    Memory store indexes used by the routes are registered here, once.
+    """
+    clinician.register_session_indexes()
+    provider = getattr(app.state, "knowledge_pack", None) or install_knowledge_pack_provider(app)
+    provider.start()
+    try:
+        yield
+    finally:
+        provider.close()
+
+app = FastAPI(**APP_METADATA, lifespan=lifespan)
 
 # CORS setup: allow only clinic/trusted frontends and local dev access
 if settings.ENV in ("development",):
@@ -84,9 +107,6 @@ app.add_middleware(
     max_age=60 * settings.SESSION_EXPIRE_MINUTES
 )
 
-# Knowledge pack is loaded lazily by TriageEngine when first used
-# No need to pre-load on startup
-
 # --- ROUTERS (MUST MATCH SYSTEM WORKFLOWS: DO NOT REMOVE OR COLLAPSE) ---
 app.include_router(clinician.router, prefix=settings.API_PREFIX + "/clinician", tags=["Clinician"])
 app.include_router(questionnaire.router, prefix=settings.API_PREFIX + "/questionnaire", tags=["Questionnaire"])
@@ -152,6 +172,23 @@ async def root():
 async def health_check():
     return {"status": "ok", "app": settings.APP_NAME, "version": settings.VERSION}
 
+@app.get("/api/ready", tags=["Health"])
+async def readiness_check(provider: KnowledgePackProvider = Depends(get_knowledge_pack_provider)):
+    """
+    Readiness for load balancers: 503 until the knowledge pack has been loaded,
+    compiled and primed with a synthetic triage. Failed warm-ups are retried with
+    backoff (and re-run after a hot reload). /api/health is liveness only.
+    """
+    if not provider.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={
+                "status": "retrying" if provider.warm_up_error else "warming_up",
+                "error": provider.warm_up_error
+            },
+        )
+    return {"status": "ready", "knowledge_pack_version": provider.kb.pack_version}
+
 # --- RUN APP ---
 
 def run():
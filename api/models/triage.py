@@ -67,6 +67,7 @@ class TriageResult(BaseModel):
 
     # Always presented for clinicians
     top_5_conditions: List[ConditionProbability] = Field(..., description="Top 5 conditions with probabilities")
+    differential: Optional[List[ConditionProbability]] = Field(None, description="Full ranked differential (only when requested)")
     
     # Assistant/actions/follow-up logic (clinical staff/clinician only)
     assistant_actions: List[AssistantAction] = Field(default_factory=list, description="Assistant actions needed")
@@ -76,4 +77,17 @@ class TriageResult(BaseModel):
     suggestions: List[SuggestionItem] = Field(default_factory=list, description="Labs, referrals, med categories, actions, guides")
     wrapup: Optional[Dict[str, Any]] = Field(default_factory=dict, description="For clinical wrap-up section")
     patient_communication_draft: Optional[str] = Field(default=None, description="System-generated draft for patient (no probabilities or sensitive data)")
-    audit_event_id: Optional[str] = None
\ No newline at end of file
+    knowledge_pack_version: Optional[str] = Field(None, description="Knowledge pack snapshot version this triage was computed against")
+    audit_event_id: Optional[str] = None
+
+class TriageBatchRequest(BaseModel):
+    intake_session_tokens: List[str] = Field(..., min_length=1, description="Intake sessions to triage")
+    actor_type: Optional[str] = Field(None, description="Who requested the triage (audit), default clinician")
+    actor_id: Optional[str] = None
+    include_differential: bool = Field(default=False, description="Include the full differential in each result")
+    is_rerun: bool = Field(default=False, description="Audit the batch as a re-triage")
+
+class TriageBatchResult(BaseModel):
+    results: List[TriageResult] = Field(default_factory=list, description="One triage result per session found")
+    missing_session_tokens: List[str] = Field(default_factory=list, description="Requested sessions with no intake data to triage")
+    audit_event_id: Optional[str] = Field(None, description="Grouped audit event covering the whole batch")
@@ -3,7 +3,7 @@
 Proprietary and confidential.
 """
 
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Depends
 from typing import Optional
 from datetime import datetime
 import uuid
@@ -17,23 +17,16 @@ from api.services.audit_logger import get_audit_logger
 from api.adapters.memory_store import get_memory_store
 from api.models.triage import TriageResult
 from api.services.triage_engine import TriageEngine
+from api.services.providers import get_triage_engine
 from api.config import settings
 
 router = APIRouter()
 
-# Singleton for triage engine
-_triage_engine_instance: Optional[TriageEngine] = None
-
-def get_triage_engine() -> TriageEngine:
-    global _triage_engine_instance
-    if _triage_engine_instance is None:
-        _triage_engine_instance = TriageEngine(settings.KNOWLEDGE_PACK_PATH)
-    return _triage_engine_instance
-
 @router.post("/apply", response_model=AssistantActionApplyResponse, tags=["Assistant"])
 async def apply_assistant_action(
     req: AssistantActionApplyRequest,
-    request: Request
+    request: Request,
+    triage_engine: TriageEngine = Depends(get_triage_engine)
 ):
     """
     Endpoint for clinical staff to complete an assistant action.
@@ -42,7 +35,6 @@ async def apply_assistant_action(
     """
     memory_store = get_memory_store()
     audit_logger = get_audit_logger()
-    triage_engine = get_triage_engine()
 
     session_token = req.intake_session_token
     session = memory_store.get(f"intake_session:{session_token}")
@@ -95,7 +87,8 @@ async def apply_assistant_action(
         }
     )
 
-    # Instantly re-triage after update
+    # Instantly re-triage after update (engine reuses this session's cached score
+    # components and only recomputes those affected by the changed field)
     triage_result = triage_engine.run(
         intake_data,
         previous_triage_id=None,
@@ -55,24 +55,6 @@ async def check_in_patient(
         patient_id = f"pt_{uuid.uuid4().hex[:16]}"
     case_id = f"case_{uuid.uuid4().hex[:16]}"
 
-    # Store in memory (for MVP; should persist in DB later)
-    memory_store.set(f"patient:{patient_id}", {
-        "patient_id": patient_id,
-        "first_name": req.first_name,
-        "last_name": req.last_name,
-        "dob": req.dob,
-        "checked_in_at": now.isoformat(),
-        "case_id": case_id,
-        "status": "waiting"
-    }, ttl=24 * 3600)  # 1 day TTL
-
-    memory_store.set(f"case:{case_id}", {
-        "case_id": case_id,
-        "patient_id": patient_id,
-        "checkin_time": now.isoformat(),
-        "status": "waiting"
-    }, ttl=24 * 3600)
-
     # Generate intake session token
     session_token = f"q_{uuid.uuid4().hex[:20]}"
     expires_at = now + timedelta(minutes=settings.TOKEN_EXPIRE_MINUTES)
@@ -91,8 +73,28 @@ async def check_in_patient(
         reported_by=None,
         audit_trail=[]
     )
-    
-    memory_store.set(f"intake_session:{session_token}", session_obj.dict(), ttl=settings.TOKEN_EXPIRE_MINUTES * 60)
+
+    # Store in memory (for MVP; should persist in DB later), as one bulk write
+    memory_store.set_multi({
+        f"patient:{patient_id}": {
+            "patient_id": patient_id,
+            "first_name": req.first_name,
+            "last_name": req.last_name,
+            "dob": req.dob,
+            "checked_in_at": now.isoformat(),
+            "case_id": case_id,
+            "status": "waiting"
+        },
+        f"case:{case_id}": {
+            "case_id": case_id,
+            "patient_id": patient_id,
+            "checkin_time": now.isoformat(),
+            "status": "waiting"
+        },
+        f"intake_session:{session_token}": session_obj.dict(),
+    }, ttl=24 * 3600, ttls={  # 1 day TTL, except the intake session token
+        f"intake_session:{session_token}": settings.TOKEN_EXPIRE_MINUTES * 60
+    })
 
     audit_event_id = audit_logger.log_event(
         event_type="check_in",
@@ -11,20 +11,22 @@ import uuid
 from api.adapters.memory_store import get_memory_store
 from api.models.intake import IntakeSession, IntakeQuestionnaireResponse
 from api.models.triage import TriageResult
-from api.services.triage_engine import TriageEngine
 from api.services.audit_logger import get_audit_logger
 from api.config import settings
 
 router = APIRouter()
 
-# Singleton for triage engine
-_triage_engine_instance: Optional[TriageEngine] = None
+# Memory store index of intake sessions by status, used by the dashboard
+SESSION_STATUS_INDEX = "intake_session_status"
 
-def get_triage_engine() -> TriageEngine:
-    global _triage_engine_instance
-    if _triage_engine_instance is None:
-        _triage_engine_instance = TriageEngine(settings.KNOWLEDGE_PACK_PATH)
-    return _triage_engine_instance
+def register_session_indexes(memory_store=None):
+    """
+    Register the memory store indexes used by these routes. Called at startup to
+    build them early, and by the routes that read them (a no-op once registered),
+    so they also work on a store opened without the app lifespan.
+    """
+    memory_store = memory_store or get_memory_store()
+    memory_store.register_index(SESSION_STATUS_INDEX, "intake_session:", "status")
 
 @router.get("/dashboard", response_model=List[IntakeSession], tags=["Clinician"])
 async def clinician_dashboard():
@@ -33,13 +35,10 @@ async def clinician_dashboard():
     Only sessions with status not 'completed'.
     """
     memory_store = get_memory_store()
-    sessions = []
-    # Scan all keys for sessions (inefficient for MVP, replace with real DB)
-    keys = memory_store.keys(pattern="intake_session:*")
-    for key in keys:
-        session = memory_store.get(key)
-        if session and session.get("status") != "completed":
-            sessions.append(IntakeSession(**session))
+    # Served from the store's secondary index on session status (no full key scan)
+    register_session_indexes(memory_store)
+    active = memory_store.find(SESSION_STATUS_INDEX, exclude=("completed",))
+    sessions = [IntakeSession(**session) for session in active.values()]
     # Order by started_at descending (most recent first)
     sessions = sorted(sessions, key=lambda s: s.started_at, reverse=True)
     return sessions
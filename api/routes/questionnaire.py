@@ -3,55 +3,79 @@
 Proprietary and confidential.
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Dict, Any, Optional
-from api.adapters.knowledge_base import get_knowledge_base_adapter
-from api.config import settings
+from fastapi import APIRouter, HTTPException, Query, Request, Response, Depends
+from typing import Dict, Any, List
+import pandas as pd
+from api.services.providers import get_knowledge_base
+from api.utils.http_cache import CachedJSON
 
 router = APIRouter()
 
+QUESTIONNAIRE_SHEETS = {
+    "full": "intake_questionnaire",
+    "telehealth": "telehealth_questionnaire",
+}
+
+
+def _records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Sheet rows as JSON-safe records (empty cells become null)."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def _cached_response(request: Request, kb, key: str, sheet: str, build) -> Response:
+    """
+    Serve a knowledge pack payload serialized once per pack version.
+    Payloads are compiled into the knowledge pack snapshot, so a reload rebuilds them.
+    """
+    payload = kb.get_compiled(key, lambda snapshot: CachedJSON(build(_records(snapshot.get_sheet(sheet)))))
+    return payload.response(request)
+
+
 @router.get("/intake", tags=["Questionnaire"])
 async def get_intake_questionnaire(
-    mode: str = Query("full", description="Intake questionnaire mode: 'full' or 'telehealth'")
+    request: Request,
+    mode: str = Query("full", description="Intake questionnaire mode: 'full' or 'telehealth'"),
+    kb=Depends(get_knowledge_base)
 ):
     """
     Returns the exact intake questionnaire from knowledge pack.
     Branching and rendering are determined by the frontend using these definitions.
+    Supports If-None-Match (ETag) revalidation and gzip/br encodings.
     """
-    kb = get_knowledge_base_adapter(settings.KNOWLEDGE_PACK_PATH)
+    if mode not in QUESTIONNAIRE_SHEETS:
+        raise HTTPException(status_code=400, detail="mode must be 'full' or 'telehealth'")
     try:
-        if mode not in ("full", "telehealth"):
-            raise HTTPException(status_code=400, detail="mode must be 'full' or 'telehealth'")
-        df = kb.get_intake_questionnaire(mode=mode)
-        records = df.to_dict(orient="records")
-        return {"mode": mode, "questionnaire": records}
+        return _cached_response(
+            request, kb, f"http:questionnaire:{mode}", QUESTIONNAIRE_SHEETS[mode],
+            lambda records: {"mode": mode, "questionnaire": records}
+        )
     except Exception as ex:
         raise HTTPException(status_code=500, detail=f"Error loading questionnaire: {ex}")
 
 @router.get("/branch_rules", tags=["Questionnaire"])
-async def get_branch_rules():
+async def get_branch_rules(request: Request, kb=Depends(get_knowledge_base)):
     """
     Returns intake_branch_rules as defined in the knowledge pack.
     Used for frontend branching logic and assistant triggers.
     """
-    kb = get_knowledge_base_adapter(settings.KNOWLEDGE_PACK_PATH)
     try:
-        df = kb.get_branch_rules()
-        records = df.to_dict(orient="records")
-        return {"branch_rules": records}
+        return _cached_response(
+            request, kb, "http:branch_rules", "intake_branch_rules",
+            lambda records: {"branch_rules": records}
+        )
     except Exception as ex:
         raise HTTPException(status_code=500, detail=f"Error loading branch rules: {ex}")
 
 @router.get("/symptom_map", tags=["Questionnaire"])
-async def get_symptom_map():
+async def get_symptom_map(request: Request, kb=Depends(get_knowledge_base)):
     """
     Returns the intake_q_symptom_map as defined in the knowledge pack.
     Maps questionnaire items to symptoms for inference.
     """
-    kb = get_knowledge_base_adapter(settings.KNOWLEDGE_PACK_PATH)
     try:
-        df = kb.get_symptom_map()
-        records = df.to_dict(orient="records")
-        return {"symptom_map": records}
+        return _cached_response(
+            request, kb, "http:symptom_map", "intake_q_symptom_map",
+            lambda records: {"symptom_map": records}
+        )
     except Exception as ex:
-        raise HTTPException(status_code=500, detail=f"Error loading symptom map: {ex}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error loading symptom map: {ex}")
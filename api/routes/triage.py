@@ -3,33 +3,27 @@
 Proprietary and confidential.
 """
 
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 from datetime import datetime
 import uuid
 
 from api.models.intake import IntakeSession, IntakeQuestionnaireResponse
-from api.models.triage import TriageResult
+from api.models.triage import TriageResult, TriageBatchRequest, TriageBatchResult
 from api.services.triage_engine import TriageEngine
+from api.services.providers import get_knowledge_base, get_triage_engine
 from api.services.audit_logger import get_audit_logger
 from api.adapters.memory_store import get_memory_store
-from api.config import settings
+from api.utils.auth import require_admin_key
 
 router = APIRouter()
 
-# Singleton engine instance for now (per process, hot-reloads with gunicorn reload)
-_triage_engine_instance: Optional[TriageEngine] = None
-
-def get_triage_engine() -> TriageEngine:
-    global _triage_engine_instance
-    if _triage_engine_instance is None:
-        _triage_engine_instance = TriageEngine(settings.KNOWLEDGE_PACK_PATH)
-    return _triage_engine_instance
-
 @router.post("/run", response_model=TriageResult, tags=["Triage"])
 async def run_triage(
     req: dict,
-    request: Request
+    request: Request,
+    triage_engine: TriageEngine = Depends(get_triage_engine)
 ):
     """
     Perform triage reasoning on submitted intake.
@@ -38,7 +32,6 @@ async def run_triage(
     """
     memory_store = get_memory_store()
     audit_logger = get_audit_logger()
-    triage_engine = get_triage_engine()
 
     session_token = req.get("intake_session_token") or req.get("session_token")
     if not session_token:
@@ -54,6 +47,7 @@ async def run_triage(
         previous_triage_id=None,
         actor_type=req.get("actor_type"),
         actor_id=req.get("actor_id"),
+        include_differential=bool(req.get("include_differential")),
     )
 
     audit_event_id = audit_logger.log_event(
@@ -64,10 +58,128 @@ async def run_triage(
         patient_id=intake_data.patient_id,
         metadata={
             "triage_id": triage_result.triage_id,
-            "timestamp": triage_result.timestamp.isoformat()
+            "timestamp": triage_result.timestamp.isoformat(),
+            "knowledge_pack_version": triage_result.knowledge_pack_version
         }
     )
 
     triage_result.audit_event_id = audit_event_id
 
-    return triage_result
\ No newline at end of file
+    return triage_result
+
+@router.post("/run_batch", response_model=TriageBatchResult, tags=["Triage"])
+async def run_triage_batch(
+    req: TriageBatchRequest,
+    request: Request,
+    triage_engine: TriageEngine = Depends(get_triage_engine)
+):
+    """
+    Perform triage on many intake sessions in one call (e.g. re-triage of the
+    waiting room after a knowledge pack update).
+    Sessions are loaded with one bulk read, scored together, and covered by a
+    single grouped audit event.
+    """
+    memory_store = get_memory_store()
+    audit_logger = get_audit_logger()
+
+    session_tokens = req.intake_session_tokens
+    sessions = memory_store.get_multi([f"intake_session:{token}" for token in session_tokens])
+    found_tokens = []
+    missing_tokens = []
+    intakes = []
+    for token in session_tokens:
+        session = sessions.get(f"intake_session:{token}")
+        if not session or not session.get("intake_data"):
+            missing_tokens.append(token)
+            continue
+        found_tokens.append(token)
+        intakes.append(IntakeQuestionnaireResponse(**session["intake_data"]))
+
+    results = triage_engine.run_batch(
+        intakes,
+        actor_type=req.actor_type,
+        actor_id=req.actor_id,
+        include_differential=req.include_differential,
+    )
+
+    audit_event_id = audit_logger.log_event(
+        event_type="re-triage_batch" if req.is_rerun else "triage_batch",
+        actor_type=req.actor_type or "clinician",
+        actor_id=req.actor_id,
+        session_token=None,
+        patient_id=None,
+        metadata={
+            "triages": [
+                {
+                    "session_token": token,
+                    "patient_id": intake.patient_id,
+                    "triage_id": result.triage_id,
+                    "timestamp": result.timestamp.isoformat(),
+                    "knowledge_pack_version": result.knowledge_pack_version
+                }
+                for token, intake, result in zip(found_tokens, intakes, results)
+            ],
+            "missing_session_tokens": missing_tokens
+        }
+    )
+
+    for result in results:
+        result.audit_event_id = audit_event_id
+
+    return TriageBatchResult(
+        results=results,
+        missing_session_tokens=missing_tokens,
+        audit_event_id=audit_event_id
+    )
+
+
+@router.get("/knowledge_pack", tags=["Triage"])
+async def get_knowledge_pack_version(kb=Depends(get_knowledge_base)):
+    """Report the knowledge pack version currently served to new triage runs."""
+    return {"knowledge_pack_version": kb.pack_version}
+
+@router.post("/knowledge_pack/reload", tags=["Triage"], dependencies=[Depends(require_admin_key)])
+async def reload_knowledge_pack(
+    req: dict,
+    request: Request,
+    kb=Depends(get_knowledge_base)
+):
+    """
+    Reload the knowledge pack without a restart.
+    The new pack is loaded and compiled off to the side and published with one
+    atomic swap; triage runs already in progress finish on the version they started
+    with. With "background": true the call returns immediately.
+    Admin only: requires the X-Admin-Key header (settings.ADMIN_API_KEY).
+    """
+    audit_logger = get_audit_logger()
+    previous_version = kb.pack_version
+
+    if req.get("background"):
+        kb.reload_in_background()
+        knowledge_pack_version = previous_version
+        status_label = "reloading"
+    else:
+        try:
+            knowledge_pack_version = await run_in_threadpool(kb.reload)
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Knowledge pack reload failed: {e}")
+        status_label = "reloaded" if knowledge_pack_version != previous_version else "unchanged"
+
+    audit_logger.log_event(
+        event_type="knowledge_pack_reload",
+        actor_type=req.get("actor_type", "admin"),
+        actor_id=req.get("actor_id"),
+        session_token=None,
+        patient_id=None,
+        metadata={
+            "status": status_label,
+            "previous_version": previous_version,
+            "knowledge_pack_version": knowledge_pack_version
+        }
+    )
+
+    return {
+        "status": status_label,
+        "previous_version": previous_version,
+        "knowledge_pack_version": knowledge_pack_version
+    }
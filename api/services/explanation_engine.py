@@ -15,8 +15,8 @@ class ExplanationEngine:
     No generative AI is present here—reasoning is rule-based/mocked for the MVP.
     """
 
-    def __init__(self, knowledge_pack_path: str):
-        self.kb = get_knowledge_base_adapter(knowledge_pack_path)
+    def __init__(self, knowledge_pack_path: Optional[str] = None, kb: Optional[Any] = None):
+        self.kb = kb if kb is not None else get_knowledge_base_adapter(knowledge_pack_path)
 
     def explain_condition_probability(
         self,
@@ -0,0 +1,133 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import threading
+from typing import Any, Optional
+
+from fastapi import Depends, FastAPI, Request
+
+from api.adapters.knowledge_base import get_knowledge_base_adapter
+from api.config import settings
+from api.services.explanation_engine import ExplanationEngine
+from api.services.triage_engine import TriageEngine
+
+# Warm-up retry backoff (seconds): doubles after each failed attempt, up to the max
+_WARM_UP_RETRY_INITIAL = 1.0
+_WARM_UP_RETRY_MAX = 60.0
+
+
+class KnowledgePackProvider:
+    """
+    Application-scoped owner of the knowledge pack adapter and the engines built on it.
+    Created once in the FastAPI lifespan and injected into routes with Depends, so every
+    route shares one compiled pack, one triage engine (and its per-session score cache)
+    and one explanation engine.
+    Pass `kb` to serve another adapter (e.g. the mock knowledge base in tests/benchmarks).
+    """
+
+    def __init__(
+        self,
+        kb: Optional[Any] = None,
+        knowledge_pack_path: Optional[str] = None,
+        scoring_mode: Optional[str] = None
+    ):
+        self.kb = kb if kb is not None else get_knowledge_base_adapter(
+            knowledge_pack_path or settings.KNOWLEDGE_PACK_PATH
+        )
+        self.triage_engine = TriageEngine(kb=self.kb, scoring_mode=scoring_mode)
+        self.explanation_engine = ExplanationEngine(kb=self.kb)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self.warm_up_error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        """True once warm-up has completed (or warm-up is disabled)."""
+        return self._ready.is_set()
+
+    def warm_up(self) -> bool:
+        """
+        Load and compile the knowledge pack and prime the triage engine with a
+        synthetic run. Readiness is only reported after this succeeds.
+        """
+        try:
+            version = self.triage_engine.warm_up()
+        except Exception as e:
+            self.warm_up_error = str(e)
+            print(f"Warning: Knowledge pack warm-up failed: {e}")
+            return False
+        self.warm_up_error = None
+        self._ready.set()
+        print(f"Knowledge pack {version} warmed up")
+        return True
+
+    def _warm_up_until_ready(self):
+        """Retry warm-up with exponential backoff until it succeeds or the provider closes."""
+        delay = _WARM_UP_RETRY_INITIAL
+        while not self._ready.is_set() and not self.warm_up():
+            if self._stop.wait(delay):
+                return
+            delay = min(delay * 2, _WARM_UP_RETRY_MAX)
+
+    def _on_reload(self, version: str):
+        """Warm up a newly published knowledge pack (reports ready if warm-up had failed)."""
+        if settings.KNOWLEDGE_PACK_WARM_UP:
+            self.warm_up()
+
+    def start(self):
+        """
+        Start background work owned by the provider: warm-up (in a background thread,
+        retried until it succeeds, so liveness checks answer while the pack compiles),
+        warm-up of hot-reloaded packs and the hot reload watcher.
+        """
+        if settings.KNOWLEDGE_PACK_WARM_UP:
+            threading.Thread(target=self._warm_up_until_ready, name="knowledge-pack-warm-up", daemon=True).start()
+        else:
+            self._ready.set()
+        if hasattr(self.kb, "add_reload_listener"):
+            self.kb.add_reload_listener(self._on_reload)
+        if settings.KNOWLEDGE_PACK_WATCH_SECONDS > 0 and hasattr(self.kb, "watch"):
+            self.kb.watch(settings.KNOWLEDGE_PACK_WATCH_SECONDS)
+
+    def close(self):
+        """Stop background work started by start()."""
+        self._stop.set()
+        if hasattr(self.kb, "remove_reload_listener"):
+            self.kb.remove_reload_listener(self._on_reload)
+        if hasattr(self.kb, "stop_watching"):
+            self.kb.stop_watching()
+
+
+def install_knowledge_pack_provider(app: FastAPI, provider: Optional[KnowledgePackProvider] = None) -> KnowledgePackProvider:
+    """Attach a provider to the app (called from the lifespan; tests may pass their own)."""
+    if provider is None:
+        provider = KnowledgePackProvider()
+    app.state.knowledge_pack = provider
+    return provider
+
+
+# --- FastAPI dependencies ---
+
+def get_knowledge_pack_provider(request: Request) -> KnowledgePackProvider:
+    """
+    The app's provider. Normally installed by the lifespan; created on first use
+    if the app was started without one (e.g. TestClient outside a `with` block).
+    """
+    provider = getattr(request.app.state, "knowledge_pack", None)
+    if provider is None:
+        provider = install_knowledge_pack_provider(request.app)
+    return provider
+
+
+def get_knowledge_base(provider: KnowledgePackProvider = Depends(get_knowledge_pack_provider)) -> Any:
+    return provider.kb
+
+
+def get_triage_engine(provider: KnowledgePackProvider = Depends(get_knowledge_pack_provider)) -> TriageEngine:
+    return provider.triage_engine
+
+
+def get_explanation_engine(provider: KnowledgePackProvider = Depends(get_knowledge_pack_provider)) -> ExplanationEngine:
+    return provider.explanation_engine
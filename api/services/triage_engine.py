@@ -4,9 +4,13 @@ Proprietary and confidential.
 """
 
 from typing import Dict, List, Any, Optional
+from collections import OrderedDict
 from datetime import datetime
+import threading
+import time
 import uuid
 
+import numpy as np
 import pandas as pd
 from pydantic import ValidationError
 
@@ -20,6 +24,94 @@ from api.models.triage import (
     SuggestionItem,
 )
 from api.adapters.knowledge_base import get_knowledge_base_adapter
+from api.config import settings
+from api.services.triage_index import TriageIndex, get_triage_index
+from api.utils.validation_utils import find_missing_tier2
+
+# Number of conditions returned in TriageResult.top_5_conditions
+_TOP_K = 5
+
+# Sessions whose per-condition partial scores are kept for incremental re-triage
+_SCORE_CACHE_MAX_SESSIONS = 1024
+
+# Session token of the synthetic intake run by TriageEngine.warm_up()
+_WARM_UP_SESSION = "__warm_up__"
+
+# Score components: name -> scorer(index, batch of that component's features).
+# The final score is the sum of all components.
+_SCORE_COMPONENTS = {
+    "symptoms": lambda index, batch: index.count_symptom_matches(batch) * 2,
+    "supports": lambda index, batch: index.count_support_matches(batch),
+    "issues": lambda index, batch: index.count_issue_matches(batch),
+    # Add weight if patient has key medication or allergy
+    # (in real logic, sophisticated checks here)
+    "meds": lambda index, batch: index.count_med_matches(batch),
+    "allergies": lambda index, batch: -index.count_allergy_matches(batch),
+    # Big bump if matching a triggered red flag for this condition
+    "red_flags": lambda index, batch: index.red_flag_mask(batch) * 10,
+}
+
+# Scoring modes: "heuristic" (default) counts key symptom matches at a fixed weight;
+# "weighted" uses the compiled SUPPORTS edge weights x intake weight modifiers.
+SCORING_MODES = {
+    "heuristic": _SCORE_COMPONENTS,
+    "weighted": {
+        **_SCORE_COMPONENTS,
+        "symptoms": lambda index, batch: index.weighted_symptom_scores(batch),
+    },
+}
+
+
+def _top_by_probability(pool: np.ndarray, probabilities: np.ndarray, m: int) -> np.ndarray:
+    """The m positions in (ascending) pool with the highest probability; ties keep pack order."""
+    if m >= len(pool):
+        return pool
+    p = probabilities[pool]
+    kth = np.partition(p, len(p) - m)[len(p) - m]
+    above = pool[p > kth]
+    ties = pool[p == kth][:m - len(above)]
+    return np.concatenate([above, ties])
+
+
+def _rank_conditions(triggered: np.ndarray, probabilities: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+    """
+    Condition positions ordered by (triggered red flag first, probability desc),
+    ties in knowledge pack order. With k, only the top k are selected (partition,
+    not a full sort).
+    """
+    if k is None or k >= len(probabilities):
+        candidates = np.arange(len(probabilities))
+    else:
+        flagged = np.flatnonzero(triggered)
+        if len(flagged) >= k:
+            candidates = _top_by_probability(flagged, probabilities, k)
+        else:
+            unflagged = np.flatnonzero(~triggered)
+            candidates = np.sort(np.concatenate([
+                flagged, _top_by_probability(unflagged, probabilities, k - len(flagged))
+            ]))
+    order = np.lexsort((-probabilities[candidates], ~triggered[candidates]))
+    return candidates[order]
+
+
+class _SessionScores:
+    """Cached scoring inputs and per-condition score components for one session."""
+
+    __slots__ = ("pack_version", "features", "components", "expires_at")
+
+    def __init__(
+        self,
+        pack_version: str,
+        features: Dict[str, Any],
+        components: Dict[str, np.ndarray],
+        expires_at: float = float("inf")
+    ):
+        self.pack_version = pack_version
+        self.features = features
+        self.components = components
+        # time.monotonic() deadline; features hold patient data, so entries never
+        # outlive the session they were computed for
+        self.expires_at = expires_at
 
 class TriageEngine:
     """
@@ -28,117 +120,263 @@ class TriageEngine:
     Red flags override differential, but don't hide probabilities.
     Probabilities and confidence are generated by partial rule and symptom matching.
     Supports anomaly, assistant action, and suggestion logic.
+    Per-session score components are cached so that re-triage after a single-field
+    edit only recomputes the components whose inputs changed. Cached entries expire
+    with the intake session (score_cache_ttl seconds after the session's last triage)
+    or when evicted with evict_session().
     """
 
-    def __init__(self, knowledge_pack_path: str):
-        self.kb = get_knowledge_base_adapter(knowledge_pack_path)
+    def __init__(
+        self,
+        knowledge_pack_path: Optional[str] = None,
+        scoring_mode: Optional[str] = None,
+        kb: Optional[Any] = None,
+        score_cache_ttl: Optional[float] = None
+    ):
+        # An injected adapter (see api.services.providers) takes precedence over the path
+        self.kb = kb if kb is not None else get_knowledge_base_adapter(knowledge_pack_path)
+        self.scoring_mode = scoring_mode or settings.TRIAGE_SCORING_MODE
+        if self.scoring_mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {self.scoring_mode}")
+        # Per-session partial scores for incremental re-triage (by session token, in write order),
+        # kept no longer than the intake session itself by default
+        self.score_cache_ttl = (
+            score_cache_ttl if score_cache_ttl is not None else settings.TOKEN_EXPIRE_MINUTES * 60
+        )
+        self._score_cache: "OrderedDict[str, _SessionScores]" = OrderedDict()
+        self._score_cache_lock = threading.Lock()
 
     def run(
         self,
         intake: IntakeQuestionnaireResponse,
         previous_triage_id: Optional[str] = None,
         actor_type: Optional[str] = None,
-        actor_id: Optional[str] = None
+        actor_id: Optional[str] = None,
+        include_differential: bool = False
     ) -> TriageResult:
         """
         Run triage given a fully-completed IntakeQuestionnaireResponse.
         Returns a TriageResult consistent with all MVP requirements.
+        The full ranked differential is only built when include_differential is set.
+        """
+        return self._triage([intake], previous_triage_id, actor_type, actor_id, include_differential)[0]
+
+    def warm_up(self) -> str:
+        """
+        Compile the current knowledge pack and run one synthetic triage through the
+        full scoring and ranking path, so the first real request does not pay for
+        sheet loading, index compilation or first-call overheads.
+        Returns the warmed knowledge pack version.
+        """
+        index = get_triage_index(self.kb.snapshot())
+        intake = IntakeQuestionnaireResponse(
+            session_token=_WARM_UP_SESSION,
+            patient_id=_WARM_UP_SESSION,
+            issued_by="system",
+            intake_mode="full",
+            started_at=datetime.utcnow(),
+            chief_concern="warm-up",
+            issue_cards=[{
+                "issue_id": "warm-up", "region_id": "general", "description": "warm-up",
+                "functional_impact": "none", "onset": "today", "course": "unchanged",
+            }],
+            symptoms=[{"symptom_id": symptom_id, "present": True} for symptom_id in index.symptom_vocab[:3].tolist()],
+            red_flags=[{"red_flag_id": red_flag_id, "present": False} for red_flag_id in index.red_flag_ids.tolist()],
+            consent_acknowledged=True,
+            medications=[],
+            allergies=[],
+            vitals={"unknown": True},
+            pmh=index.support_vocab[:3].tolist(),
+            symptom_durations={},
+            functional_impacts={},
+            social_history={},
+            source="system",
+        )
+        result = self.run(intake, actor_type="system", include_differential=True)
+        # Don't let the synthetic session occupy the incremental re-triage cache
+        self.evict_session(_WARM_UP_SESSION)
+        return result.knowledge_pack_version
+
+    def evict_session(self, session_token: str):
+        """Drop a session's cached scoring inputs (call when the session completes or expires)."""
+        with self._score_cache_lock:
+            self._score_cache.pop(session_token, None)
+
+    def run_batch(
+        self,
+        intakes: List[IntakeQuestionnaireResponse],
+        actor_type: Optional[str] = None,
+        actor_id: Optional[str] = None,
+        include_differential: bool = False
+    ) -> List[TriageResult]:
+        """
+        Run triage for many intakes at once (e.g. re-triage of the waiting room).
+        All intakes are scored together as one patient x condition matrix against a
+        single knowledge pack version. Returns one TriageResult per intake, in order.
         """
-        # 1. Load knowledge pack sheets
-        conditions_df = self.kb.get_conditions()
-        symptoms_df = self.kb.get_symptoms()
-        red_flags_df = self.kb.get_red_flags()
-        actions_df = self.kb.get_actions()
-        guides_df = self.kb.get_guides()
-        assistant_action_ui_df = self.kb.get_assistant_action_ui_map()
-        branch_rules_df = self.kb.get_branch_rules()
-        validation_checklist_df = self.kb.get_validation_checklist()
-        q_symptom_map_df = self.kb.get_symptom_map()
-
-        # 2. Match symptoms/issues to possible conditions
-        patient_positive_symptoms = set(s.symptom_id for s in intake.symptoms if s.present)
-        issue_descriptions = [ic.description for ic in intake.issue_cards if ic.description]
-        pmh = set(intake.pmh)
+        if not intakes:
+            return []
+        return self._triage(intakes, None, actor_type, actor_id, include_differential)
+
+    def _triage(
+        self,
+        intakes: List[IntakeQuestionnaireResponse],
+        previous_triage_id: Optional[str],
+        actor_type: Optional[str],
+        actor_id: Optional[str],
+        include_differential: bool
+    ) -> List[TriageResult]:
+        # 1. Pin one knowledge pack snapshot for the whole run (a concurrent reload
+        # publishes a new one without affecting this run), then load its compiled
+        # index and the sheets still read directly
+        snapshot = self.kb.snapshot()
+        index = get_triage_index(snapshot)
+        sheets = {
+            "intake_branch_rules": snapshot.get_sheet("intake_branch_rules"),
+        }
+
+        # 2./3. Extract each patient's matching features (symptoms, PMH, issues, meds,
+        # allergies, triggered red flags)
+        features = [self._extract_features(index, intake) for intake in intakes]
+        flagged = [list(f["red_flags"]) for f in features]
+
+        # 4. Partial matching for probability: score every (patient, condition) pair at once
+        # against the index's incidence matrices, reusing cached per-session components
+        # whose inputs have not changed since the session was last triaged
+        components = self._score_components(index, intakes, features)
+        triggered = components["red_flags"] > 0
+        scores = sum(components.values())
+
+        # Normalize scores into probabilities per patient (softmax-style, but simple for MVP)
+        norm_scores = np.maximum(scores, 0)
+        totals = norm_scores.sum(axis=1, keepdims=True)
+        probabilities = norm_scores / np.where(totals == 0, 1.0, totals)
+        # Confidence label: high if >.5, medium >.2, else low
+        confidences = np.where(
+            probabilities >= 0.5, "high", np.where(probabilities >= 0.2, "medium", "low")
+        )
+
+        return [
+            self._build_result(
+                intake, index, sheets, probabilities[row], confidences[row], triggered[row],
+                flagged[row], previous_triage_id, actor_type, actor_id, include_differential
+            )
+            for row, intake in enumerate(intakes)
+        ]
+
+    @staticmethod
+    def _extract_features(index: TriageIndex, intake: IntakeQuestionnaireResponse) -> Dict[str, Any]:
+        """Hashable per-component scoring inputs for one intake."""
         red_flag_states = {rf.red_flag_id: rf.present for rf in intake.red_flags if hasattr(rf, 'present')}
-        meds = set([m.med_class for m in intake.medications])
-        allergies = set([a.allergen for a in intake.allergies])
-
-        # 3. RED FLAGS logic:
-        flagged = []
-        for idx, row in red_flags_df.iterrows():
-            red_flag_id = row.get('red_flag_id')
-            if red_flag_id and red_flag_states.get(red_flag_id) is True:
-                flagged.append(red_flag_id)
+        return {
+            "symptoms": frozenset(s.symptom_id for s in intake.symptoms if s.present),
+            "supports": frozenset(intake.pmh),
+            "issues": tuple(ic.description.lower() for ic in intake.issue_cards if ic.description),
+            "meds": frozenset(m.med_class for m in intake.medications),
+            "allergies": frozenset(a.allergen for a in intake.allergies),
+            # RED FLAGS logic: flagged in knowledge pack order
+            "red_flags": tuple(rf_id for rf_id in index.red_flag_ids.tolist() if red_flag_states.get(rf_id) is True),
+        }
+
+    def _score_components(
+        self,
+        index: TriageIndex,
+        intakes: List[IntakeQuestionnaireResponse],
+        features: List[Dict[str, Any]]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Compute the (patients x conditions) score components. A component is only
+        recomputed for patients whose inputs to it changed since their session's
+        cached scores (same knowledge pack version); the rest are reused.
+        """
+        cached = [self._get_cached_scores(intake.session_token, index.pack_version) for intake in intakes]
+        components: Dict[str, np.ndarray] = {}
+        dtype = np.float64 if self.scoring_mode == "weighted" else np.int64
+        for name, scorer in SCORING_MODES[self.scoring_mode].items():
+            matrix = np.empty((len(intakes), len(index)), dtype=dtype)
+            stale = []
+            for row, entry in enumerate(cached):
+                if entry is not None and entry.features[name] == features[row][name]:
+                    matrix[row] = entry.components[name]
+                else:
+                    stale.append(row)
+            if stale:
+                matrix[stale] = scorer(index, [features[row][name] for row in stale])
+            components[name] = matrix
+
+        expires_at = time.monotonic() + self.score_cache_ttl
+        for row, intake in enumerate(intakes):
+            self._set_cached_scores(intake.session_token, _SessionScores(
+                pack_version=index.pack_version,
+                features=features[row],
+                components={name: matrix[row].copy() for name, matrix in components.items()},
+                expires_at=expires_at,
+            ))
+        return components
+
+    def _get_cached_scores(self, session_token: str, pack_version: str) -> Optional["_SessionScores"]:
+        with self._score_cache_lock:
+            self._evict_expired_scores()
+            entry = self._score_cache.get(session_token)
+            if entry is None or entry.pack_version != pack_version:
+                return None
+            return entry
+
+    def _set_cached_scores(self, session_token: str, entry: "_SessionScores"):
+        with self._score_cache_lock:
+            self._score_cache[session_token] = entry
+            self._score_cache.move_to_end(session_token)
+            while len(self._score_cache) > _SCORE_CACHE_MAX_SESSIONS:
+                self._score_cache.popitem(last=False)
+            self._evict_expired_scores()
+
+    def _evict_expired_scores(self):
+        """Drop expired entries (caller holds the lock). Entries are kept in write order
+        and all get the same TTL, so the expired ones are always at the front."""
+        now = time.monotonic()
+        while self._score_cache:
+            session_token, oldest = next(iter(self._score_cache.items()))
+            if oldest.expires_at > now:
+                break
+            del self._score_cache[session_token]
+
+    def _build_result(
+        self,
+        intake: IntakeQuestionnaireResponse,
+        index: TriageIndex,
+        sheets: Dict[str, pd.DataFrame],
+        probabilities: np.ndarray,
+        confidences: np.ndarray,
+        triggered: np.ndarray,
+        flagged: List[str],
+        previous_triage_id: Optional[str],
+        actor_type: Optional[str],
+        actor_id: Optional[str],
+        include_differential: bool
+    ) -> TriageResult:
+        """Rank one patient's scored differential and assemble the TriageResult."""
+        branch_rules_df = sheets["intake_branch_rules"]
         has_red_flags = len(flagged) > 0
 
-        # 4. Partial matching for probability: For each condition, assign a match score
-        probs: List[ConditionProbability] = []
-        max_score = 0
-        condition_scores = []
-
-        for idx, row in conditions_df.iterrows():
-            cond_id = row.get('condition_id')
-            cond_name = row.get('condition_name')
-
-            # NEW: Skip invalid/unnamed conditions (prevents Pydantic ValidationError)
-            if not cond_id or not cond_name or not str(cond_name).strip():
-                continue
-            cond_name = str(cond_name).strip()
-
-            cond_symptoms = str(row.get('key_symptoms') or "").split(";")
-            cond_rf_ids = [rf.strip() for rf in str(row.get('red_flags') or "").split(";") if rf.strip()]
-            cond_supports = str(row.get('supports') or "").split(";")
-            match_symptoms = len(set(cond_symptoms) & patient_positive_symptoms)
-            match_supports = len(set(cond_supports) & pmh)
-
-            # CHANGED: guard against None cond_name and None issue descriptions
-            cond_name_safe = (cond_name or "").strip().lower()
-            if not cond_name_safe:
-                match_issues = 0
-            else:
-                match_issues = sum(1 for desc in issue_descriptions if cond_name_safe in (desc or "").lower())
-
-            # Score: weighted sum for this MVP
-            score = match_symptoms * 2 + match_supports + match_issues
-            # Add weight if patient has key medication or allergy
-            # (in real logic, sophisticated checks here)
-            score += sum(1 for med in meds if med in (row.get('med_class') or ""))
-            score -= sum(1 for allergen in allergies if allergen in (row.get('exclude_allergen') or ""))
-            if any(rf in flagged for rf in cond_rf_ids):
-                score += 10  # Big bump if matching a triggered red flag for this condition
-            max_score = max(max_score, score)
-            condition_scores.append((cond_id, cond_name, score, cond_rf_ids))
-
-        # Normalize scores into probabilities (softmax-style, but simple for MVP)
-        norm_scores = [max(0, s[2]) for s in condition_scores]
-        total = sum(norm_scores)
-        if total == 0:
-            total = 1.0
-        for idx, (cond_id, cond_name, score, cond_rf_ids) in enumerate(condition_scores):
-            probability = norm_scores[idx] / total
-            # Confidence label: high if >.5, medium >.2, else low
-            if probability >= 0.5:
-                confidence = "high"
-            elif probability >= 0.2:
-                confidence = "medium"
-            else:
-                confidence = "low"
-            triggered_rf = any(rf in flagged for rf in cond_rf_ids)
-            probs.append(ConditionProbability(
-                condition_id=cond_id,
-                condition_name=cond_name,
-                probability=probability,
-                confidence_label=confidence,
-                triggered_red_flag=triggered_rf,
+        def condition_probability(i: int) -> ConditionProbability:
+            return ConditionProbability(
+                condition_id=str(index.condition_ids[i]),
+                condition_name=str(index.condition_names[i]),
+                probability=float(probabilities[i]),
+                confidence_label=str(confidences[i]),
+                triggered_red_flag=bool(triggered[i]),
                 suppressed_due_to_red_flag=False,
                 notes=None
-            ))
+            )
 
-        # If red flags: Highlight them, but do not zero out the rest of the differential
-        probs_sorted = sorted(probs, key=lambda x: (-x.triggered_red_flag, -x.probability))
-
-        # Top 5 only (display order: red flag overrides first)
-        top_5_conditions = probs_sorted[:5]
+        # If red flags: Highlight them, but do not zero out the rest of the differential.
+        # Top 5 only (display order: red flag overrides first); result models are only
+        # built for the conditions actually returned.
+        top_5 = _rank_conditions(triggered, probabilities, _TOP_K)
+        top_5_conditions = [condition_probability(i) for i in top_5]
+        differential: Optional[List[ConditionProbability]] = None
+        if include_differential:
+            differential = [condition_probability(i) for i in _rank_conditions(triggered, probabilities)]
 
         # 5. Anomalies/contradictions -- simple for MVP
         major_anomalies: List[str] = []
@@ -150,34 +388,18 @@ class TriageEngine:
         if prefer_not_say:
             major_anomalies.append("Multiple 'prefer not to say' answers.")
 
-        # 6. Assistant Actions (Tier 2 missing data, based on Excel assistant_action_ui_map)
-        assistant_actions: List[AssistantAction] = []
-        # Identify missing Tier 2 fields from validation checklist
-        for _, row in validation_checklist_df.iterrows():
-            tier = str(row.get("tier_level"))
-            field = str(row.get("field_id"))
-            required = bool(row.get("required", True))
-            # Only check Tier 2 missing fields for assistant action (eg, PMH, social, impact)
-            if tier == "2" and required:
-                missing = False
-                if hasattr(intake, field):
-                    val = getattr(intake, field)
-                    if not val or val == "" or (isinstance(val, list) and not val):
-                        missing = True
-                else:
-                    missing = True
-                if missing:
-                    # Lookup UI component from assistant_action_ui_map
-                    match = assistant_action_ui_df[assistant_action_ui_df["field_id"] == field]
-                    ui_component = match["ui_component"].iloc[0] if not match.empty else None
-                    action_id = f"assistant_{field}"
-                    assistant_actions.append(AssistantAction(
-                        action_id=action_id,
-                        description=f"Please complete missing field: {field}",
-                        completed=False,
-                        triggered_by=field,
-                        ui_component=ui_component
-                    ))
+        # 6. Assistant Actions (Tier 2 missing data, from the compiled validation
+        # checklist + assistant_action_ui_map rules)
+        assistant_actions: List[AssistantAction] = [
+            AssistantAction(
+                action_id=rule.action_id,
+                description=rule.description,
+                completed=False,
+                triggered_by=rule.field_id,
+                ui_component=rule.ui_component
+            )
+            for rule in find_missing_tier2(intake, index.tier2_rules)
+        ]
 
         # 7. Follow-up Questions (low confidence or follow-up defined in rules)
         followup_questions: List[FollowUpQuestion] = []
@@ -194,22 +416,16 @@ class TriageEngine:
 
         # 8. Suggestions: labs/referrals/meds/actions/guides
         # (map from primary/top 5 suggested conditions; MVP: demo logic or pull from guides/actions columns)
-        suggestions: List[SuggestionItem] = []
-        for cond in top_5_conditions:
-            cid = cond.condition_id
-            cond_row = conditions_df[conditions_df["condition_id"] == cid]
-            if not cond_row.empty:
-                for kind in ["labs", "referrals", "med_categories", "actions", "guides"]:
-                    items = cond_row.iloc[0].get(kind)
-                    if items:
-                        for sitem in str(items).split(";"):
-                            if sitem.strip():
-                                suggestions.append(SuggestionItem(
-                                    suggestion_type=kind,
-                                    suggestion_id=sitem.strip(),
-                                    description=f"{kind.capitalize()}: {sitem.strip()}",
-                                    relevant_condition_id=cid
-                                ))
+        suggestions: List[SuggestionItem] = [
+            SuggestionItem(
+                suggestion_type=kind,
+                suggestion_id=suggestion_id,
+                description=description,
+                relevant_condition_id=cond.condition_id
+            )
+            for i, cond in zip(top_5, top_5_conditions)
+            for kind, suggestion_id, description in index.suggestions_of(i)
+        ]
 
         # 9. Summarize Triage
         acuity = "urgent" if has_red_flags else "routine"
@@ -227,20 +443,23 @@ class TriageEngine:
 
         # Build a candidate payload with common field names, then filter to what the model actually accepts.
         candidate: Dict[str, Any] = {
+            "intake_session_token": intake.session_token,
             "triage_id": triage_id,
             "created_at": created_at,
             "previous_triage_id": previous_triage_id,
             "actor_type": actor_type,
             "actor_id": actor_id,
+            "knowledge_pack_version": index.pack_version,
 
             # Most common/likely names for summary + condition lists:
             "summary": triage_summary,
             "triage_summary": triage_summary,
 
+            "top_5_conditions": top_5_conditions,
             "conditions": top_5_conditions,
             "top_conditions": top_5_conditions,
-            "differential": probs_sorted,
-            "condition_probabilities": probs_sorted,
+            "differential": differential,
+            "condition_probabilities": differential,
 
             "assistant_actions": assistant_actions,
             "followup_questions": followup_questions,
@@ -0,0 +1,440 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from api.adapters.graph_adjacency import RelationshipCSR, get_graph_adjacency
+from api.utils.shared_arrays import shared_arrays
+from api.utils.validation_utils import compile_tier2_rules, tier2_rule
+
+# Substring masks for med classes/allergens are cached per index; bounded so that
+# free-text patient entries cannot grow the cache without limit.
+_MASK_CACHE_MAX = 1024
+
+# Condition columns turned into SuggestionItems for the top conditions
+SUGGESTION_KINDS = ("labs", "referrals", "med_categories", "actions", "guides")
+
+# Weight of a key symptom without a SUPPORTS edge (same as the heuristic scoring)
+KEY_SYMPTOM_WEIGHT = 2.0
+
+# Bump when the layout of the arrays published to a snapshot's shared_dir changes
+_SHARED_FORMAT = 1
+
+
+def _cell_str(value: Any) -> str:
+    """Normalize a knowledge pack cell to a string ('' for empty/NaN cells)."""
+    if value is None:
+        return ""
+    try:
+        if pd.isna(value):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    return str(value)
+
+
+def _str_array(values: Iterable[str]) -> np.ndarray:
+    """Fixed-width unicode array of strings (no Python objects, so it can be shared)."""
+    return np.array(list(values), dtype=str)
+
+
+def _frozen(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    for array in arrays.values():
+        array.setflags(write=False)
+    return arrays
+
+
+def _incidence_matrix(rows: Iterable[Iterable[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Build a (row x token) 0/1 incidence matrix and its sorted token vocabulary."""
+    rows = [tuple(r) for r in rows]
+    vocab = sorted(set().union(*rows))
+    columns = {token: i for i, token in enumerate(vocab)}
+    matrix = np.zeros((len(rows), len(vocab)), dtype=np.int32)
+    for i, tokens in enumerate(rows):
+        for token in tokens:
+            matrix[i, columns[token]] = 1
+    return _str_array(vocab), matrix
+
+
+def _symptom_weight_matrix(
+    index: "TriageIndex",
+    supports_edges: Optional[RelationshipCSR] = None,
+    weight_modifiers: Optional[Mapping[str, float]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Dense (condition x symptom) float weights: the SUPPORTS edge weight where the
+    graph has one, else KEY_SYMPTOM_WEIGHT for the condition's key symptoms, times
+    the symptom's intake weight_modifier.
+    """
+    weights: List[Dict[str, float]] = []
+    for i, cond_id in enumerate(index.condition_ids.tolist()):
+        row = {s: KEY_SYMPTOM_WEIGHT for s in index.key_symptoms_of(i) if s}
+        if supports_edges is not None:
+            edges = supports_edges.in_edges(cond_id)
+            edge_weights: Dict[str, float] = {}
+            for symptom_id, weight in zip(edges["source_id"], edges["weight"]):
+                if not np.isnan(weight):
+                    # Duplicate edges count once, at their highest weight
+                    edge_weights[symptom_id] = max(weight, edge_weights.get(symptom_id, weight))
+            row.update(edge_weights)
+        weights.append(row)
+
+    vocab = sorted(set().union(*weights))
+    columns = {symptom_id: i for i, symptom_id in enumerate(vocab)}
+    matrix = np.zeros((len(weights), len(vocab)), dtype=np.float64)
+    for i, row in enumerate(weights):
+        for symptom_id, weight in row.items():
+            matrix[i, columns[symptom_id]] = weight
+    if weight_modifiers:
+        matrix *= np.array([weight_modifiers.get(s, 1.0) for s in vocab], dtype=np.float64)
+    return _frozen({"vocab": _str_array(vocab), "matrix": matrix})
+
+
+def _weight_modifiers(symptom_map_df: Optional[pd.DataFrame]) -> Dict[str, float]:
+    """symptom_id -> weight_modifier from intake_q_symptom_map (highest if mapped more than once)."""
+    modifiers: Dict[str, float] = {}
+    if symptom_map_df is None or "symptom_id" not in symptom_map_df or "weight_modifier" not in symptom_map_df:
+        return modifiers
+    values = pd.to_numeric(symptom_map_df["weight_modifier"], errors="coerce")
+    for symptom_id, modifier in zip(symptom_map_df["symptom_id"], values):
+        symptom_id = _cell_str(symptom_id).strip()
+        if symptom_id and not np.isnan(modifier):
+            modifiers[symptom_id] = max(modifier, modifiers.get(symptom_id, modifier))
+    return modifiers
+
+
+def _optional_sheet(kb: Any, name: str) -> Optional[pd.DataFrame]:
+    try:
+        return kb.get_sheet(name)
+    except KeyError:
+        return None
+
+
+class TriageIndex:
+    """
+    Compiled, immutable view of the knowledge pack used by TriageEngine.
+    Built once per knowledge pack version so that triage scoring never has to
+    iterate DataFrames or re-split ';'-separated cells per request.
+    The index is held in the NumPy arrays named in ARRAYS (string tables as
+    fixed-width unicode arrays, indexed by condition position), so a published
+    copy can be memory-mapped by every worker serving the same pack version.
+    """
+
+    # Arrays of a compiled index (the layout published to a snapshot's shared_dir)
+    ARRAYS = (
+        "condition_ids",
+        "condition_names",
+        "med_classes",
+        "exclude_allergens",
+        "red_flag_ids",
+        "symptom_vocab",
+        "symptom_matrix",
+        "support_vocab",
+        "support_matrix",
+        "red_flag_vocab",
+        "red_flag_matrix",
+        "issue_patterns",
+        "issue_pattern_of",
+        "suggestion_offsets",
+        "suggestion_kinds",
+        "suggestion_ids",
+        "suggestion_descriptions",
+        "tier2_fields",
+        "tier2_ui_components",
+        "tier2_has_ui",
+    )
+
+    __slots__ = ARRAYS + (
+        "pack_version",
+        "tier2_rules",
+        "weights_source",
+        "_default_symptom_weights",
+        "_mask_cache",
+    )
+
+    def __init__(
+        self,
+        arrays: Mapping[str, np.ndarray],
+        pack_version: str = "",
+        weights_source: Optional[Any] = None,
+    ):
+        self.pack_version = pack_version
+        # Parallel per-condition string tables: condition_ids, condition_names,
+        # med_classes, exclude_allergens. Condition x token incidence matrices for
+        # vectorized scoring, with columns in the order of their sorted vocabularies.
+        # Distinct lowercased condition names for issue-card matching (issue_patterns)
+        # and each condition's pattern (issue_pattern_of). Suggestion records of the
+        # condition at position i are rows suggestion_offsets[i]:suggestion_offsets[i + 1]
+        # of the suggestion_* tables.
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        # Compiled Tier 2 completeness rules driving assistant actions
+        self.tier2_rules = tuple(
+            tier2_rule(field, ui_component if has_ui else None)
+            for field, ui_component, has_ui in zip(
+                self.tier2_fields.tolist(), self.tier2_ui_components.tolist(), self.tier2_has_ui.tolist()
+            )
+        )
+        # Snapshot the weighted scoring mode compiles its symptom weights from, on first
+        # use (None: key symptoms at the default weight, see symptom_weights)
+        self.weights_source = weights_source
+        self._default_symptom_weights: Optional["SymptomWeights"] = None
+        self._mask_cache: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.condition_ids)
+
+    def key_symptoms_of(self, position: int) -> List[str]:
+        """Key symptom ids of the condition at a position."""
+        return self.symptom_vocab[self.symptom_matrix[position] > 0].tolist()
+
+    def suggestions_of(self, position: int) -> List[Tuple[str, str, str]]:
+        """(suggestion_type, suggestion_id, description) records of the condition at a position."""
+        start, end = self.suggestion_offsets[position], self.suggestion_offsets[position + 1]
+        return list(zip(
+            self.suggestion_kinds[start:end].tolist(),
+            self.suggestion_ids[start:end].tolist(),
+            self.suggestion_descriptions[start:end].tolist(),
+        ))
+
+    @staticmethod
+    def _encode(vocab: np.ndarray, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """Encode one token collection per patient as a (patients x vocab) 0/1 matrix (vocab sorted)."""
+        encoded = np.zeros((len(batch), len(vocab)), dtype=np.int32)
+        rows: List[int] = []
+        tokens: List[str] = []
+        for row, values in enumerate(batch):
+            for value in set(values):
+                if isinstance(value, str):
+                    rows.append(row)
+                    tokens.append(value)
+        if tokens and len(vocab):
+            tokens = _str_array(tokens)
+            cols = np.minimum(np.searchsorted(vocab, tokens), len(vocab) - 1)
+            found = vocab[cols] == tokens
+            encoded[np.array(rows, dtype=np.intp)[found], cols[found]] = 1
+        return encoded
+
+    def count_symptom_matches(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) count of key symptoms present in each patient's symptom ids."""
+        return self._encode(self.symptom_vocab, batch) @ self.symptom_matrix.T
+
+    @property
+    def symptom_weights(self) -> "SymptomWeights":
+        """
+        Condition x symptom weights of the weighted scoring mode. Compiled on first use,
+        so the heuristic mode never loads the relationship sheets they come from.
+        """
+        if self.weights_source is not None:
+            return get_symptom_weights(self.weights_source)
+        if self._default_symptom_weights is None:
+            self._default_symptom_weights = SymptomWeights(**_symptom_weight_matrix(self))
+        return self._default_symptom_weights
+
+    def weighted_symptom_scores(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) sum of symptom weights over each patient's present symptoms."""
+        weights = self.symptom_weights
+        return self._encode(weights.vocab, batch) @ weights.matrix.T
+
+    def count_support_matches(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) count of supporting PMH items present in each patient's PMH."""
+        return self._encode(self.support_vocab, batch) @ self.support_matrix.T
+
+    def red_flag_mask(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) mask: True if any of the condition's red flags is flagged."""
+        return (self._encode(self.red_flag_vocab, batch) @ self.red_flag_matrix.T) > 0
+
+    def count_issue_matches(self, batch: Sequence[List[str]]) -> np.ndarray:
+        """(patients x conditions) count of (lowercased) issue descriptions mentioning the condition name."""
+        counts = np.zeros((len(batch), len(self)), dtype=np.int64)
+        for row, issue_descriptions in enumerate(batch):
+            for desc in issue_descriptions:
+                matched = np.char.find(desc, self.issue_patterns) >= 0
+                counts[row] += matched[self.issue_pattern_of]
+        return counts
+
+    def _substring_mask(self, column: str, needle: str) -> np.ndarray:
+        key = (column, needle)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.char.find(getattr(self, column), needle) >= 0
+            if len(self._mask_cache) < _MASK_CACHE_MAX:
+                self._mask_cache[key] = mask
+        return mask
+
+    def _count_substring_matches(self, column: str, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        counts = np.zeros((len(batch), len(self)), dtype=np.int64)
+        for row, needles in enumerate(batch):
+            for needle in set(needles):
+                counts[row] += self._substring_mask(column, needle)
+        return counts
+
+    def count_med_matches(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) count of patient med classes found in the condition's med_class cell."""
+        return self._count_substring_matches("med_classes", batch)
+
+    def count_allergy_matches(self, batch: Sequence[Iterable[str]]) -> np.ndarray:
+        """(patients x conditions) count of patient allergens found in the condition's exclude_allergen cell."""
+        return self._count_substring_matches("exclude_allergens", batch)
+
+    @classmethod
+    def from_knowledge_base(cls, kb: Any) -> "TriageIndex":
+        """
+        Compile the index from a knowledge pack snapshot (or an adapter's current sheets).
+        With a shared_dir the arrays are attached from the copy published there for the
+        pack version, so workers after the first neither load the sheets nor compile.
+        """
+        arrays = shared_arrays(
+            _shared_path(kb, "triage_index"),
+            lambda: cls.compile_arrays(
+                conditions_df=kb.get_sheet("conditions"),
+                red_flags_df=kb.get_sheet("red_flags"),
+                validation_checklist_df=kb.get_sheet("clinician_validation_checklist"),
+                assistant_action_ui_df=kb.get_sheet("assistant_action_ui_map"),
+            ),
+        )
+        return cls(arrays, pack_version=kb.pack_version, weights_source=kb)
+
+    @classmethod
+    def from_sheets(
+        cls,
+        conditions_df: pd.DataFrame,
+        red_flags_df: pd.DataFrame,
+        validation_checklist_df: Optional[pd.DataFrame] = None,
+        assistant_action_ui_df: Optional[pd.DataFrame] = None,
+        pack_version: str = "",
+        weights_source: Optional[Any] = None,
+    ) -> "TriageIndex":
+        return cls(
+            cls.compile_arrays(conditions_df, red_flags_df, validation_checklist_df, assistant_action_ui_df),
+            pack_version=pack_version,
+            weights_source=weights_source,
+        )
+
+    @staticmethod
+    def compile_arrays(
+        conditions_df: pd.DataFrame,
+        red_flags_df: pd.DataFrame,
+        validation_checklist_df: Optional[pd.DataFrame] = None,
+        assistant_action_ui_df: Optional[pd.DataFrame] = None,
+    ) -> Dict[str, np.ndarray]:
+        """Compile the (read-only) index arrays from the knowledge pack sheets."""
+        condition_ids = []
+        condition_names = []
+        key_symptoms = []
+        supports = []
+        red_flags = []
+        med_classes = []
+        exclude_allergens = []
+        suggestions: Dict[str, Tuple[Tuple[str, str, str], ...]] = {}
+
+        for row in conditions_df.to_dict(orient="records"):
+            cond_id = _cell_str(row.get("condition_id"))
+            # Suggestions come from the first row carrying a condition_id
+            if cond_id and cond_id not in suggestions:
+                suggestions[cond_id] = tuple(
+                    (kind, item.strip(), f"{kind.capitalize()}: {item.strip()}")
+                    for kind in SUGGESTION_KINDS
+                    for item in _cell_str(row.get(kind)).split(";")
+                    if item.strip()
+                )
+            cond_name = _cell_str(row.get("condition_name")).strip()
+            # Skip invalid/unnamed conditions (prevents Pydantic ValidationError)
+            if not cond_id or not cond_name:
+                continue
+            condition_ids.append(cond_id)
+            condition_names.append(cond_name)
+            key_symptoms.append(frozenset(_cell_str(row.get("key_symptoms")).split(";")))
+            supports.append(frozenset(_cell_str(row.get("supports")).split(";")))
+            red_flags.append(frozenset(
+                rf.strip() for rf in _cell_str(row.get("red_flags")).split(";") if rf.strip()
+            ))
+            med_classes.append(_cell_str(row.get("med_class")))
+            exclude_allergens.append(_cell_str(row.get("exclude_allergen")))
+
+        red_flag_ids = [
+            rf_id for rf_id in (
+                _cell_str(row.get("red_flag_id")) for row in red_flags_df.to_dict(orient="records")
+            ) if rf_id
+        ]
+        tier2_rules = compile_tier2_rules(
+            validation_checklist_df.to_dict(orient="records") if validation_checklist_df is not None else [],
+            assistant_action_ui_df.to_dict(orient="records") if assistant_action_ui_df is not None else [],
+        )
+
+        arrays = {
+            "condition_ids": _str_array(condition_ids),
+            "condition_names": _str_array(condition_names),
+            "med_classes": _str_array(med_classes),
+            "exclude_allergens": _str_array(exclude_allergens),
+            "red_flag_ids": _str_array(red_flag_ids),
+            "tier2_fields": _str_array(rule.field_id for rule in tier2_rules),
+            "tier2_ui_components": _str_array(rule.ui_component or "" for rule in tier2_rules),
+            "tier2_has_ui": np.array([rule.ui_component is not None for rule in tier2_rules], dtype=bool),
+        }
+        arrays["symptom_vocab"], arrays["symptom_matrix"] = _incidence_matrix(key_symptoms)
+        arrays["support_vocab"], arrays["support_matrix"] = _incidence_matrix(supports)
+        arrays["red_flag_vocab"], arrays["red_flag_matrix"] = _incidence_matrix(red_flags)
+
+        # Conditions sharing a (lowercased) name share one issue pattern
+        patterns: Dict[str, int] = {}
+        pattern_of = [patterns.setdefault(name.lower(), len(patterns)) for name in condition_names]
+        arrays["issue_patterns"] = _str_array(patterns)
+        arrays["issue_pattern_of"] = np.array(pattern_of, dtype=np.intp)
+
+        records = [suggestions.get(cond_id, ()) for cond_id in condition_ids]
+        arrays["suggestion_offsets"] = np.cumsum([0] + [len(r) for r in records], dtype=np.intp)
+        flat = [record for r in records for record in r]
+        for column, kind in enumerate(("kinds", "ids", "descriptions")):
+            arrays[f"suggestion_{kind}"] = _str_array(record[column] for record in flat)
+        return _frozen(arrays)
+
+
+class SymptomWeights:
+    """
+    Condition x symptom float weights for the weighted scoring mode, with columns in
+    the order of the sorted `vocab` and the row order of the snapshot's triage index.
+    """
+
+    __slots__ = ("vocab", "matrix")
+
+    def __init__(self, vocab: np.ndarray, matrix: np.ndarray):
+        self.vocab = vocab
+        self.matrix = matrix
+
+    @classmethod
+    def from_knowledge_base(cls, kb: Any) -> "SymptomWeights":
+        """
+        Compile from the SUPPORTS edges and intake weight modifiers of a knowledge pack
+        snapshot (attached from its shared_dir when already published there).
+        """
+        return cls(**shared_arrays(
+            _shared_path(kb, "triage_symptom_weights"),
+            lambda: _symptom_weight_matrix(
+                get_triage_index(kb),
+                get_graph_adjacency(kb).get("SUPPORTS"),
+                _weight_modifiers(_optional_sheet(kb, "intake_q_symptom_map")),
+            ),
+        ))
+
+
+def _shared_path(kb: Any, key: str) -> Optional[Path]:
+    """Where a compiled structure of the knowledge pack is shared across workers (None: not shared)."""
+    shared_dir = getattr(kb, "shared_dir", None)
+    return shared_dir / f"{key}-v{_SHARED_FORMAT}" if shared_dir is not None else None
+
+
+def get_triage_index(kb: Any) -> TriageIndex:
+    """Get the compiled triage index for a pinned snapshot (or the adapter's current one)."""
+    return kb.get_compiled("triage_index", TriageIndex.from_knowledge_base)
+
+
+def get_symptom_weights(kb: Any) -> SymptomWeights:
+    """Get the compiled weighted-mode symptom weights for a pinned snapshot (or the adapter's current one)."""
+    return kb.get_compiled("triage_symptom_weights", SymptomWeights.from_knowledge_base)
@@ -0,0 +1,21 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from api.config import settings
+
+
+def require_admin_key(x_admin_key: Optional[str] = Header(None)):
+    """
+    Dependency for admin-only routes: the X-Admin-Key header must match
+    settings.ADMIN_API_KEY. Admin routes are disabled while no key is configured.
+    """
+    expected = settings.ADMIN_API_KEY
+    if not expected or not x_admin_key or not secrets.compare_digest(x_admin_key, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin key required")
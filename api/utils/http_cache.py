@@ -0,0 +1,103 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Optional brotli import - br variants are only offered when installed
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+    brotli = None
+
+
+def _accepted_encodings(header: Optional[str]) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def _etag_matches(header: Optional[str], etags: Iterable[str]) -> bool:
+    """True if an If-None-Match header matches any of the given entity tags."""
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    if "*" in candidates:
+        return True
+    # Weak comparison, as required for If-None-Match
+    candidates = {tag[2:] if tag.startswith("W/") else tag for tag in candidates}
+    return any(etag in candidates for etag in etags)
+
+
+class CachedJSON:
+    """
+    JSON response body serialized once, with strong ETags and pre-compressed
+    gzip (and brotli, if installed) variants. Build once per knowledge pack
+    version and serve the same bytes to every client.
+    """
+
+    __slots__ = ("bodies", "etags")
+
+    # Preferred order when the client accepts several codings equally
+    ENCODINGS = ("br", "gzip")
+
+    def __init__(self, content: Any):
+        body = json.dumps(
+            content, ensure_ascii=False, allow_nan=False, default=str, separators=(",", ":")
+        ).encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies: Dict[str, bytes] = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if BROTLI_AVAILABLE:
+            self.bodies["br"] = brotli.compress(body)
+        # Strong ETag per representation: the content hash, suffixed by content coding
+        self.etags: Dict[str, str] = {
+            encoding: f'"{digest}"' if encoding == "identity" else f'"{digest}-{encoding}"'
+            for encoding in self.bodies
+        }
+
+    def _negotiate(self, accept_encoding: Optional[str]) -> str:
+        accepted = _accepted_encodings(accept_encoding)
+        best, best_q = "identity", 0.0
+        for encoding in self.ENCODINGS:
+            q = accepted.get(encoding, accepted.get("*", 0.0))
+            if encoding in self.bodies and q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def response(self, request: Request, cache_control: str = "no-cache") -> Response:
+        """
+        Serve the cached body for this request: 304 if the client's copy is current,
+        otherwise the best pre-compressed variant it accepts.
+        """
+        encoding = self._negotiate(request.headers.get("accept-encoding"))
+        headers = {
+            "ETag": self.etags[encoding],
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request.headers.get("if-none-match"), self.etags.values()):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.bodies[encoding], media_type="application/json", headers=headers)
@@ -0,0 +1,107 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Mapping, Optional
+
+import numpy as np
+
+# Optional import - without fcntl (Windows) processes may build the same arrays
+# concurrently; the first to publish wins and later processes attach to its copy
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def attach_arrays(directory: Path) -> Optional[Dict[str, np.ndarray]]:
+    """Memory-map the arrays published in `directory` read-only; None if not published."""
+    if not directory.is_dir():
+        return None
+    try:
+        return {
+            path.stem: np.load(path, mmap_mode="r", allow_pickle=False)
+            for path in directory.glob("*.npy")
+        }
+    except Exception as e:
+        logger.warning("Ignoring unreadable shared arrays in %s: %s", directory, e)
+        return None
+
+
+def publish_arrays(directory: Path, arrays: Mapping[str, np.ndarray]) -> bool:
+    """
+    Write arrays as `<name>.npy` files of `directory`. The directory is renamed into
+    place once complete, so readers never see part of it. Returns True once published
+    (by this or another process).
+    """
+    tmp = directory.with_name(f"{directory.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.mkdir(parents=True)
+        for name, array in arrays.items():
+            np.save(tmp / f"{name}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        os.rename(tmp, directory)
+    except OSError as e:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if directory.is_dir():
+            return True
+        logger.warning("Failed to publish shared arrays to %s: %s", directory, e)
+        return False
+    return True
+
+
+@contextmanager
+def _publish_lock(directory: Path) -> Iterator[None]:
+    """Hold an exclusive lock, across processes, on publishing `directory`."""
+    if not FCNTL_AVAILABLE:
+        yield
+        return
+    with open(directory.with_name(f"{directory.name}.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def shared_arrays(
+    directory: Optional[Path],
+    build: Callable[[], Dict[str, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    """
+    Arrays shared by every process that needs the same content: the first process
+    builds and publishes them to `directory` while holding its lock, and all processes,
+    including that one, memory-map the published files read-only, so the page cache
+    holds the only copy. Processes arriving meanwhile wait for the lock and attach
+    instead of building. The directory name must identify the content and layout.
+    Without a directory, or if it cannot be written, the arrays are built privately.
+    """
+    if directory is None:
+        return build()
+    arrays = attach_arrays(directory)
+    if arrays is not None:
+        return arrays
+    try:
+        with _publish_lock(directory):
+            arrays = attach_arrays(directory)
+            if arrays is None:
+                built = build()
+                if not publish_arrays(directory, built):
+                    return built
+                arrays = attach_arrays(directory)
+                if arrays is None:
+                    return built
+    except OSError as e:
+        logger.warning("Failed to lock shared arrays %s, building them privately: %s", directory, e)
+        return build()
+    return arrays
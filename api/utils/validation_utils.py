@@ -3,7 +3,7 @@
 Proprietary and confidential.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, NamedTuple, Optional, Sequence, Tuple
 
 def validate_tier1_completion(response: Any, required_fields: List[str]) -> List[str]:
     """
@@ -47,20 +47,82 @@ def validate_red_flags(response: Any, red_flag_ids: List[str]) -> List[str]:
                     triggered.append(rf.red_flag_id)
     return triggered
 
-def validate_tier2_prompts(response: Any, checklist: List[Dict[str, Any]]) -> List[str]:
+class Tier2Rule(NamedTuple):
+    """Compiled Tier 2 completeness rule (one per required Tier 2 checklist field)."""
+    field_id: str
+    accessor: Callable[[Any], Any]
+    is_empty: Callable[[Any], bool]
+    ui_component: Optional[str]
+    action_id: str
+    description: str
+
+
+def _field_accessor(field: str) -> Callable[[Any], Any]:
+    return lambda response: getattr(response, field, None)
+
+
+def _is_empty(val: Any) -> bool:
+    return not val
+
+
+def _ui_value(value: Any) -> Optional[str]:
+    # Excel cells come through as NaN when blank
+    if value is None or value != value:
+        return None
+    return str(value)
+
+
+def compile_tier2_rules(
+    checklist: List[Dict[str, Any]],
+    ui_map: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[Tier2Rule, ...]:
     """
-    Validates Tier 2 completion (for assistant prompting).
-    Returns missing Tier 2 field names as list.
-    The checklist is a list of dicts from clinician_validation_checklist.
+    Compile clinician_validation_checklist rows (and assistant_action_ui_map rows for
+    the UI component) into Tier 2 rules. Built once per knowledge pack; evaluating
+    the rules needs no DataFrame access.
     """
-    missing = []
+    ui_components: Dict[str, Optional[str]] = {}
+    for row in ui_map or []:
+        field = row.get("field_id")
+        if field is not None and field not in ui_components:
+            ui_components[field] = _ui_value(row.get("ui_component"))
+
+    rules = []
     for item in checklist:
         if str(item.get("tier_level")) != "2":
             continue
         field = item.get("field_id")
         required = bool(item.get("required", True))
-        if required:
-            val = getattr(response, field, None)
-            if not val or (isinstance(val, list) and len(val) == 0):
-                missing.append(field)
-    return missing
\ No newline at end of file
+        if not required or field is None or field != field:
+            continue
+        field = str(field)
+        rules.append(tier2_rule(field, ui_components.get(field)))
+    return tuple(rules)
+
+
+def tier2_rule(field: str, ui_component: Optional[str] = None) -> Tier2Rule:
+    """Tier 2 completeness rule for one required checklist field."""
+    return Tier2Rule(
+        field_id=field,
+        accessor=_field_accessor(field),
+        is_empty=_is_empty,
+        ui_component=ui_component,
+        action_id=f"assistant_{field}",
+        description=f"Please complete missing field: {field}",
+    )
+
+
+def find_missing_tier2(response: Any, rules: Sequence[Tier2Rule]) -> List[Tier2Rule]:
+    """Returns the compiled Tier 2 rules whose field is missing/empty on the response."""
+    return [rule for rule in rules if rule.is_empty(rule.accessor(response))]
+
+
+
+def validate_tier2_prompts(response: Any, checklist: List[Dict[str, Any]]) -> List[str]:
+    """
+    Validates Tier 2 completion (for assistant prompting).
+    Returns missing Tier 2 field names as list.
+    The checklist is a list of dicts from clinician_validation_checklist; callers
+    holding the compiled rules (the triage index) use find_missing_tier2 directly.
+    """
+    return [rule.field_id for rule in find_missing_tier2(response, compile_tier2_rules(checklist))]
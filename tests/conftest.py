@@ -0,0 +1,205 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import random
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from api.adapters.knowledge_base import EXCEL_SHEET_MAPPING, KnowledgeBaseAdapter
+from api.adapters.memory_store import MockMemoryStore, reset_memory_store
+from api.adapters.mock_knowledge_base import MockKnowledgeBaseAdapter
+from api.config import settings
+from api.models.intake import IntakeQuestionnaireResponse
+from api.services import audit_logger
+
+# Vocabulary of the synthetic knowledge pack (mock_kb) and intakes (make_intake)
+SYMPTOMS = [f"s{i}" for i in range(40)]
+PMH = [f"h{i}" for i in range(15)]
+RED_FLAGS = [f"rf{i}" for i in range(8)]
+MED_CLASSES = ["ssri", "nsaid", "beta", "statin"]
+ALLERGENS = ["penicillin", "sulfa", "latex"]
+
+
+@pytest.fixture
+def open_store(tmp_path):
+    """
+    Open a MockMemoryStore persisted in tmp_path, as a newly started process would
+    (the previous store is closed and the singleton reset first, so every call
+    recovers from disk).
+    """
+
+    def open_store(**kwargs) -> MockMemoryStore:
+        reset_memory_store()
+        return MockMemoryStore(str(tmp_path / "memory_store.pkl"), **kwargs)
+
+    yield open_store
+    reset_memory_store()
+
+
+@pytest.fixture
+def mem():
+    """An in-memory MockMemoryStore (no persistence)."""
+    reset_memory_store()
+    yield MockMemoryStore()
+    reset_memory_store()
+
+
+@pytest.fixture
+def knowledge_pack():
+    """
+    Knowledge pack provider app_client installs on app.state before startup
+    (None: the lifespan creates the default one). Override in a test module to
+    serve another knowledge base.
+    """
+    return None
+
+
+@pytest.fixture
+def audit_log(tmp_path, monkeypatch):
+    """Send audit events to a fresh log in tmp_path (returns its path)."""
+    path = tmp_path / "audit.log"
+    monkeypatch.setattr(settings, "AUDIT_LOG_PATH", str(path))
+    monkeypatch.setattr(settings, "AUDIT_IMMUTABLE", False)
+    monkeypatch.setattr(audit_logger.AuditLogger, "_instance", None)
+    monkeypatch.setattr(audit_logger, "_audit_logger_instance", None)
+    return path
+
+
+@pytest.fixture
+def app_client(audit_log, knowledge_pack):
+    """
+    TestClient for the app with its lifespan run, a fresh in-memory store, the
+    audit log in tmp_path and the knowledge_pack provider.
+    """
+    from api.main import app
+
+    reset_memory_store()
+    app.state.knowledge_pack = knowledge_pack
+    with TestClient(app) as client:
+        yield client
+    app.state.knowledge_pack = None
+    reset_memory_store()
+
+
+@pytest.fixture
+def excel_kb(tmp_path, monkeypatch):
+    """
+    Factory opening a KnowledgeBaseAdapter on a workbook in tmp_path as a newly
+    started worker would (the singleton is reset on every call and restored
+    afterwards). excel_kb.write(*condition_ids) (re)writes the workbook;
+    excel_kb.write_sheets(sheets) writes it from a {sheet name: DataFrame} mapping.
+    """
+    path = tmp_path / "pack.xlsx"
+    adapters = []
+
+    def open_kb(**kwargs) -> KnowledgeBaseAdapter:
+        monkeypatch.setattr(KnowledgeBaseAdapter, "_instance", None)
+        adapter = KnowledgeBaseAdapter(excel_path=str(path), **kwargs)
+        adapters.append(adapter)
+        return adapter
+
+    def write(*condition_ids: str):
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            pd.DataFrame({
+                "condition_id": list(condition_ids),
+                "condition_name": [f"{c} name" for c in condition_ids],
+            }).to_excel(writer, sheet_name="nodes_condition", index=False)
+            pd.DataFrame({"red_flag_id": ["rf1"]}).to_excel(writer, sheet_name="nodes_redflag", index=False)
+
+    def write_sheets(sheets):
+        with pd.ExcelWriter(path, engine="openpyxl") as writer:
+            for name, df in sheets.items():
+                df.to_excel(writer, sheet_name=EXCEL_SHEET_MAPPING[name], index=False)
+
+    open_kb.path = path
+    open_kb.write = write
+    open_kb.write_sheets = write_sheets
+    yield open_kb
+    for adapter in adapters:
+        adapter.close()
+
+
+@pytest.fixture
+def mock_kb():
+    """MockKnowledgeBaseAdapter holding a seeded synthetic pack of 60 conditions."""
+    rng = random.Random(0)
+    conditions = [
+        {
+            "condition_id": f"c{i}",
+            "condition_name": f"Cond {i} name",
+            "key_symptoms": ";".join(rng.sample(SYMPTOMS, rng.randint(0, 5))),
+            "supports": ";".join(rng.sample(PMH, rng.randint(0, 3))),
+            "red_flags": "; ".join(rng.sample(RED_FLAGS, rng.randint(0, 2))),
+            "med_class": ",".join(rng.sample(MED_CLASSES, rng.randint(0, 2))),
+            "exclude_allergen": ",".join(rng.sample(ALLERGENS, rng.randint(0, 1))),
+            "labs": ";".join(rng.sample(["cbc", "bmp", "tsh"], rng.randint(0, 2))),
+            "referrals": "neuro" if i % 4 == 0 else None,
+            "med_categories": "analgesic;" if i % 3 == 0 else "",
+            "actions": "rest",
+            "guides": None,
+        }
+        for i in range(60)
+    ]
+    kb = MockKnowledgeBaseAdapter()
+    kb.clear()
+    kb.inject_sheet("conditions", pd.DataFrame(conditions))
+    kb.inject_sheet("red_flags", [{"red_flag_id": red_flag} for red_flag in RED_FLAGS])
+    kb.inject_sheet("assistant_action_ui_map", [
+        {"field_id": "pmh", "ui_component": "multi_select"},
+        {"field_id": "occupation", "ui_component": "text"},
+    ])
+    kb.inject_sheet("intake_branch_rules", [{
+        "followup_question_id": "fq1", "description": "More?", "field_type": "string",
+        "trigger_if_low_confidence": True,
+    }])
+    kb.inject_sheet("clinician_validation_checklist", [
+        {"tier_level": 2, "field_id": "pmh", "required": True},
+        {"tier_level": "2", "field_id": "occupation", "required": True},
+        {"tier_level": "1", "field_id": "chief_concern", "required": True},
+    ])
+    for name in ["symptoms", "actions", "guides", "intake_q_symptom_map"]:
+        kb.inject_sheet(name, pd.DataFrame())
+    yield kb
+    kb.clear()
+
+
+@pytest.fixture
+def make_intake():
+    """Factory of seeded synthetic intakes: make_intake(seed, token=None)."""
+
+    def make_intake(seed: int, token: str = None) -> IntakeQuestionnaireResponse:
+        rng = random.Random(seed)
+        return IntakeQuestionnaireResponse(
+            session_token=token or f"tok{seed}",
+            patient_id=f"p{seed}",
+            issued_by="staff",
+            intake_mode="full",
+            started_at=datetime(2025, 1, 1),
+            chief_concern="x",
+            issue_cards=[{
+                "issue_id": "i1", "region_id": "head",
+                "description": f"I think it's cond {rng.randint(0, 20)} name really",
+                "functional_impact": "mild", "onset": "days", "course": "unchanged",
+            }],
+            symptoms=[
+                {"symptom_id": symptom, "present": rng.random() < 0.7}
+                for symptom in rng.sample(SYMPTOMS, 8)
+            ],
+            red_flags=[{"red_flag_id": red_flag, "present": rng.random() < 0.15} for red_flag in RED_FLAGS],
+            consent_acknowledged=True,
+            medications=[{"med_name": "m", "med_class": c} for c in rng.sample(MED_CLASSES, rng.randint(0, 2))],
+            allergies=[{"allergen": a} for a in rng.sample(ALLERGENS, rng.randint(0, 1))],
+            vitals={},
+            pmh=rng.sample(PMH, rng.randint(0, 4)),
+            symptom_durations={},
+            functional_impacts={},
+            social_history={},
+            occupation=rng.choice([None, "teacher"]),
+        )
+
+    return make_intake
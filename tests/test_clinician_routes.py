@@ -0,0 +1,30 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+
+
+def session(token, status, day):
+    return {
+        "session_token": token, "patient_id": f"p-{token}", "status": status,
+        "issued_by": "staff", "intake_mode": "full", "started_at": datetime(2025, 1, day).isoformat(),
+    }
+
+
+def test_dashboard_lists_active_sessions_without_lifespan(mem, audit_log):
+    from api.main import app
+
+    # A fresh store the lifespan never saw (no `with`): the route registers its index itself
+    mem.set_multi({
+        "intake_session:a": session("a", "waiting", 1),
+        "intake_session:b": session("b", "completed", 2),
+        "intake_session:c": session("c", "submitted", 3),
+    })
+    response = TestClient(app).get("/api/clinician/dashboard")
+    assert response.status_code == 200
+    assert [s["session_token"] for s in response.json()] == ["c", "a"]
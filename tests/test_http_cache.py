@@ -0,0 +1,95 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import gzip
+import json
+
+import pytest
+from starlette.requests import Request
+
+from api.utils import http_cache
+from api.utils.http_cache import CachedJSON
+
+CONTENT = {"questionnaire": [{"question_id": "q1", "label": "Douleur ?", "value": None}] * 50}
+
+
+def make_request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+@pytest.fixture
+def cached():
+    return CachedJSON(CONTENT)
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("", "identity"),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0", "identity"),
+    ("identity", "identity"),
+    ("*", "br" if http_cache.BROTLI_AVAILABLE else "gzip"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+])
+def test_serves_negotiated_variant(cached, accept_encoding, encoding):
+    response = cached.response(make_request(accept_encoding=accept_encoding))
+    assert response.status_code == 200
+    assert response.headers["etag"] == cached.etags[encoding]
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers.get("content-encoding") == (None if encoding == "identity" else encoding)
+    body = gzip.decompress(response.body) if encoding == "gzip" else response.body
+    assert json.loads(body) == CONTENT
+
+
+def test_etags_are_per_encoding(cached):
+    identity = cached.etags["identity"]
+    assert cached.etags["gzip"] == identity[:-1] + '-gzip"'
+    if http_cache.BROTLI_AVAILABLE:
+        assert cached.etags["br"] == identity[:-1] + '-br"'
+    assert CachedJSON(CONTENT).etags == cached.etags
+    assert CachedJSON({"other": 1}).etags["identity"] != identity
+
+
+@pytest.mark.parametrize("accept_encoding", ["", "gzip", "br, gzip"])
+def test_any_variant_etag_revalidates(cached, accept_encoding):
+    # A client may hold the etag of another coding (e.g. a proxy decompressed the body)
+    for etag in cached.etags.values():
+        response = cached.response(make_request(accept_encoding=accept_encoding, if_none_match=etag))
+        assert response.status_code == 304
+        assert response.body == b""
+        assert "content-encoding" not in response.headers
+        assert response.headers["etag"] == cached.etags[cached._negotiate(accept_encoding)]
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.headers["cache-control"] == "no-cache"
+
+
+@pytest.mark.skipif(not http_cache.BROTLI_AVAILABLE, reason="brotli not installed")
+def test_br_variant_etag_revalidates(cached):
+    response = cached.response(make_request(accept_encoding="gzip", if_none_match=cached.etags["br"]))
+    assert response.status_code == 304
+    assert response.headers["etag"] == cached.etags["gzip"]
+
+
+@pytest.mark.parametrize("if_none_match", [
+    lambda etags: f'W/{etags["gzip"]}',
+    lambda etags: f'"stale", {etags["gzip"]}',
+    lambda etags: "*",
+], ids=["weak", "list", "star"])
+def test_if_none_match_forms(cached, if_none_match):
+    response = cached.response(make_request(accept_encoding="gzip", if_none_match=if_none_match(cached.etags)))
+    assert response.status_code == 304
+
+
+@pytest.mark.parametrize("if_none_match", ['"stale"', '"stale-gzip"', ""])
+def test_stale_etag_gets_full_body(cached, if_none_match):
+    response = cached.response(make_request(accept_encoding="gzip", if_none_match=if_none_match))
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.body)) == CONTENT
@@ -0,0 +1,111 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import os
+import threading
+import time
+
+from api.adapters import knowledge_base
+
+
+def snapshot_dirs(path):
+    return sorted(d.name for d in (path.parent / f".{path.name}.snapshot").iterdir())
+
+
+def condition_ids(snapshot):
+    return snapshot.get_sheet("conditions")["condition_id"].tolist()
+
+
+# --- Hot reload ---
+
+def test_reload_of_unchanged_workbook_keeps_snapshot(excel_kb):
+    excel_kb.write("c1")
+    kb = excel_kb()
+    listener_calls = []
+    kb.add_reload_listener(listener_calls.append)
+    snapshot = kb.snapshot()
+    assert kb.reload() == snapshot.version
+    assert kb.snapshot() is snapshot
+    assert listener_calls == []
+
+
+def test_reload_publishes_new_version_and_notifies_listeners(excel_kb):
+    excel_kb.write("c1")
+    kb = excel_kb()
+    listener_calls = []
+    kb.add_reload_listener(listener_calls.append)
+    kb.add_reload_listener(lambda version: 1 / 0)  # failing listeners are reported, not raised
+    previous = kb.pack_version
+    excel_kb.write("c1", "c2")
+    version = kb.reload()
+    assert version != previous
+    assert listener_calls == [version]
+    assert condition_ids(kb) == ["c1", "c2"]
+    kb.remove_reload_listener(listener_calls.append)
+    excel_kb.write("c3")
+    kb.reload()
+    assert listener_calls == [version]
+
+
+def test_readers_keep_pinned_snapshot_during_swap(excel_kb):
+    excel_kb.write("c1")
+    kb = excel_kb()
+    compiling = threading.Event()
+    release = threading.Event()
+
+    def build(snapshot):
+        if snapshot.version != first.version:
+            compiling.set()
+            release.wait(5)
+        return condition_ids(snapshot)
+
+    first = kb.snapshot()
+    assert kb.get_compiled("ids", build) == ["c1"]
+    excel_kb.write("c1", "c2")
+    reload = kb.reload_in_background()
+    assert compiling.wait(5)
+    # The new version is being compiled: nothing has been swapped yet
+    assert kb.snapshot() is first
+    assert kb.get_compiled("ids", build) == ["c1"]
+    release.set()
+    reload.join(5)
+    assert kb.snapshot() is not first
+    assert kb.get_compiled("ids", build) == ["c1", "c2"]
+    # Readers that pinned the old snapshot keep reading it
+    assert condition_ids(first) == ["c1"]
+    assert first.get_compiled("ids", build) == ["c1"]
+
+
+# --- Snapshot directory retention ---
+
+def test_reload_keeps_snapshot_of_version_still_served(excel_kb):
+    excel_kb.write("c1")
+    excel_kb().get_sheet("conditions")
+    # A second worker starts on the complete snapshot of version 1
+    worker = excel_kb()
+    pinned = worker.snapshot()
+    excel_kb.write("c1", "c2")
+    worker.reload()
+    assert len(snapshot_dirs(excel_kb.path)) == 2
+    # Sheets of the pinned version are still read from its snapshot directory
+    assert pinned.get_sheet("red_flags")["red_flag_id"].tolist() == ["rf1"]
+    assert condition_ids(worker) == ["c1", "c2"]
+
+
+def test_old_snapshots_are_pruned_past_retention(excel_kb, monkeypatch):
+    monkeypatch.setattr(knowledge_base, "_SNAPSHOT_KEEP_VERSIONS", 2)
+    excel_kb.write("c1")
+    root = excel_kb.path.parent / f".{excel_kb.path.name}.snapshot"
+    stale = time.time() - knowledge_base._SNAPSHOT_GRACE_SECONDS - 60
+    for age, name in enumerate(["old-a", "old-b"]):
+        (root / name).mkdir(parents=True)
+        os.utime(root / name, (stale - age, stale - age))
+    for age, name in enumerate(["recent-a", "recent-b"]):
+        (root / name).mkdir()
+        os.utime(root / name, (stale, time.time() - 60 * (age + 1)))
+    excel_kb()
+    # The current version plus the most recently used other one are kept regardless
+    # of age, and directories used within the grace period are kept beyond that
+    assert snapshot_dirs(excel_kb.path)[1:] == ["recent-a", "recent-b"]
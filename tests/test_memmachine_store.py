@@ -0,0 +1,126 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import fnmatch
+
+import pytest
+
+from api.adapters import memmachine_store
+from api.adapters.memmachine_store import MemMachineStore, reset_memmachine_store
+
+
+class FakeClient:
+    """In-memory stand-in for the MemMachine client (single-key calls only)."""
+
+    def __init__(self, config):
+        self.data = {}
+        self.calls = []
+
+    def set(self, key, value, ttl=None):
+        self.calls.append("set")
+        self.data[key] = value
+
+    def get(self, key):
+        self.calls.append("get")
+        return self.data.get(key)
+
+    def delete(self, key):
+        self.calls.append("delete")
+        self.data.pop(key, None)
+
+    def keys(self, pattern):
+        return [key for key in self.data if fnmatch.fnmatch(key, pattern)]
+
+
+class FakeBatchClient(FakeClient):
+    """Fake client that also has the batch calls."""
+
+    def get_multi(self, keys):
+        self.calls.append("get_multi")
+        return {key: self.data[key] for key in keys if key in self.data}
+
+    def set_multi(self, items, ttl=None):
+        self.calls.append(f"set_multi:{ttl}")
+        self.data.update(items)
+
+    def delete_multi(self, keys):
+        self.calls.append("delete_multi")
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture
+def open_store(monkeypatch):
+    """Open a MemMachineStore on a fake client of the given class."""
+
+    def open_store(client_class) -> MemMachineStore:
+        monkeypatch.setattr(memmachine_store, "MEMMACHINE_AVAILABLE", True)
+        monkeypatch.setattr(memmachine_store, "MemMachineConfig", lambda **kwargs: kwargs)
+        monkeypatch.setattr(memmachine_store, "MemMachineClient", client_class)
+        reset_memmachine_store()
+        return MemMachineStore()
+
+    yield open_store
+    reset_memmachine_store()
+
+
+both_clients = pytest.mark.parametrize("client_class", [FakeClient, FakeBatchClient], ids=["per_key", "batch"])
+
+
+@both_clients
+def test_bulk_operations(open_store, client_class):
+    store = open_store(client_class)
+    store.set_multi({"a": {"x": 1}, "b": "s", "c": 3}, ttl=60, ttls={"c": 5})
+    assert store.get_multi(["a", "b", "c", "missing"]) == {"a": {"x": 1}, "b": "s", "c": 3}
+    store.delete_multi(["a", "missing"])
+    assert store.get_multi(["a", "b"]) == {"b": "s"}
+
+
+@pytest.mark.parametrize("client_class, calls", [
+    (FakeClient, ["set", "set", "get", "get", "delete"]),
+    (FakeBatchClient, ["set_multi:60", "set_multi:5", "get_multi", "delete_multi"]),
+], ids=["per_key", "batch"])
+def test_bulk_operations_use_batch_calls_when_available(open_store, client_class, calls):
+    store = open_store(client_class)
+    store.set_multi({"a": 1, "b": 2}, ttl=60, ttls={"b": 5})
+    store.get_multi(["a", "b"])
+    store.delete_multi(["a"])
+    assert store.client.calls == calls
+
+
+def test_batch_call_errors_propagate(open_store, monkeypatch):
+    store = open_store(FakeBatchClient)
+
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("MemMachine unavailable")
+
+    for name in ("get_multi", "set_multi", "delete_multi"):
+        monkeypatch.setattr(store.client, name, unavailable)
+    with pytest.raises(ConnectionError):
+        store.get_multi(["a"])
+    with pytest.raises(ConnectionError):
+        store.set_multi({"a": 1})
+    with pytest.raises(ConnectionError):
+        store.delete_multi(["a"])
+    # No per-key fallback after a failed batch call
+    assert store.client.calls == []
+
+
+@both_clients
+def test_find_matches_mock_store_contract(open_store, client_class):
+    store = open_store(client_class)
+    store.register_index("status", "intake_session:", "status")
+    store.set_multi({
+        "intake_session:a": {"status": "waiting"},
+        "intake_session:b": {"status": "completed"},
+        "intake_session:c": {"other": 1},
+        "intake_session:d": {"status": ["unhashable"]},
+        "patient:e": {"status": "waiting"},
+    })
+    store.set("intake_session:f", {"status": "waiting"}, namespace="other")
+    assert set(store.find("status", equals="waiting")) == {"intake_session:a"}
+    assert set(store.find("status", equals=None)) == {"intake_session:c"}
+    assert set(store.find("status", exclude=("completed",))) == {"intake_session:a", "intake_session:c"}
+    assert set(store.find("status", namespace="other")) == {"intake_session:f"}
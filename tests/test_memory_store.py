@@ -0,0 +1,518 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import pickle
+import random
+import threading
+import time
+
+import pytest
+
+from api.adapters.memory_store import MockMemoryStore, _WriteAheadLog, _wal_segments
+
+
+def crash(store: MockMemoryStore):
+    """
+    Abandon a persisted store the way a crash would: no final snapshot, and the
+    log left as written (committed records are already on disk).
+    """
+    store._closed = True
+    store._reaper_stop.set()
+    store._reaper_wakeup.set()
+    store._compact_wakeup.set()
+    wal, store._wal = store._wal, None
+    wal._file.close()
+
+
+# --- Crash recovery ---
+
+def test_recovers_logged_writes_after_crash(open_store):
+    store = open_store()
+    store.set("intake_session:a", {"status": "waiting"})
+    store.set("patient:1", "log", namespace="logs")
+    store.set_multi({"k1": 1, "k2": 2, "k3": 3})
+    store.delete("patient:1", namespace="logs")
+    store.delete_multi(["k2", "missing"])
+    store.increment("k3", 10)
+    store.set("x", 1, namespace="scratch")
+    store.clear(namespace="scratch")
+    crash(store)
+
+    store = open_store()
+    assert store.get("intake_session:a") == {"status": "waiting"}
+    assert not store.exists("patient:1", namespace="logs")
+    assert store.get_multi(["k1", "k2", "k3"]) == {"k1": 1, "k3": 13}
+    assert not store.exists("x", namespace="scratch")
+
+
+def test_recovers_snapshot_plus_later_log(open_store, tmp_path):
+    store = open_store()
+    store.set("before", 1)
+    store.snapshot()
+    store.set("after", 2)
+    store.delete("before")
+    crash(store)
+
+    store = open_store()
+    assert store.get("before") is None
+    assert store.get("after") == 2
+    # The snapshot taken on open compacts the replayed segments away
+    generations = [generation for generation, _ in _wal_segments(tmp_path / "memory_store.pkl")]
+    assert generations == [store._wal.generation]
+
+
+def test_ignores_torn_log_tail(open_store, tmp_path):
+    store = open_store()
+    store.set("a", 1)
+    store.set("b", 2)
+    crash(store)
+    _, segment = _wal_segments(tmp_path / "memory_store.pkl")[-1]
+    data = segment.read_bytes()
+    # Cut the last record short, as a crash mid-write would
+    segment.write_bytes(data[:-3])
+
+    store = open_store()
+    assert store.get("a") == 1
+    assert not store.exists("b")
+    # The store keeps logging in a fresh segment after a torn tail
+    store.set("c", 3)
+    crash(store)
+    store = open_store()
+    assert store.get_multi(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_ignores_corrupt_log_record(open_store, tmp_path):
+    store = open_store()
+    store.set("a", 1)
+    store.set("b", 2)
+    crash(store)
+    _, segment = _wal_segments(tmp_path / "memory_store.pkl")[-1]
+    data = bytearray(segment.read_bytes())
+    data[-1] ^= 0xFF
+    segment.write_bytes(bytes(data))
+
+    store = open_store()
+    assert store.get("a") == 1
+    assert not store.exists("b")
+
+
+def test_values_are_copies(open_store):
+    store = open_store()
+    store.set("intake_session:a", {"status": "waiting", "answers": []})
+    session = store.get("intake_session:a")
+    session["status"] = "completed"
+    session["answers"].append("x")
+    assert store.get("intake_session:a") == {"status": "waiting", "answers": []}
+
+    # A snapshot written after an in-place edit holds the stored value, not the edit
+    store.snapshot()
+    crash(store)
+    store = open_store()
+    assert store.get("intake_session:a") == {"status": "waiting", "answers": []}
+
+
+def test_recovers_whole_store_snapshot(open_store, tmp_path):
+    # Snapshots written before the log pickled the whole store, values unpickled
+    path = tmp_path / "memory_store.pkl"
+    with open(path, "wb") as f:
+        pickle.dump({"store": {"default:old": {"n": 1}}, "expiry": {}}, f)
+    store = open_store()
+    assert store.get("old") == {"n": 1}
+    store.set("new", 2)
+    crash(store)
+
+    store = open_store()
+    assert store.get_multi(["old", "new"]) == {"old": {"n": 1}, "new": 2}
+
+
+def test_unpersisted_values_are_stored_by_reference(mem):
+    session = {"status": "waiting", "lock": threading.Lock()}
+    mem.set("intake_session:a", session)
+    assert mem.get("intake_session:a") is session
+    assert mem.get_multi(["intake_session:a"])["intake_session:a"] is session
+
+
+class FailingFile:
+    """Stands in for a log segment on a full disk."""
+
+    def __init__(self):
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        pass
+
+    def fileno(self):
+        raise AssertionError("not written")
+
+    def close(self):
+        pass
+
+
+def test_failed_log_write_raises_until_next_segment(open_store):
+    store = open_store(snapshot_interval=3600)
+    store.set("a", 1)
+    wal = store._wal
+    segment, failing = wal._file, FailingFile()
+    # Keep compaction from starting the next segment while the disk is failing
+    store._snapshot_lock.acquire()
+    try:
+        wal._file = failing
+        with pytest.raises(OSError, match="No space left"):
+            store.set("b", 2)
+        # The segment is broken: later writes fail without writing after the torn record
+        with pytest.raises(OSError):
+            store.set_multi({"c": 3, "d": 4})
+        with pytest.raises(OSError):
+            store.delete("a")
+        assert failing.writes == 1
+        # Failed changes stay applied in memory
+        assert store.get_multi(["a", "b", "c", "d"]) == {"b": 2, "c": 3, "d": 4}
+    finally:
+        store._snapshot_lock.release()
+        segment.close()
+    # A failed commit wakes compaction: its snapshot persists the lost changes
+    assert wait_for(lambda: wal.error is None)
+    with store._snapshot_lock:
+        pass  # Snapshot written
+    store.set("e", 5)
+    crash(store)
+
+    store = open_store()
+    assert store.get_multi(["a", "b", "c", "d", "e"]) == {"b": 2, "c": 3, "d": 4, "e": 5}
+
+
+def test_failed_group_commit_raises_for_every_writer(tmp_path):
+    wal = _WriteAheadLog(tmp_path / "store.pkl", 0)
+    wal._file.close()
+    wal._file = FailingFile()
+    seqs = [wal.append(_WriteAheadLog.encode(("put", f"default:k{i}", b"", None))) for i in range(5)]
+    errors = []
+
+    def committer(seq):
+        try:
+            wal.commit(seq)
+        except OSError as e:
+            errors.append(e)
+
+    run_threads(*[lambda seq=seq: committer(seq) for seq in seqs])
+    assert len(errors) == len(seqs)
+    assert wal._file.writes == 1
+    wal.rotate()
+    wal.commit(wal.append(_WriteAheadLog.encode(("delete", "default:k0"))))
+    wal.close()
+
+
+# --- Secondary indexes: find() ---
+
+def test_find_by_status(mem):
+    mem.register_index("status", "intake_session:", "status")
+    mem.set("intake_session:a", {"status": "waiting"})
+    mem.set("intake_session:b", {"status": "submitted"})
+    mem.set("intake_session:c", {"status": "completed"})
+    mem.set("intake_session:d", {"other": 1})
+    mem.set("intake_session:e", "not a dict")
+    mem.set("patient:f", {"status": "waiting"})
+
+    assert set(mem.find("status", equals="waiting")) == {"intake_session:a"}
+    assert set(mem.find("status", exclude=("completed",))) == {"intake_session:a", "intake_session:b", "intake_session:d"}
+    assert set(mem.find("status")) == {"intake_session:a", "intake_session:b", "intake_session:c", "intake_session:d"}
+    # None is a value: it matches entries without the field
+    assert set(mem.find("status", equals=None)) == {"intake_session:d"}
+
+
+def test_find_follows_set_delete_and_clear(mem):
+    mem.register_index("status", "intake_session:", "status")
+    mem.set("intake_session:a", {"status": "waiting"})
+    mem.set("intake_session:b", {"status": "waiting"})
+    mem.set("intake_session:a", {"status": "completed"})
+    mem.delete("intake_session:b")
+    assert mem.find("status", equals="waiting") == {}
+    assert mem.find("status", equals="completed") == {"intake_session:a": {"status": "completed"}}
+
+    mem.set_multi({"intake_session:c": {"status": "waiting"}, "intake_session:d": {"status": "waiting"}})
+    mem.delete_multi(["intake_session:c"])
+    assert set(mem.find("status", equals="waiting")) == {"intake_session:d"}
+    mem.clear()
+    assert mem.find("status") == {}
+
+
+def test_find_skips_in_place_edits_until_set(mem):
+    mem.register_index("status", "intake_session:", "status")
+    mem.set("intake_session:a", {"status": "waiting"})
+    session = mem.get("intake_session:a")
+    session["status"] = "completed"
+    # Values are stored by reference: the entry no longer matches its index bucket
+    assert mem.find("status", equals="waiting") == {}
+    assert mem.find("status", equals="completed") == {}
+    mem.set("intake_session:a", session)
+    assert mem.find("status", equals="waiting") == {}
+    assert set(mem.find("status", equals="completed")) == {"intake_session:a"}
+
+
+def test_find_ignores_in_place_edits_of_persisted_values(open_store):
+    store = open_store()
+    store.register_index("status", "intake_session:", "status")
+    store.set("intake_session:a", {"status": "waiting"})
+    store.get("intake_session:a")["status"] = "completed"
+    assert store.find("status", equals="waiting") == {"intake_session:a": {"status": "waiting"}}
+
+
+def test_find_is_per_namespace(mem):
+    mem.register_index("status", "intake_session:", "status")
+    mem.set("intake_session:a", {"status": "waiting"})
+    mem.set("intake_session:b", {"status": "waiting"}, namespace="other")
+    assert set(mem.find("status", equals="waiting")) == {"intake_session:a"}
+    assert set(mem.find("status", equals="waiting", namespace="other")) == {"intake_session:b"}
+    mem.clear(namespace="other")
+    assert mem.find("status", namespace="other") == {}
+    assert set(mem.find("status")) == {"intake_session:a"}
+
+
+def test_register_index_covers_existing_entries(mem):
+    mem.set("intake_session:a", {"status": "waiting"})
+    mem.register_index("status", "intake_session:", "status")
+    mem.register_index("status", "intake_session:", "status")
+    assert set(mem.find("status", equals="waiting")) == {"intake_session:a"}
+
+
+def test_find_unknown_index_raises(mem):
+    with pytest.raises(KeyError):
+        mem.find("nope")
+
+
+def test_indexes_rebuilt_on_recovery(open_store):
+    store = open_store()
+    store.register_index("status", "intake_session:", "status")
+    store.set("intake_session:a", {"status": "waiting"})
+    store.set("intake_session:b", {"status": "completed"})
+    crash(store)
+
+    store = open_store()
+    store.register_index("status", "intake_session:", "status")
+    assert set(store.find("status", exclude=("completed",))) == {"intake_session:a"}
+    assert set(store.keys_with_prefix("intake_session:")) == {"intake_session:a", "intake_session:b"}
+
+
+def test_find_matches_full_scan(mem):
+    """Random mixed operations never leave the index out of step with the stored values."""
+    rng = random.Random(7)
+    statuses = ["waiting", "submitted", "completed"]
+    mem.register_index("status", "intake_session:", "status")
+    for step in range(3000):
+        key = f"intake_session:{rng.randrange(50)}"
+        op = rng.random()
+        if op < 0.6:
+            mem.set(key, {"status": rng.choice(statuses), "step": step})
+        elif op < 0.8:
+            mem.delete(key)
+        elif op < 0.9:
+            mem.set_multi({f"intake_session:{rng.randrange(50)}": {"status": rng.choice(statuses)} for _ in range(3)})
+        else:
+            # In-place edit, saved by set()
+            session = mem.get(key)
+            if session:
+                session["status"] = rng.choice(statuses)
+                mem.set(key, session)
+
+    stored = mem.get_multi(mem.keys_with_prefix("intake_session:"))
+    for status in statuses:
+        expected = {key for key, value in stored.items() if value["status"] == status}
+        assert set(mem.find("status", equals=status)) == expected
+    assert mem.find("status", exclude=("completed",)) == {
+        key: value for key, value in stored.items() if value["status"] != "completed"
+    }
+
+
+# --- TTL expiry ---
+
+def wait_for(predicate, timeout: float = 3.0) -> bool:
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_expired_key_is_not_returned(mem):
+    mem.set("a", 1, ttl=0.05)
+    assert mem.get("a") == 1
+    time.sleep(0.1)
+    assert mem.get("a", default="gone") == "gone"
+    assert not mem.exists("a")
+    assert mem.get_multi(["a"]) == {}
+    assert mem.get_ttl("a") is None
+
+
+def test_reaper_evicts_expired_keys_without_reads(mem):
+    mem.set_multi({f"k{i}": i for i in range(600)}, ttl=0.1)
+    mem.set("kept", 1)
+    assert wait_for(lambda: mem.stats()["total_keys"] == 1)
+    assert mem.stats()["keys_with_ttl"] == 0
+
+
+def test_reaper_wakes_for_an_earlier_deadline(mem):
+    mem.set("late", 1, ttl=3600)
+    time.sleep(0.05)  # Let the reaper go to sleep until the late deadline
+    mem.set("soon", 1, ttl=0.05)
+    assert wait_for(lambda: mem.stats()["total_keys"] == 1, timeout=1.0)
+    assert mem.exists("late")
+
+
+def test_set_replaces_ttl(mem):
+    mem.set("cleared", 1, ttl=0.05)
+    mem.set("cleared", 2)
+    mem.set("extended", 1, ttl=0.05)
+    mem.set("extended", 2, ttl=3600)
+    time.sleep(0.15)
+    assert mem.get("cleared") == 2
+    assert mem.get_ttl("cleared") is None
+    assert mem.get("extended") == 2
+    assert 3590 < mem.get_ttl("extended") <= 3600
+
+
+def test_increment_keeps_ttl(mem):
+    mem.set("counter", 1, ttl=3600)
+    assert mem.increment("counter") == 2
+    assert mem.get_ttl("counter") > 3590
+
+
+def test_expired_entries_leave_indexes(mem):
+    mem.register_index("status", "intake_session:", "status")
+    mem.set("intake_session:a", {"status": "waiting"}, ttl=0.05)
+    mem.set("intake_session:b", {"status": "waiting"})
+    time.sleep(0.1)
+    assert set(mem.find("status", equals="waiting")) == {"intake_session:b"}
+    assert mem.keys_with_prefix("intake_session:") == ["intake_session:b"]
+
+
+def test_ttl_survives_recovery(open_store):
+    store = open_store()
+    store.set("short", 1, ttl=0.05)
+    store.set("long", 1, ttl=3600)
+    store.set_multi({"multi": 1}, ttl=3600)
+    crash(store)
+    time.sleep(0.1)
+
+    store = open_store()
+    assert store.stats()["total_keys"] == 2
+    assert not store.exists("short")
+    assert 3590 < store.get_ttl("long") <= 3600
+    assert 3590 < store.get_ttl("multi") <= 3600
+
+
+# --- Atomic multi-key operations ---
+
+def keys_on_distinct_shards(store: MockMemoryStore, count: int, namespace: str = "default") -> list:
+    keys, shards = [], set()
+    i = 0
+    while len(keys) < count:
+        key = f"key{i}"
+        shard = store._shard_index(store._make_key(namespace, key))
+        if shard not in shards:
+            shards.add(shard)
+            keys.append(key)
+        i += 1
+    return keys
+
+
+def run_threads(*targets, timeout: float = 30.0):
+    threads = [threading.Thread(target=target, daemon=True) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout)
+    # A thread still running here means a deadlock
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_set_multi_is_atomic_across_shards(mem):
+    keys = keys_on_distinct_shards(mem, 4)
+    mem.set_multi({key: 0 for key in keys})
+    torn = []
+
+    def writer(offset):
+        for n in range(2000):
+            # Reversed key order on alternate writers: locks are still taken in shard order
+            mem.set_multi({key: n + offset for key in (keys if offset else keys[::-1])})
+
+    def reader():
+        for _ in range(4000):
+            values = mem.get_multi(keys)
+            if len(set(values.values())) != 1:
+                torn.append(values)
+
+    run_threads(lambda: writer(0), lambda: writer(10000), reader, reader)
+    assert torn == []
+
+
+def test_delete_multi_is_atomic_across_shards(mem):
+    keys = keys_on_distinct_shards(mem, 4)
+    torn = []
+
+    def writer():
+        for n in range(2000):
+            mem.set_multi({key: n for key in keys})
+            mem.delete_multi(keys)
+
+    def reader():
+        for _ in range(4000):
+            values = mem.get_multi(keys)
+            if values and len(values) != len(keys):
+                torn.append(values)
+
+    run_threads(writer, reader, reader)
+    assert torn == []
+
+
+def test_set_multi_is_one_log_record(open_store, tmp_path):
+    store = open_store()
+    keys = keys_on_distinct_shards(store, 4)
+    store.set("before", 1)
+    store.set_multi({key: 1 for key in keys}, ttls={keys[0]: 3600})
+    crash(store)
+    store = open_store()
+    assert store.get_multi(keys) == {key: 1 for key in keys}
+    assert store.get_ttl(keys[0]) > 3590
+    assert store.get_ttl(keys[1]) is None
+    store.set_multi({key: 2 for key in keys})
+    crash(store)
+
+    # A crash mid-write of the record loses the whole batch, never part of it
+    _, segment = _wal_segments(tmp_path / "memory_store.pkl")[-1]
+    segment.write_bytes(segment.read_bytes()[:-1])
+    store = open_store()
+    assert store.get_multi(keys) == {key: 1 for key in keys}
+    assert store.get("before") == 1
+
+
+# --- Bulk operations ---
+
+def test_get_multi_returns_present_keys(mem):
+    mem.set_multi({"a": 1, "b": None, "c": {"x": [1]}})
+    mem.set("d", 4, namespace="other")
+    assert mem.get_multi(["c", "a", "b", "d", "missing"]) == {"c": {"x": [1]}, "a": 1}
+    assert mem.get_multi([]) == {}
+
+
+def test_set_multi_per_key_ttls(mem):
+    mem.set_multi({"a": 1, "b": 2, "c": 3}, ttl=3600, ttls={"a": 0.05, "c": None})
+    time.sleep(0.1)
+    assert mem.get_multi(["a", "b", "c"]) == {"b": 2, "c": 3}
+    assert mem.get_ttl("b") > 3590
+    assert mem.get_ttl("c") is None
+
+
+def test_set_multi_empty_is_a_no_op(open_store, tmp_path):
+    store = open_store()
+    store.set_multi({})
+    store.delete_multi([])
+    store.delete_multi(["missing"])
+    _, segment = _wal_segments(tmp_path / "memory_store.pkl")[-1]
+    assert segment.stat().st_size == 0
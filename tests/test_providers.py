@@ -0,0 +1,67 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import threading
+import time
+
+import pytest
+
+from api.config import settings
+from api.services import providers
+from api.services.providers import KnowledgePackProvider
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def knowledge_pack(mock_kb, monkeypatch):
+    """Provider whose first two warm-ups fail, each once its release event is set."""
+    monkeypatch.setattr(settings, "KNOWLEDGE_PACK_WARM_UP", True)
+    monkeypatch.setattr(providers, "_WARM_UP_RETRY_INITIAL", 0.01)
+    provider = KnowledgePackProvider(kb=mock_kb)
+    warm_up = provider.triage_engine.warm_up
+    provider.attempts = []
+    provider.release = [threading.Event(), threading.Event()]
+
+    def flaky_warm_up():
+        attempt = len(provider.attempts)
+        provider.attempts.append(attempt)
+        if attempt < len(provider.release):
+            provider.release[attempt].wait(5)
+            raise RuntimeError("knowledge pack unavailable")
+        return warm_up()
+
+    monkeypatch.setattr(provider.triage_engine, "warm_up", flaky_warm_up)
+    yield provider
+    for event in provider.release:
+        event.set()
+
+
+def test_ready_reports_503_until_warm_up_succeeds(app_client, knowledge_pack):
+    wait_for(lambda: knowledge_pack.attempts)
+    response = app_client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+    assert app_client.get("/api/health").status_code == 200
+
+    knowledge_pack.release[0].set()
+    wait_for(lambda: len(knowledge_pack.attempts) == 2)
+    response = app_client.get("/api/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "retrying", "error": "knowledge pack unavailable"}
+
+    knowledge_pack.release[1].set()
+    wait_for(lambda: knowledge_pack.ready)
+    response = app_client.get("/api/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "knowledge_pack_version": knowledge_pack.kb.pack_version}
+    assert knowledge_pack.attempts == [0, 1, 2]
+    assert knowledge_pack.warm_up_error is None
+
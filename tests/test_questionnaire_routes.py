@@ -0,0 +1,48 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import pytest
+
+from api.config import settings
+from api.services.providers import KnowledgePackProvider
+
+
+@pytest.fixture
+def knowledge_pack(mock_kb, monkeypatch):
+    monkeypatch.setattr(settings, "KNOWLEDGE_PACK_WARM_UP", False)
+    return KnowledgePackProvider(kb=mock_kb)
+
+
+def test_branch_rules_revalidate_until_pack_changes(app_client, mock_kb):
+    first = app_client.get("/api/questionnaire/branch_rules", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+    assert first.json()["branch_rules"][0]["followup_question_id"] == "fq1"
+    etag = first.headers["etag"]
+
+    revalidated = app_client.get(
+        "/api/questionnaire/branch_rules", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert "Accept-Encoding" in revalidated.headers["vary"]
+
+    # A new pack version rebuilds the payload: the old etag no longer matches
+    mock_kb.inject_sheet("intake_branch_rules", [{"followup_question_id": "fq2"}])
+    changed = app_client.get(
+        "/api/questionnaire/branch_rules", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["branch_rules"] == [{"followup_question_id": "fq2"}]
+
+
+def test_identity_client_gets_uncompressed_body(app_client):
+    response = app_client.get("/api/questionnaire/symptom_map", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"symptom_map": []}
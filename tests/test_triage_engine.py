@@ -0,0 +1,147 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from api.services import triage_engine
+from api.services.triage_engine import TriageEngine, _rank_conditions, _top_by_probability
+
+
+def scored(result):
+    """The parts of a TriageResult that depend on scoring (not ids or timestamps)."""
+    return result.model_dump(include={
+        "top_5_conditions", "differential", "assistant_actions", "followup_questions", "suggestions",
+    })
+
+
+@pytest.fixture
+def scorer_calls(monkeypatch):
+    """Record the score components recomputed by each run (by component name)."""
+    calls = []
+    components = {}
+    for name, scorer in triage_engine.SCORING_MODES["heuristic"].items():
+        def counting(index, batch, name=name, scorer=scorer):
+            calls.append(name)
+            return scorer(index, batch)
+        components[name] = counting
+    monkeypatch.setitem(triage_engine.SCORING_MODES, "heuristic", components)
+    return calls
+
+
+# --- Per-session score cache ---
+
+def test_rerun_of_unchanged_intake_is_a_cache_hit(mock_kb, make_intake, scorer_calls):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    intake = make_intake(1)
+    first = engine.run(intake, include_differential=True)
+    assert sorted(scorer_calls) == sorted(triage_engine.SCORING_MODES["heuristic"])
+    scorer_calls.clear()
+    second = engine.run(intake, include_differential=True)
+    assert scorer_calls == []
+    assert scored(second) == scored(first)
+
+
+def test_changed_answer_recomputes_only_its_component(mock_kb, make_intake, scorer_calls):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    intake = make_intake(1)
+    engine.run(intake)
+    scorer_calls.clear()
+    intake.symptoms[0].present = not intake.symptoms[0].present
+    engine.run(intake)
+    assert scorer_calls == ["symptoms"]
+
+
+def test_new_pack_version_invalidates_cache(mock_kb, make_intake, scorer_calls):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    intake = make_intake(1)
+    engine.run(intake)
+    mock_kb.inject_sheet("guides", [])
+    scorer_calls.clear()
+    engine.run(intake)
+    assert sorted(scorer_calls) == sorted(triage_engine.SCORING_MODES["heuristic"])
+
+
+def test_cached_runs_match_uncached_runs(mock_kb, make_intake):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    intakes = [make_intake(seed, token=f"tok{seed % 5}") for seed in range(40)]
+    for intake in intakes:
+        # Edit one answer at a time between re-triages of the same sessions
+        intake.pmh = intake.pmh[:1]
+        cached = engine.run(intake, include_differential=True)
+        uncached = TriageEngine(kb=mock_kb, scoring_mode="heuristic").run(intake, include_differential=True)
+        assert scored(cached) == scored(uncached)
+    batch = engine.run_batch(intakes[:10], include_differential=True)
+    for intake, result in zip(intakes[:10], batch):
+        uncached = TriageEngine(kb=mock_kb, scoring_mode="heuristic").run(intake, include_differential=True)
+        assert scored(result) == scored(uncached)
+
+
+def test_cache_entries_expire(mock_kb, make_intake, scorer_calls):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic", score_cache_ttl=0.05)
+    intake = make_intake(1)
+    engine.run(intake)
+    time.sleep(0.1)
+    scorer_calls.clear()
+    engine.run(intake)
+    assert sorted(scorer_calls) == sorted(triage_engine.SCORING_MODES["heuristic"])
+
+
+def test_expired_entries_are_dropped_without_a_rerun(mock_kb, make_intake):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic", score_cache_ttl=0.05)
+    engine.run(make_intake(1))
+    time.sleep(0.1)
+    engine.run(make_intake(2))
+    assert list(engine._score_cache) == ["tok2"]
+
+
+def test_least_recently_triaged_session_is_evicted(mock_kb, make_intake, monkeypatch):
+    monkeypatch.setattr(triage_engine, "_SCORE_CACHE_MAX_SESSIONS", 3)
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    for seed in (0, 1, 2, 0, 3):
+        engine.run(make_intake(seed))
+    assert list(engine._score_cache) == ["tok2", "tok0", "tok3"]
+
+
+def test_evict_session(mock_kb, make_intake, scorer_calls):
+    engine = TriageEngine(kb=mock_kb, scoring_mode="heuristic")
+    intake = make_intake(1)
+    engine.run(intake)
+    engine.run(make_intake(2))
+    engine.evict_session("tok1")
+    engine.evict_session("unknown")
+    assert list(engine._score_cache) == ["tok2"]
+    scorer_calls.clear()
+    engine.run(intake)
+    assert sorted(scorer_calls) == sorted(triage_engine.SCORING_MODES["heuristic"])
+
+
+# --- Top-k ranking ---
+
+def full_sort(triggered, probabilities):
+    """Reference ranking: triggered red flags first, probability desc, ties in pack order."""
+    return sorted(range(len(probabilities)), key=lambda i: (not triggered[i], -probabilities[i], i))
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("k", [1, 5, 12, None])
+def test_top_k_matches_full_sort(seed, k):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 40))
+    # Few distinct values, so ties at the k-th place are common
+    probabilities = rng.integers(0, 4, n) / 4
+    triggered = rng.random(n) < rng.choice([0.0, 0.2, 0.8])
+    ranked = _rank_conditions(triggered, probabilities, k)
+    assert ranked.tolist() == full_sort(triggered, probabilities)[:k]
+
+
+def test_top_k_breaks_ties_in_pack_order():
+    probabilities = np.array([0.1, 0.3, 0.3, 0.0, 0.3, 0.3])
+    triggered = np.array([False, False, False, True, False, False])
+    assert _rank_conditions(triggered, probabilities, 3).tolist() == [3, 1, 2]
+    assert _top_by_probability(np.arange(6), probabilities, 2).tolist() == [1, 2]
+    assert _top_by_probability(np.array([0, 4, 5]), probabilities, 2).tolist() == [4, 5]
@@ -0,0 +1,108 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from api.services.triage_engine import TriageEngine
+from api.services.triage_index import get_symptom_weights, get_triage_index
+from api.utils.shared_arrays import shared_arrays
+
+
+def scored(result):
+    """The parts of a TriageResult that depend on scoring (not ids or timestamps)."""
+    return result.model_dump(include={
+        "top_5_conditions", "differential", "assistant_actions", "followup_questions", "suggestions",
+    })
+
+
+@pytest.fixture
+def excel_pack(excel_kb, mock_kb):
+    """excel_kb with a workbook holding the synthetic pack of mock_kb."""
+    excel_kb.write_sheets(mock_kb.snapshot().sheets)
+    return excel_kb
+
+
+# --- Index shared across workers ---
+
+def test_next_worker_attaches_published_index(excel_pack):
+    first = excel_pack().snapshot()
+    get_symptom_weights(first)
+    published = get_triage_index(first)
+    assert "conditions" in first.loaded_sheets
+
+    second = excel_pack().snapshot()
+    index = get_triage_index(second)
+    weights = get_symptom_weights(second)
+    assert second.shared_dir == first.shared_dir
+    # Mapped from the published files: no sheet was loaded to build them
+    assert second.loaded_sheets == ()
+    for array in (index.condition_ids, index.symptom_matrix, weights.matrix):
+        assert isinstance(array, np.memmap)
+        assert not array.flags.writeable
+    for name in index.ARRAYS:
+        assert np.array_equal(getattr(index, name), getattr(published, name))
+    assert [(r.field_id, r.ui_component, r.action_id) for r in index.tier2_rules] == [
+        ("pmh", "multi_select", "assistant_pmh"), ("occupation", "text", "assistant_occupation"),
+    ]
+
+
+@pytest.mark.parametrize("scoring_mode", ["heuristic", "weighted"])
+def test_attached_index_scores_like_a_private_one(excel_pack, mock_kb, make_intake, scoring_mode):
+    TriageEngine(kb=excel_pack(), scoring_mode=scoring_mode).run(make_intake(0))
+    attached = TriageEngine(kb=excel_pack(), scoring_mode=scoring_mode)
+    private = TriageEngine(kb=mock_kb, scoring_mode=scoring_mode)
+    for seed in range(20):
+        intake = make_intake(seed)
+        assert scored(attached.run(intake, include_differential=True)) == scored(
+            private.run(intake, include_differential=True)
+        )
+
+
+def test_index_is_private_without_snapshot(excel_pack):
+    snapshot = excel_pack(use_snapshot=False).snapshot()
+    assert snapshot.shared_dir is None
+    assert not isinstance(get_triage_index(snapshot).symptom_matrix, np.memmap)
+
+
+# --- shared_arrays ---
+
+def test_concurrent_callers_build_once(tmp_path):
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return {"ids": np.array(["a", "bc"]), "matrix": np.eye(2, dtype=np.int32)}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(shared_arrays(tmp_path / "index-v1", build)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert len(results) == 4
+    for arrays in results:
+        assert arrays["ids"].tolist() == ["a", "bc"]
+        assert np.array_equal(arrays["matrix"], np.eye(2))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index-v1", "index-v1.lock"]
+
+
+def test_unpublishable_arrays_are_built_privately(tmp_path, monkeypatch):
+    def failing_save(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "save", failing_save)
+    arrays = shared_arrays(tmp_path / "index-v1", lambda: {"ids": np.array(["a"])})
+    assert arrays["ids"].tolist() == ["a"]
+    assert not isinstance(arrays["ids"], np.memmap)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["index-v1.lock"]
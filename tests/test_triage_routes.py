@@ -0,0 +1,70 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+import pytest
+
+from api.config import settings
+from api.services.providers import KnowledgePackProvider
+
+ADMIN_KEY = "test-admin-key"
+
+
+@pytest.fixture
+def knowledge_pack(excel_kb, monkeypatch):
+    """Serve a small workbook pack (no warm-up) with an admin key configured."""
+    monkeypatch.setattr(settings, "KNOWLEDGE_PACK_WARM_UP", False)
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", ADMIN_KEY)
+    excel_kb.write("c1")
+    return KnowledgePackProvider(kb=excel_kb())
+
+
+@pytest.mark.parametrize("body", [
+    {"intake_session_tokens": [None, "nope"]},
+    {"intake_session_tokens": [1]},
+    {"intake_session_tokens": []},
+    {"intake_session_tokens": "nope"},
+    {"session_tokens": ["nope"]},
+    {},
+], ids=["null_token", "int_token", "empty", "not_a_list", "old_alias", "missing"])
+def test_run_batch_rejects_invalid_body(app_client, body):
+    response = app_client.post("/api/triage/run_batch", json=body)
+    assert response.status_code == 422
+
+
+def test_run_batch_reports_missing_sessions(app_client):
+    response = app_client.post("/api/triage/run_batch", json={"intake_session_tokens": ["nope"]})
+    assert response.status_code == 200
+    assert response.json()["results"] == []
+    assert response.json()["missing_session_tokens"] == ["nope"]
+
+
+# --- Knowledge pack reload ---
+
+def reload_pack(client, body=None, key=ADMIN_KEY):
+    headers = {"X-Admin-Key": key} if key is not None else {}
+    return client.post("/api/triage/knowledge_pack/reload", json=body or {}, headers=headers)
+
+
+@pytest.mark.parametrize("key", [None, "", "wrong"], ids=["missing", "empty", "wrong"])
+def test_reload_requires_admin_key(app_client, key):
+    assert reload_pack(app_client, key=key).status_code == 403
+
+
+def test_reload_is_disabled_without_configured_key(app_client, monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_API_KEY", None)
+    assert reload_pack(app_client).status_code == 403
+
+
+def test_reload_reports_unchanged_and_reloaded(app_client, excel_kb):
+    response = reload_pack(app_client)
+    assert response.status_code == 200
+    unchanged = response.json()
+    assert unchanged["status"] == "unchanged"
+    assert unchanged["knowledge_pack_version"] == unchanged["previous_version"]
+    excel_kb.write("c1", "c2")
+    reloaded = reload_pack(app_client).json()
+    assert reloaded["status"] == "reloaded"
+    assert reloaded["previous_version"] == unchanged["knowledge_pack_version"]
+    assert reloaded["knowledge_pack_version"] != reloaded["previous_version"]
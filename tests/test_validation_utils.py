@@ -0,0 +1,34 @@
+"""
+© 2025 igotnowifi, LLC
+Proprietary and confidential.
+"""
+
+from types import SimpleNamespace
+
+from api.utils.validation_utils import compile_tier2_rules, find_missing_tier2, validate_tier2_prompts
+
+CHECKLIST = [
+    {"tier_level": 2, "field_id": "pmh", "required": True},
+    {"tier_level": "2", "field_id": "occupation", "required": True},
+    {"tier_level": "2", "field_id": "allergies", "required": False},
+    {"tier_level": "1", "field_id": "chief_concern", "required": True},
+]
+
+
+def test_validate_tier2_prompts():
+    response = SimpleNamespace(pmh=[], occupation="teacher", allergies=[], chief_concern="")
+    assert validate_tier2_prompts(response, CHECKLIST) == ["pmh"]
+    response = SimpleNamespace(pmh=["h1"], occupation=None)
+    assert validate_tier2_prompts(response, CHECKLIST) == ["occupation"]
+
+
+def test_validate_tier2_prompts_matches_compiled_rules():
+    rules = compile_tier2_rules(CHECKLIST)
+    for response in (
+        SimpleNamespace(pmh=[], occupation=""),
+        SimpleNamespace(pmh=["h1"], occupation="teacher"),
+        SimpleNamespace(),
+    ):
+        assert validate_tier2_prompts(response, CHECKLIST) == [
+            rule.field_id for rule in find_missing_tier2(response, rules)
+        ]